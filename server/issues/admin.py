@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Bug
+from .models import Bug, MailboxCheckpoint, ProcessedMessage
 
 @admin.register(Bug)
 class BugAdmin(admin.ModelAdmin):
@@ -18,4 +18,29 @@ class BugAdmin(admin.ModelAdmin):
     readonly_fields = ('modified_count', 'created_at', 'updated_at')
     
     # Default ordering
-    ordering = ('-updated_at',)
\ No newline at end of file
+    ordering = ('-updated_at',)
+
+
+@admin.register(MailboxCheckpoint)
+class MailboxCheckpointAdmin(admin.ModelAdmin):
+    """Admin configuration for the MailboxCheckpoint model."""
+    
+    # Fields to display in the list view
+    list_display = ('mailbox', 'uidvalidity', 'last_uid', 'highest_modseq', 'updated_at')
+    
+    # Fields that cannot be edited
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ProcessedMessage)
+class ProcessedMessageAdmin(admin.ModelAdmin):
+    """Admin configuration for the ProcessedMessage model."""
+    
+    # Fields to display in the list view
+    list_display = ('message_hash', 'bug_id', 'processed_at')
+    
+    # Fields that can be searched
+    search_fields = ('message_hash', 'bug_id')
+    
+    # Fields that cannot be edited
+    readonly_fields = ('processed_at',)
@@ -0,0 +1,217 @@
+"""
+Single-pass status and priority classifier for bug report emails.
+
+The email ingester used to find the status with up to four regex searches
+and the priority with up to 18 substring scans, each over the full
+lowercased text. This module compiles every status pattern and priority
+keyword into one alternation regex, once per process, and walks the text a
+single time to find both.
+
+Precedence is the same as before:
+
+Status (first rule that matches anywhere wins, leftmost match within a rule):
+    0. "status: closed" / "state: in progress"
+    1. "[resolved]"
+    2. "bug is closed" / "issue has been resolved" / "ticket was opened"
+    3. a bare status word such as "closing" or "in-progress"
+    default "open"
+
+Priority:
+    0. "priority: high|medium|low"
+    1. any high keyword, 2. any medium keyword, 3. any low keyword
+    default "Medium"
+
+Each rule is expanded into branches that start with a literal character and
+end with an empty marker group. Branches are grouped by their first
+character, so the regex engine skips positions that cannot start a match and
+tries only the branches for the current character; the marker group that
+matched identifies category, rule and result without any re-matching. Once a
+match is found, only rules that could still beat it are searched for in the
+rest of the text.
+"""
+import functools
+import re
+from collections import defaultdict
+
+# Status words accepted after "status:" and inside brackets
+STATUS_WORDS = {
+    "open": "open",
+    "closed": "closed",
+    "resolved": "resolved",
+    r"in[-_\s]progress": "in_progress",
+}
+
+# Status words accepted after "bug is" and on their own
+STATUS_VERBS = {
+    "open(?:ed)?": "open",
+    "clos(?:ed|ing)": "closed",
+    "resolv(?:ed|ing)": "resolved",
+    r"in[-_\s]progress": "in_progress",
+}
+
+# Priority keywords in precedence order, matched as plain substrings
+PRIORITY_KEYWORDS = [
+    ("High", ["urgent", "high", "critical", "blocker", "emergency", "p1", "priority 1"]),
+    ("Medium", ["medium", "normal", "moderate", "p2", "priority 2"]),
+    ("Low", ["low", "minor", "trivial", "p3", "priority 3", "can wait"]),
+]
+
+DEFAULT_STATUS = "open"
+DEFAULT_PRIORITY = "Medium"
+
+# Number of rules per category
+STATUS_RANKS = 4
+PRIORITY_RANKS = 1 + len(PRIORITY_KEYWORDS)
+
+
+def _branches():
+    """
+    Expand all rules into (category, rank, pattern, result) branches.
+
+    Every pattern starts with a literal character. The leading word boundary
+    of bare status words is checked with a fixed-width lookbehind placed
+    after the first characters, so it does not hide that literal.
+
+    Returns:
+        list: Branches in precedence order within each category
+    """
+    branches = []
+    for word, result in STATUS_WORDS.items():
+        for noun in ("status", "state"):
+            branches.append(("status", 0, rf"{noun}\s*:\s*{word}", result))
+    for word, result in STATUS_WORDS.items():
+        branches.append(("status", 1, rf"\[{word}\]", result))
+    for word, result in STATUS_VERBS.items():
+        for noun in ("bug", "issue", "ticket"):
+            branches.append(("status", 2, rf"{noun} (?:is|has been|was) {word}", result))
+    for word, result in STATUS_VERBS.items():
+        head = word[:2]  # e.g. "op" for "open(?:ed)?"
+        branches.append(("status", 3, rf"{head}(?<!\w{head}){word[2:]}\b", result))
+
+    for level in ("high", "medium", "low"):
+        branches.append(("priority", 0, rf"priority\s*:\s*{level}", level.capitalize()))
+    for rank, (result, keywords) in enumerate(PRIORITY_KEYWORDS, start=1):
+        for keyword in keywords:
+            branches.append(("priority", rank, re.escape(keyword), result))
+    return branches
+
+
+BRANCHES = _branches()
+
+
+@functools.lru_cache(maxsize=None)
+def _scanner(status_limit, priority_limit):
+    """
+    Compile the alternation of all rules ranked below the given limits.
+
+    Args:
+        status_limit (int): Only status rules with rank < status_limit are included
+        priority_limit (int): Only priority rules with rank < priority_limit are included
+
+    Returns:
+        tuple: (compiled regex, {marker group index: (category, rank, result)})
+    """
+    limits = {"status": status_limit, "priority": priority_limit}
+    by_first_char = defaultdict(list)
+    for category, rank, pattern, result in BRANCHES:
+        if rank < limits[category]:
+            # Escaped first characters such as "\[" stay together
+            split = 2 if pattern.startswith("\\") else 1
+            by_first_char[pattern[:split]].append((pattern[split:], (category, rank, result)))
+
+    alternatives, markers = [], {}
+    for first, rests in by_first_char.items():
+        options = []
+        for rest, marker in rests:
+            markers[len(markers) + 1] = marker
+            options.append(f"{rest}()")
+        alternatives.append(f"{first}(?:{'|'.join(options)})")
+    return re.compile("|".join(alternatives)), markers
+
+
+def scan(text, status_limit=STATUS_RANKS, priority_limit=PRIORITY_RANKS):
+    """
+    Find the best status and priority match in lowercased text in one pass.
+
+    Args:
+        text (str): Lowercased subject and description
+        status_limit (int): Number of status rules to look for, 0 to skip status
+        priority_limit (int): Number of priority rules to look for, 0 to skip priority
+
+    Returns:
+        dict: {"status": result, "priority": result} for the categories that matched
+    """
+    limits = {"status": status_limit, "priority": priority_limit}
+    found = {}
+    position = 0
+    while limits["status"] or limits["priority"]:
+        regex, markers = _scanner(limits["status"], limits["priority"])
+        match = regex.search(text, position)
+        if match is None:
+            break
+        category, rank, result = markers[match.lastindex]
+        found[category] = result
+        limits[category] = rank
+
+        # The alternation reports one branch per position; a rule of the other
+        # category may match at the same position too
+        other = "priority" if category == "status" else "status"
+        if limits[other]:
+            regex, markers = _scanner(
+                limits["status"] if other == "status" else 0,
+                limits["priority"] if other == "priority" else 0,
+            )
+            other_match = regex.match(text, match.start())
+            if other_match is not None:
+                _, rank, result = markers[other_match.lastindex]
+                found[other] = result
+                limits[other] = rank
+
+        # Matches of better rules may overlap this one, so continue right after its start
+        position = match.start() + 1
+    return found
+
+
+def classify(subject, description):
+    """
+    Determine status and priority of a bug report email.
+
+    Args:
+        subject (str): Email subject line
+        description (str): Email body text
+
+    Returns:
+        tuple: (status, priority), e.g. ("resolved", "High")
+    """
+    found = scan(f"{subject} {description}".lower())
+    return found.get("status", DEFAULT_STATUS), found.get("priority", DEFAULT_PRIORITY)
+
+
+def extract_status(subject, description):
+    """
+    Determine only the status of a bug report email.
+
+    Args:
+        subject (str): Email subject line
+        description (str): Email body text
+
+    Returns:
+        str: "open", "closed", "resolved" or "in_progress"
+    """
+    found = scan(f"{subject} {description}".lower(), priority_limit=0)
+    return found.get("status", DEFAULT_STATUS)
+
+
+def determine_priority(subject, description):
+    """
+    Determine only the priority of a bug report email.
+
+    Args:
+        subject (str): Email subject line
+        description (str): Email body text
+
+    Returns:
+        str: "High", "Medium" or "Low"
+    """
+    found = scan(f"{subject} {description}".lower(), status_limit=0)
+    return found.get("priority", DEFAULT_PRIORITY)
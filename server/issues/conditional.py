@@ -0,0 +1,161 @@
+"""
+Validators for conditional GETs of the bug endpoints.
+
+The frontend fetches the bug list and bug details again on every
+navigation. With these validators a client that still has the current
+version gets a 304 Not Modified after one indexed query, instead of the
+full query and serialization:
+
+    detail  ETag from the bug's updated_at and modified_count, and
+            Last-Modified from updated_at
+    list    ETag from MAX(updated_at), COUNT(*) and SUM(modified_count) of
+            the filtered bugs; the count catches deletions, which leave
+            MAX(updated_at) as it was, and the sum catches modifications
+            written with QuerySet.update(), which leave updated_at as it
+            was, so the list has no Last-Modified. Cursor paginated lists
+            only get an ETag when they ask for the count anyway, as
+            counting is what cursor pagination avoids.
+
+Both ETags also hash the query parameters, since fields, ordering and
+paging change the body. They are applied by conditional_get(), which
+wraps Django's condition() decorator so that error responses carry no
+validators.
+"""
+import functools
+import hashlib
+from django.db.models import Count, Max, Sum
+from django.views.decorators.http import condition
+from issues.filters import filter_bugs
+from issues.models import Bug
+from issues.pagination import wants_count, wants_cursor_pagination
+
+
+def representation_key(request):
+    """
+    Describe the query parameters that shape a response body.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        str: The parameters in a stable order
+    """
+    return "&".join(f"{key}={value}" for key, value in sorted(request.GET.lists()))
+
+
+def make_etag(*parts):
+    """
+    Hash validator parts into an ETag value.
+
+    Args:
+        *parts: Values that change whenever the response body does
+
+    Returns:
+        str: Hex digest, without quotes
+    """
+    return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def bug_version(request, bug_id):
+    """
+    Look up what the detail validators are derived from, once per request.
+
+    Args:
+        request: The HTTP request object
+        bug_id (str): Bug ID from the URL
+
+    Returns:
+        tuple: (updated_at, modified_count), or None if there is no such bug
+    """
+    if not hasattr(request, "_bug_version"):
+        request._bug_version = (
+            Bug.objects.filter(bug_id=bug_id).values_list("updated_at", "modified_count").first()
+        )
+    return request._bug_version
+
+
+def bug_etag(request, bug_id):
+    """
+    ETag of a bug's detail response.
+
+    Args:
+        request: The HTTP request object
+        bug_id (str): Bug ID from the URL
+
+    Returns:
+        str: The ETag, or None if there is no such bug
+    """
+    version = bug_version(request, bug_id)
+    if version is None:
+        return None
+    updated_at, modified_count = version
+    return make_etag(bug_id, updated_at.isoformat(), modified_count, representation_key(request))
+
+
+def bug_last_modified(request, bug_id):
+    """
+    Last-Modified of a bug's detail response.
+
+    Args:
+        request: The HTTP request object
+        bug_id (str): Bug ID from the URL
+
+    Returns:
+        datetime: The bug's updated_at, or None if there is no such bug
+    """
+    version = bug_version(request, bug_id)
+    return version[0] if version else None
+
+
+def bug_list_etag(request):
+    """
+    ETag of a bug list response.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        str: The ETag, or None for invalid filters, which the view rejects,
+             and for cursor pagination without count
+    """
+    if wants_cursor_pagination(request.GET) and not wants_count(request.GET):
+        return None
+    try:
+        queryset = filter_bugs(Bug.objects.all(), request.GET).order_by()
+    except ValueError:
+        return None
+    summary = queryset.aggregate(latest=Max("updated_at"), total=Count("id"), modified=Sum("modified_count"))
+    latest = summary["latest"].isoformat() if summary["latest"] else ""
+    return make_etag(latest, summary["total"], summary["modified"] or 0, representation_key(request))
+
+
+def conditional_get(etag_func=None, last_modified_func=None):
+    """
+    Apply condition() to a view, keeping validators off error responses.
+
+    condition() adds the ETag and Last-Modified it computed to whatever the
+    view returns, so a 400 for an invalid parameter would carry validators
+    a client could revalidate with. Only 200 and 304 responses keep them.
+
+    Args:
+        etag_func (callable): ETag function, as for condition()
+        last_modified_func (callable): Last-Modified function, as for condition()
+
+    Returns:
+        callable: Decorator for a view function
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @functools.wraps(view_func)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                for header in ("ETag", "Last-Modified"):
+                    if response.has_header(header):
+                        del response[header]
+            return response
+
+        return inner
+
+    return decorator
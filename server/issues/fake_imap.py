@@ -0,0 +1,505 @@
+"""
+In-process fake IMAP server for tests and local experiments.
+
+FakeIMAPServer speaks enough plain-text IMAP4rev1 for imaplib.IMAP4 and the
+ingestion code to run against it without network access: LOGIN, SELECT,
+STATUS, CREATE, UID SEARCH/FETCH/STORE/MOVE, NOOP, IDLE and LOGOUT, with CONDSTORE
+mod-sequences. FETCH supports BODYSTRUCTURE, HEADER.FIELDS and body
+sections, so partial fetches can be tested too. Messages are kept in memory and new ones can be delivered
+while clients are connected, which wakes up any client waiting in IDLE.
+
+Usage:
+    with FakeIMAPServer() as server:
+        server.deliver(b"Subject: Bug ID: BUG-1\\r\\n\\r\\nBody")
+        mail = imaplib.IMAP4(*server.address)
+"""
+import email
+import re
+import select
+import socketserver
+import threading
+
+# Capabilities announced to clients
+CAPABILITIES = "IMAP4rev1 IDLE UIDPLUS CONDSTORE MOVE"
+
+# How often an idling connection checks for newly delivered messages (seconds)
+IDLE_POLL_INTERVAL = 0.02
+
+# Splits a command line into atoms, quoted strings and parenthesized lists
+TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\([^)]*\)|\S+')
+
+# Splits FETCH data items, keeping BODY[...] sections with spaces together
+FETCH_ITEM_PATTERN = re.compile(r"BODY(?:\.PEEK)?\[[^\]]*\]|[^\s()]+")
+
+
+def quote(value):
+    """Render a str (or None as NIL) as an IMAP quoted string."""
+    if value is None:
+        return "NIL"
+    return '"%s"' % str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _split_message(raw):
+    """Split raw message bytes into header and body at the first empty line."""
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        header, found, body = raw.partition(separator)
+        if found:
+            return header + separator, body
+    return raw, b""
+
+
+def _part_payload(part):
+    """Transfer-encoded body bytes of a single-part message part."""
+    payload = part.get_payload()
+    if isinstance(payload, str):
+        return payload.encode("ascii", "surrogateescape")
+    return b""
+
+
+def body_structure(part):
+    """
+    Render the BODYSTRUCTURE of a parsed message or part.
+
+    Args:
+        part (email.message.Message): Message or part to describe
+
+    Returns:
+        str: Parenthesized BODYSTRUCTURE, including disposition extension data
+    """
+    maintype, subtype = part.get_content_maintype(), part.get_content_subtype()
+    if part.is_multipart() and maintype == "multipart":
+        children = "".join(body_structure(child) for child in part.get_payload())
+        boundary = f"({quote('boundary')} {quote(part.get_boundary())})" if part.get_boundary() else "NIL"
+        return f"({children} {quote(subtype)} {boundary} NIL NIL NIL)"
+
+    params = [
+        f"{quote(name)} {quote(value)}" for name, value in part.get_params(header="content-type")[1:]
+    ] if part.get_params(header="content-type") else []
+    fields = [
+        quote(maintype),
+        quote(subtype),
+        f"({' '.join(params)})" if params else "NIL",
+        quote(part.get("Content-ID")),
+        quote(part.get("Content-Description")),
+        quote(part.get("Content-Transfer-Encoding", "7BIT")),
+    ]
+    if maintype == "message" and subtype == "rfc822" and part.is_multipart():
+        inner = part.get_payload(0)
+        fields.append(str(len(inner.as_bytes())))
+        fields.extend(["NIL", body_structure(inner), str(inner.as_bytes().count(b"\n"))])
+    else:
+        payload = _part_payload(part)
+        fields.append(str(len(payload)))
+        if maintype == "text":
+            fields.append(str(payload.count(b"\n")))
+
+    disposition = part.get("Content-Disposition")
+    if disposition:
+        disposition_params = [
+            f"{quote(name)} {quote(value)}"
+            for name, value in part.get_params(header="content-disposition")[1:]
+        ]
+        disposition = "(%s %s)" % (
+            quote(part.get_content_disposition()),
+            f"({' '.join(disposition_params)})" if disposition_params else "NIL",
+        )
+    fields.extend(["NIL", disposition or "NIL", "NIL", "NIL"])
+    return f"({' '.join(fields)})"
+
+
+def body_section(raw, section):
+    """
+    Return the content of a BODY[section] such as "TEXT", "1" or "2.1".
+
+    Args:
+        raw (bytes): Full RFC822 message
+        section (str): Section specification without HEADER.FIELDS
+
+    Returns:
+        bytes: Section content, empty if the section does not exist
+    """
+    if section == "":
+        return raw
+    if section.upper() == "TEXT":
+        return _split_message(raw)[1]
+
+    part = email.message_from_bytes(raw)
+    try:
+        for number in (int(n) for n in section.split(".")):
+            if part.get_content_type() == "message/rfc822" and part.is_multipart():
+                part = part.get_payload(0)  # Parts are numbered inside the encapsulated message
+            if part.is_multipart():
+                part = part.get_payload(number - 1)
+            elif number != 1:
+                return b""
+    except (IndexError, ValueError):
+        return b""
+    if part.get_content_type() == "message/rfc822" and part.is_multipart():
+        return part.get_payload(0).as_bytes()
+    return _part_payload(part)
+
+
+def header_fields(raw, fields):
+    """
+    Return the header lines named in a HEADER.FIELDS request.
+
+    Args:
+        raw (bytes): Full RFC822 message
+        fields (list): Header names, e.g. ["SUBJECT"]
+
+    Returns:
+        bytes: Matching header lines followed by an empty line
+    """
+    wanted = {field.lower() for field in fields}
+    header = _split_message(raw)[0]
+    # Unfold continuation lines into the line they belong to
+    lines = re.split(rb"\r?\n(?![ \t])", header.strip())
+    kept = [line for line in lines if line.split(b":", 1)[0].strip().lower().decode() in wanted]
+    return b"".join(line + b"\r\n" for line in kept) + b"\r\n"
+
+
+def fetch_data(message, item):
+    """
+    Render one FETCH data item of a message.
+
+    Args:
+        message (dict): Message as stored by FakeMailbox
+        item (str): Upper-case data item, e.g. "BODYSTRUCTURE" or "BODY.PEEK[1]"
+
+    Returns:
+        tuple: (name, value) where value is a str for inline items or bytes
+               for literals, or None if the item is not supported
+    """
+    if item == "UID":
+        return "UID", str(message["uid"])
+    if item == "FLAGS":
+        return "FLAGS", f"({' '.join(sorted(message['flags']))})"
+    if item == "MODSEQ":
+        return "MODSEQ", f"({message['modseq']})"
+    if item == "RFC822.SIZE":
+        return "RFC822.SIZE", str(len(message["raw"]))
+    if item == "BODYSTRUCTURE":
+        return "BODYSTRUCTURE", body_structure(email.message_from_bytes(message["raw"]))
+    if item == "RFC822":
+        return "RFC822", message["raw"]
+    section_match = re.match(r"BODY(?:\.PEEK)?\[([^\]]*)\]$", item)
+    if section_match:
+        section = section_match.group(1)
+        fields_match = re.match(r"HEADER\.FIELDS \(([^)]*)\)$", section)
+        if fields_match:
+            return f"BODY[{section}]", header_fields(message["raw"], fields_match.group(1).split())
+        if section == "HEADER":
+            return "BODY[HEADER]", _split_message(message["raw"])[0]
+        return f"BODY[{section}]", body_section(message["raw"], section)
+    return None
+
+
+class FakeMailbox:
+    """
+    A single in-memory mailbox.
+
+    Messages are stored as dicts with 'uid', 'raw', 'flags' and 'modseq'
+    keys, in delivery order, so the message sequence number is its index + 1.
+    """
+
+    def __init__(self, name, uidvalidity=1):
+        self.name = name
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.highestmodseq = 1
+        self.messages = []
+
+    def touch(self, message):
+        """Assign the next mod-sequence to a new or changed message."""
+        self.highestmodseq += 1
+        message["modseq"] = self.highestmodseq
+
+    def add(self, raw, flags=()):
+        """
+        Append a message and return the UID it was assigned.
+
+        Args:
+            raw (bytes): Full RFC822 message
+            flags (iterable): Initial flags, e.g. ["\\Seen"]
+
+        Returns:
+            int: UID of the new message
+        """
+        uid = self.uidnext
+        self.uidnext += 1
+        message = {"uid": uid, "raw": raw, "flags": set(flags)}
+        self.touch(message)
+        self.messages.append(message)
+        return uid
+
+    def by_uid_set(self, uid_set):
+        """
+        Return (sequence number, message) pairs matching an IMAP UID set.
+
+        Args:
+            uid_set (str): UID set such as "1:3,7" or "5:*"
+
+        Returns:
+            list: Matching (seq, message) tuples in mailbox order
+        """
+        highest = self.messages[-1]["uid"] if self.messages else 0
+        ranges = []
+        for part in uid_set.split(","):
+            start, _, end = part.partition(":")
+            start = highest if start == "*" else int(start)
+            end = start if not end else (highest if end == "*" else int(end))
+            ranges.append((min(start, end), max(start, end)))
+        return [
+            (seq, message)
+            for seq, message in enumerate(self.messages, start=1)
+            if any(low <= message["uid"] <= high for low, high in ranges)
+        ]
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """
+    Threaded fake IMAP server listening on a random localhost port.
+
+    Any username and password is accepted. All state lives in `mailboxes`
+    and is shared between connections under `lock`.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, uidvalidity=1):
+        super().__init__((host, port), FakeIMAPHandler)
+        self.lock = threading.Lock()
+        self.uidvalidity = uidvalidity
+        self.mailboxes = {"INBOX": FakeMailbox("INBOX", uidvalidity)}
+        self.commands = []  # Every command received, for assertions in tests
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, port) tuple to pass to imaplib.IMAP4."""
+        return self.server_address[:2]
+
+    def start(self):
+        """Serve requests from a background daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def mailbox(self, name="INBOX"):
+        """Return a mailbox by name, creating it if needed."""
+        with self.lock:
+            if name not in self.mailboxes:
+                self.mailboxes[name] = FakeMailbox(name, self.uidvalidity)
+            return self.mailboxes[name]
+
+    def deliver(self, raw, mailbox="INBOX", flags=()):
+        """
+        Deliver a new message; idling clients are notified with EXISTS.
+
+        Args:
+            raw (bytes): Full RFC822 message
+            mailbox (str): Target mailbox name
+            flags (iterable): Initial flags
+
+        Returns:
+            int: UID assigned to the message
+        """
+        box = self.mailbox(mailbox)
+        with self.lock:
+            return box.add(raw, flags)
+
+
+class FakeIMAPHandler(socketserver.StreamRequestHandler):
+    """Handles one client connection for FakeIMAPServer."""
+
+    def handle(self):
+        self.selected = None
+        self.known = 0  # Message count last reported to the client with EXISTS
+        self.send(f"* OK [CAPABILITY {CAPABILITIES}] Fake IMAP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().rstrip("\r\n").partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            with self.server.lock:
+                self.server.commands.append(rest)
+            if command == "UID":
+                command, _, args = args.partition(" ")
+                command = "UID " + command.upper()
+            self.raw_args = args
+            handler = getattr(self, "do_" + command.replace(" ", "_"), None)
+            if handler is None:
+                self.send(f"{tag} BAD Unknown command {command}")
+                continue
+            if handler(tag, TOKEN_PATTERN.findall(args)) is False:
+                return
+
+    def send(self, line):
+        """Write one response line (str or bytes) terminated by CRLF."""
+        if isinstance(line, str):
+            line = line.encode()
+        self.wfile.write(line + b"\r\n")
+        self.wfile.flush()
+
+    def do_CAPABILITY(self, tag, args):
+        self.send(f"* CAPABILITY {CAPABILITIES}")
+        self.send(f"{tag} OK CAPABILITY completed")
+
+    def do_LOGIN(self, tag, args):
+        self.send(f"{tag} OK LOGIN completed")
+
+    def do_NOOP(self, tag, args):
+        self.send(f"{tag} OK NOOP completed")
+
+    def do_LOGOUT(self, tag, args):
+        self.send("* BYE Fake IMAP logging out")
+        self.send(f"{tag} OK LOGOUT completed")
+        return False
+
+    def do_SELECT(self, tag, args):
+        name = args[0].strip('"') if args else "INBOX"
+        box = self.server.mailbox(name)
+        self.selected = box
+        with self.server.lock:
+            self.known = len(box.messages)
+            self.send(f"* {len(box.messages)} EXISTS")
+            self.send("* 0 RECENT")
+            self.send(f"* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid")
+            self.send(f"* OK [UIDNEXT {box.uidnext}] Predicted next UID")
+            self.send(f"* OK [HIGHESTMODSEQ {box.highestmodseq}] Highest")
+        self.send(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    do_EXAMINE = do_SELECT
+
+    def do_STATUS(self, tag, args):
+        name = args[0].strip('"')
+        items = args[1].strip("()").upper().split()
+        box = self.server.mailbox(name)
+        with self.server.lock:
+            values = {
+                "MESSAGES": len(box.messages),
+                "UIDNEXT": box.uidnext,
+                "UIDVALIDITY": box.uidvalidity,
+                "UNSEEN": sum(1 for m in box.messages if "\\Seen" not in m["flags"]),
+                "HIGHESTMODSEQ": box.highestmodseq,
+            }
+        pairs = " ".join(f"{item} {values[item]}" for item in items if item in values)
+        self.send(f'* STATUS "{name}" ({pairs})')
+        self.send(f"{tag} OK STATUS completed")
+
+    def do_UID_SEARCH(self, tag, args):
+        criteria = [arg.upper() for arg in args]
+        with self.server.lock:
+            matches = self.selected.messages
+            if "UNSEEN" in criteria:
+                matches = [m for m in matches if "\\Seen" not in m["flags"]]
+            if "UID" in criteria:
+                uid_set = args[criteria.index("UID") + 1]
+                wanted = {m["uid"] for _, m in self.selected.by_uid_set(uid_set)}
+                matches = [m for m in matches if m["uid"] in wanted]
+            uids = " ".join(str(m["uid"]) for m in matches)
+        self.send(f"* SEARCH {uids}".rstrip())
+        self.send(f"{tag} OK SEARCH completed")
+
+    def do_UID_FETCH(self, tag, args):
+        uid_set, _, items = self.raw_args.partition(" ")
+        items = FETCH_ITEM_PATTERN.findall(items.upper())
+        if "UID" not in items:
+            items.insert(0, "UID")
+        with self.server.lock:
+            for seq, message in self.selected.by_uid_set(uid_set):
+                self.send_fetch(seq, message, items)
+        self.send(f"{tag} OK FETCH completed")
+
+    def send_fetch(self, seq, message, items):
+        """Write one FETCH response for a message, with literals for message content."""
+        line = f"* {seq} FETCH ("
+        for item in items:
+            data = fetch_data(message, item)
+            if data is None:
+                continue
+            name, value = data
+            line += ("" if line.endswith("(") else " ") + name + " "
+            if isinstance(value, bytes):
+                self.wfile.write(f"{line}{{{len(value)}}}\r\n".encode())
+                self.wfile.write(value)
+                line = ""
+            else:
+                line += value
+            # Fetching content without .PEEK implicitly sets \Seen (RFC 3501)
+            if item == "RFC822" or item.startswith("BODY["):
+                if "\\Seen" not in message["flags"]:
+                    message["flags"].add("\\Seen")
+                    self.selected.touch(message)
+        self.send(line + ")")
+
+    def do_UID_STORE(self, tag, args):
+        uid_set, action, flags = args[0], args[1].upper(), args[2].strip("()").split()
+        with self.server.lock:
+            for seq, message in self.selected.by_uid_set(uid_set):
+                before = set(message["flags"])
+                if action.startswith("+"):
+                    message["flags"].update(flags)
+                elif action.startswith("-"):
+                    message["flags"].difference_update(flags)
+                else:
+                    message["flags"] = set(flags)
+                if message["flags"] != before:
+                    self.selected.touch(message)
+                if ".SILENT" not in action:
+                    flag_list = " ".join(sorted(message["flags"]))
+                    self.send(f"* {seq} FETCH (UID {message['uid']} FLAGS ({flag_list}))")
+        self.send(f"{tag} OK STORE completed")
+
+    def do_UID_MOVE(self, tag, args):
+        uid_set, target = args[0], self.server.mailbox(args[1].strip('"'))
+        with self.server.lock:
+            moved = self.selected.by_uid_set(uid_set)
+            for _, message in moved:
+                target.add(message["raw"], message["flags"])
+            # Expunged sequence numbers are reported highest first so the others stay valid
+            for seq, message in reversed(moved):
+                self.selected.messages.remove(message)
+                self.send(f"* {seq} EXPUNGE")
+            self.known -= len(moved)
+        self.send(f"{tag} OK MOVE completed")
+
+    def do_CREATE(self, tag, args):
+        self.server.mailbox(args[0].strip('"'))
+        self.send(f"{tag} OK CREATE completed")
+
+    def do_IDLE(self, tag, args):
+        """
+        Report new messages with EXISTS until the client sends DONE.
+
+        Like real servers, messages delivered since the client last saw the
+        mailbox size are reported right away.
+        """
+        self.send("+ idling")
+        known = self.known
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], IDLE_POLL_INTERVAL)
+            if readable:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    break
+            with self.server.lock:
+                count = len(self.selected.messages)
+            if count > known:
+                known = self.known = count
+                self.send(f"* {count} EXISTS")
+        self.send(f"{tag} OK IDLE terminated")
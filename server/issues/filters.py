@@ -0,0 +1,135 @@
+"""
+Filtering and ordering of the bug list from query parameters.
+
+/api/bugs/ accepts:
+
+    status          one or more statuses, comma separated
+    priority        one or more priorities, comma separated, any case
+    created_after   created at or after this date or datetime
+    created_before  created before this datetime, or on or before this date
+    updated_after   updated at or after this date or datetime
+    updated_before  updated before this datetime, or on or before this date
+    min_modified    modified at least this many times
+    ordering        comma separated fields from ORDERING_FIELDS, "-" for descending
+
+The composite indexes on Bug cover the common combinations, so these
+queries are index range scans rather than full table scans.
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Fields the bug list can be ordered by
+ORDERING_FIELDS = ("id", "bug_id", "status", "priority", "created_at", "updated_at", "modified_count")
+
+# Ordering when none is asked for, the table's natural order
+DEFAULT_ORDERING = ("id",)
+
+# Query parameters for date ranges: (field, lookup, end of day for plain dates)
+DATE_RANGES = {
+    "created_after": ("created_at", "gte", False),
+    "created_before": ("created_at", "lt", True),
+    "updated_after": ("updated_at", "gte", False),
+    "updated_before": ("updated_at", "lt", True),
+}
+
+
+def split_values(value):
+    """
+    Split a comma separated query parameter.
+
+    Args:
+        value (str): Parameter value, e.g. "open,in_progress"
+
+    Returns:
+        list: The non-empty values, stripped
+    """
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def parse_moment(value, end_of_day=False):
+    """
+    Parse a date or datetime query parameter into an aware datetime.
+
+    Args:
+        value (str): ISO 8601 date or datetime
+        end_of_day (bool): Return the start of the next day for plain dates,
+                           so a "before" date includes the whole day
+
+    Returns:
+        datetime: The moment in the current timezone if none is given
+
+    Raises:
+        ValueError: If the value is neither a date nor a datetime
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_ordering(value):
+    """
+    Validate an ordering parameter against ORDERING_FIELDS.
+
+    "id" is appended as a tie-breaker in the direction of the last field,
+    so rows with equal sort keys keep a stable order across pages.
+
+    Args:
+        value (str): Comma separated fields, e.g. "-updated_at,priority", or None
+
+    Returns:
+        tuple: Arguments for QuerySet.order_by()
+
+    Raises:
+        ValueError: If a field is not in ORDERING_FIELDS
+    """
+    fields = split_values(value or "")
+    if not fields:
+        return DEFAULT_ORDERING
+    for field in fields:
+        if field.lstrip("-") not in ORDERING_FIELDS:
+            raise ValueError(f"Cannot order by {field}; choose from {', '.join(ORDERING_FIELDS)}")
+    if not any(field.lstrip("-") == "id" for field in fields):
+        fields.append("-id" if fields[-1].startswith("-") else "id")
+    return tuple(fields)
+
+
+def filter_bugs(queryset, params):
+    """
+    Apply the filter and ordering query parameters to a Bug queryset.
+
+    Args:
+        queryset (QuerySet): Bugs to filter
+        params (QueryDict): Query parameters of the request
+
+    Returns:
+        QuerySet: The filtered and ordered bugs
+
+    Raises:
+        ValueError: If a parameter has an invalid value
+    """
+    if params.get("status"):
+        queryset = queryset.filter(status__in=split_values(params["status"]))
+    if params.get("priority"):
+        # Email ingestion stores "High", the API's choices are "high"; match
+        # both spellings with IN rather than iexact, which cannot use the index
+        priorities = {
+            spelling for value in split_values(params["priority"]) for spelling in (value.lower(), value.capitalize())
+        }
+        queryset = queryset.filter(priority__in=sorted(priorities))
+    for param, (field, lookup, end_of_day) in DATE_RANGES.items():
+        if params.get(param):
+            queryset = queryset.filter(**{f"{field}__{lookup}": parse_moment(params[param], end_of_day)})
+    if params.get("min_modified"):
+        try:
+            queryset = queryset.filter(modified_count__gte=int(params["min_modified"]))
+        except ValueError:
+            raise ValueError("min_modified must be a number")
+    return queryset.order_by(*parse_ordering(params.get("ordering")))
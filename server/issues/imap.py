@@ -0,0 +1,511 @@
+"""
+IMAP protocol helpers for the email ingestion pipeline.
+
+imaplib only exposes the raw protocol: responses come back as lists of bytes
+and (header, literal) tuples. The helpers in this module turn those responses
+into something the ingestion code can work with directly, so the management
+command does not have to know about IMAP wire details.
+"""
+import imaplib
+import logging
+import os
+import re
+import select
+import threading
+import time
+from itertools import takewhile
+
+# Matches the UID data item in a FETCH response line, e.g. b'12 (UID 4821 BODY[] {512}'
+UID_PATTERN = re.compile(rb"UID (\d+)")
+
+# Matches "NAME number" pairs in a STATUS response
+STATUS_ITEM_PATTERN = re.compile(rb"(UIDVALIDITY|UIDNEXT|HIGHESTMODSEQ|MESSAGES|UNSEEN) (\d+)")
+
+# Splits FETCH response text into parentheses, quoted strings and atoms such as BODY[1.2]<0>
+FETCH_TOKEN_PATTERN = re.compile(rb'[()]|"(?:[^"\\]|\\.)*"|[^\s()"\[\]]+(?:\[[^\]]*\](?:<[\d.]+>)?)?')
+
+# Literal size announced at the end of a response line, e.g. b'{512}'
+LITERAL_PATTERN = re.compile(rb"\{\d+\}$")
+
+# Header fields needed to parse an email when only its text part is fetched
+PARTIAL_HEADER_FIELDS = ("SUBJECT", "MESSAGE-ID")
+
+# Untagged responses that announce new messages while idling
+NEW_MAIL_PATTERN = re.compile(rb"^\* \d+ (EXISTS|RECENT)")
+
+# Servers may drop IDLE after 30 minutes (RFC 2177), so re-issue it before that
+IDLE_TIMEOUT = 25 * 60
+
+# Pooled connections older than this (seconds) are logged out and replaced
+MAX_CONNECTION_AGE = 10 * 60
+
+logger = logging.getLogger('bug_tracker')
+
+
+def chunked(items, size):
+    """
+    Split a list into consecutive chunks of at most `size` items.
+
+    Args:
+        items (list): Items to split
+        size (int): Maximum number of items per chunk
+
+    Yields:
+        list: The next chunk of items
+    """
+    size = max(1, int(size))
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def parse_fetch_response(data):
+    """
+    Split a multi-message UID FETCH response into (uid, raw_message) pairs.
+
+    imaplib returns one (header, literal) tuple per message literal, followed
+    by a closing b')' entry. The UID is read from the header line of each
+    tuple; entries without a literal or without a UID are ignored.
+
+    Args:
+        data (list): Response data as returned by mail.uid('FETCH', ...)
+
+    Returns:
+        list: List of (uid, raw_message) tuples, uid as bytes
+    """
+    messages = []
+    for entry in data or []:
+        if not isinstance(entry, tuple) or len(entry) < 2:
+            continue
+        uid_match = UID_PATTERN.search(entry[0])
+        if not uid_match:
+            continue
+        messages.append((uid_match.group(1), entry[1]))
+    return messages
+
+
+def _tokenize(text):
+    """Split FETCH response text into ("(", None), (")", None) and ("value", bytes) tokens."""
+    tokens = []
+    for token in FETCH_TOKEN_PATTERN.findall(text):
+        if token in (b"(", b")"):
+            tokens.append((token.decode(), None))
+        elif token.startswith(b'"'):
+            tokens.append(("value", re.sub(rb'\\(.)', rb"\1", token[1:-1])))
+        else:
+            tokens.append(("value", None if token.upper() == b"NIL" else token))
+    return tokens
+
+
+def _parse_list(tokens, position):
+    """Build a nested list from tokens, starting after an opening parenthesis."""
+    items = []
+    while position < len(tokens):
+        kind, value = tokens[position]
+        position += 1
+        if kind == ")":
+            break
+        if kind == "(":
+            value, position = _parse_list(tokens, position)
+        items.append(value)
+    return items, position
+
+
+def parse_fetch_items(data):
+    """
+    Parse a UID FETCH response into one dict of data items per message.
+
+    Unlike parse_fetch_response(), this understands responses with several
+    data items and literals per message, such as
+    (UID 7 BODYSTRUCTURE (...) BODY[HEADER.FIELDS (SUBJECT)] {24}).
+    Lists become Python lists, NIL becomes None and strings and literals
+    stay bytes.
+
+    Args:
+        data (list): Response data as returned by mail.uid('FETCH', ...)
+
+    Returns:
+        list: One dict per message mapping upper-case item names, e.g.
+              "UID" or "BODY[1.2]", to their values
+    """
+    tokens = []
+    for entry in data or []:
+        if isinstance(entry, tuple) and len(entry) >= 2:
+            tokens.extend(_tokenize(LITERAL_PATTERN.sub(b"", entry[0].rstrip())))
+            tokens.append(("value", entry[1]))
+        elif isinstance(entry, bytes):
+            tokens.extend(_tokenize(entry))
+
+    messages = []
+    position = 0
+    while position < len(tokens):
+        kind, _ = tokens[position]
+        position += 1
+        if kind != "(":
+            continue  # Message sequence numbers
+        items, position = _parse_list(tokens, position)
+        messages.append({
+            name.decode().upper(): value
+            for name, value in zip(items[::2], items[1::2])
+            if isinstance(name, bytes)
+        })
+    return messages
+
+
+def fetch_item(items, name):
+    """
+    Return a data item of a parse_fetch_items() message by name prefix.
+
+    Servers echo BODY.PEEK[...] as BODY[...] and may append an origin
+    such as <0>, so items are looked up by prefix.
+
+    Args:
+        items (dict): One message from parse_fetch_items()
+        name (str): Item name prefix, e.g. "BODY[HEADER" or "BODY[1.2]"
+
+    Returns:
+        The item value, or None if the message has no such item
+    """
+    return next((value for key, value in items.items() if key.startswith(name)), None)
+
+
+def _text(value):
+    """Decode a BODYSTRUCTURE string, treating NIL as an empty string."""
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else ""
+
+
+def _is_multipart(body):
+    """A multipart BODYSTRUCTURE starts with the list of its parts."""
+    return isinstance(body, list) and bool(body) and isinstance(body[0], list)
+
+
+def _flatten(value):
+    """Yield every string nested in a BODYSTRUCTURE value."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _flatten(item)
+    elif isinstance(value, bytes):
+        yield _text(value)
+
+
+def _part_info(section, body):
+    """Describe a single-part BODYSTRUCTURE entry."""
+    params = body[2] if isinstance(body[2], list) else []
+    params = {_text(name).lower(): _text(value) for name, value in zip(params[::2], params[1::2])}
+    return {
+        "section": section,
+        "type": f"{_text(body[0])}/{_text(body[1])}".lower(),
+        "charset": params.get("charset"),
+        "encoding": _text(body[5]) or "7BIT",
+    }
+
+
+def _find_in_parts(body, section):
+    """Depth-first search for the first text/plain part that is not an attachment."""
+    if _is_multipart(body):
+        children = takewhile(lambda part: isinstance(part, list), body)
+        for number, child in enumerate(children, start=1):
+            found = _find_in_parts(child, f"{section}.{number}" if section else str(number))
+            if found:
+                return found
+        return None
+    if not isinstance(body, list) or len(body) < 7:
+        return None
+
+    media_type = f"{_text(body[0])}/{_text(body[1])}".lower()
+    if media_type == "text/plain":
+        disposition = body[9] if len(body) > 9 else None
+        if not any("attachment" in text.lower() for text in _flatten(disposition)):
+            return _part_info(section, body)
+    elif media_type == "message/rfc822" and len(body) > 8 and isinstance(body[8], list):
+        # Parts of an encapsulated message are numbered below its own section;
+        # a single-part encapsulated body is part 1
+        inner = body[8]
+        return _find_in_parts(inner, section if _is_multipart(inner) else f"{section}.1")
+    return None
+
+
+def find_text_part(structure):
+    """
+    Locate the part of a message that becomes the bug description.
+
+    Mirrors Command.parse_email(): the first text/plain part without an
+    attachment disposition of a multipart message, or the whole body of a
+    single-part message.
+
+    Args:
+        structure (list): BODYSTRUCTURE as returned by parse_fetch_items()
+
+    Returns:
+        dict: "section" to fetch (e.g. "1.1" or "TEXT"), "type", "charset"
+              and "encoding" of the part, or None if there is no such part
+    """
+    if _is_multipart(structure):
+        return _find_in_parts(structure, "")
+    if isinstance(structure, list) and len(structure) >= 7:
+        return _part_info("TEXT", structure)
+    return None
+
+
+def text_part_message(header, part, body):
+    """
+    Rebuild a minimal RFC822 message from a partial fetch.
+
+    The result has the fetched header fields and the text part as its only
+    body, so it parses to the same subject and description as the full
+    message without the attachments ever being downloaded.
+
+    Args:
+        header (bytes): Fetched header fields, e.g. b"Subject: ...\r\n\r\n"
+        part (dict): Part description from find_text_part(), or None
+        body (bytes): Content of the part, still transfer-encoded
+
+    Returns:
+        bytes: Message suitable for email.message_from_bytes()
+    """
+    lines = [header.rstrip(b"\r\n")] if header and header.strip() else []
+    if part is not None:
+        content_type = part["type"]
+        if part["charset"]:
+            content_type += '; charset="%s"' % part["charset"].replace('"', "")
+        lines.append(f"Content-Type: {content_type}".encode())
+        lines.append(f"Content-Transfer-Encoding: {part['encoding']}".encode())
+    return b"\r\n".join(lines) + b"\r\n\r\n" + (body or b"")
+
+
+def mailbox_status(mail, mailbox, items=("UIDVALIDITY", "UIDNEXT")):
+    """
+    Read mailbox counters with a single STATUS command.
+
+    Args:
+        mail (imaplib.IMAP4): Authenticated IMAP client
+        mailbox (str): Mailbox name
+        items (tuple): STATUS data items to request
+
+    Returns:
+        dict: Requested items mapped to ints, e.g. {"UIDVALIDITY": 1, "UIDNEXT": 42},
+              or None if the server rejected the command or omitted an item
+    """
+    try:
+        status, data = mail.status(mailbox, f"({' '.join(items)})")
+    except Exception as e:
+        logger.info(f"STATUS {mailbox} failed: {str(e)}")
+        return None
+    if status != "OK" or not data or not isinstance(data[0], bytes):
+        return None
+
+    values = {
+        name.decode(): int(value) for name, value in STATUS_ITEM_PATTERN.findall(data[0])
+    }
+    if any(item not in values for item in items):
+        return None
+    return values
+
+
+def compress_uid_set(uids):
+    """
+    Build a compact IMAP UID set from a list of UIDs.
+
+    Consecutive UIDs are collapsed into ranges, so [1, 2, 3, 5, 8, 9]
+    becomes "1:3,5,8:9". This keeps commands such as UID STORE short even
+    when they cover thousands of messages.
+
+    Args:
+        uids (list): UIDs as bytes, str or int
+
+    Returns:
+        str: IMAP sequence set, empty string if `uids` is empty
+    """
+    numbers = sorted({int(uid) for uid in uids})
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ",".join(
+        str(start) if start == end else f"{start}:{end}" for start, end in ranges
+    )
+
+
+def wait_for_new_mail(mail, timeout=IDLE_TIMEOUT):
+    """
+    Block in IMAP IDLE until the server reports new mail or `timeout` expires.
+
+    imaplib (before Python 3.14) has no IDLE support, so the command is
+    driven by hand: send IDLE, wait for untagged EXISTS/RECENT responses on
+    the socket, then send DONE and consume the tagged completion.
+
+    Args:
+        mail (imaplib.IMAP4): Authenticated client with a mailbox selected
+        timeout (float): Maximum number of seconds to stay in IDLE
+
+    Returns:
+        bool: True if new mail was announced, False if the timeout expired
+
+    Raises:
+        imaplib.IMAP4.error: If the server rejects or fails the IDLE command
+        imaplib.IMAP4.abort: If the connection drops while idling
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    response = mail.readline()
+    if not response.startswith(b"+"):
+        raise imaplib.IMAP4.error(f"IDLE rejected: {response!r}")
+
+    new_mail = False
+    deadline = time.monotonic() + timeout
+    while not new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # SSL sockets may hold decrypted data that select() cannot see
+        pending = getattr(mail.sock, "pending", lambda: 0)()
+        if not pending and not select.select([mail.sock], [], [], remaining)[0]:
+            break
+        if NEW_MAIL_PATTERN.match(mail.readline()):
+            new_mail = True
+
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if line.startswith(tag + b" "):
+            if not line[len(tag) + 1:].startswith(b"OK"):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+            return new_mail
+        if NEW_MAIL_PATTERN.match(line):
+            new_mail = True
+
+
+def wait_for_mail(mail, timeout=IDLE_TIMEOUT):
+    """
+    Wait for new mail, falling back to a plain sleep without IDLE support.
+
+    Args:
+        mail (imaplib.IMAP4): Authenticated client with a mailbox selected
+        timeout (float): Maximum number of seconds to wait
+
+    Returns:
+        bool: True if an ingestion pass should run now
+    """
+    if "IDLE" not in mail.capabilities:
+        time.sleep(timeout)
+        return True
+    return wait_for_new_mail(mail, timeout)
+
+
+class IMAPConnectionPool:
+    """
+    Per-process pool of authenticated IMAP connections.
+
+    Celery worker processes run process_emails_task over and over; keeping
+    the connection open between runs saves a TLS handshake and LOGIN on
+    every poll. Idle connections are checked with NOOP before being handed
+    out and replaced when the check fails or they exceed `max_age`.
+
+    A connection is logged in to one account and has one mailbox selected,
+    so idle connections are kept per mailbox, under the checkpoint_key() of
+    its IMAPSource, and only handed out again for the same mailbox.
+
+    The pool remembers the process that created its connections. After a
+    fork the child starts with an empty pool instead of sharing the
+    parent's sockets.
+    """
+
+    def __init__(self, max_age=MAX_CONNECTION_AGE, max_size=1):
+        self.max_age = max_age
+        self.max_size = max_size  # Idle connections kept per mailbox
+        self._idle = {}  # mailbox key -> (connection, created_at) pairs ready for reuse
+        self._created = {}  # id(connection) -> (created_at, mailbox key) for checked-out connections
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self, key, connect):
+        """
+        Return a healthy connection, opening a new one if none can be reused.
+
+        Args:
+            key (str): Mailbox the connection is for, see IMAPSource.checkpoint_key()
+            connect (callable): Opens, authenticates and selects a new
+                connection to that mailbox; returns None on failure
+
+        Returns:
+            imaplib.IMAP4: Ready connection, or None if `connect` failed
+        """
+        with self._lock:
+            self._check_process()
+            idle = self._idle.get(key, [])
+            while idle:
+                mail, created_at = idle.pop()
+                if time.monotonic() - created_at > self.max_age or not self._is_healthy(mail):
+                    self._close(mail)
+                    continue
+                self._created[id(mail)] = (created_at, key)
+                return mail
+
+        mail = connect()
+        if mail is not None:
+            with self._lock:
+                self._created[id(mail)] = (time.monotonic(), key)
+        return mail
+
+    def release(self, mail):
+        """
+        Return a connection to the pool, or close it if it cannot be kept.
+
+        Args:
+            mail (imaplib.IMAP4): Connection obtained from acquire()
+        """
+        with self._lock:
+            created_at, key = self._created.pop(id(mail), (None, None))
+            idle = self._idle.setdefault(key, [])
+            if (
+                created_at is None
+                or os.getpid() != self._pid
+                or len(idle) >= self.max_size
+                or time.monotonic() - created_at > self.max_age
+            ):
+                self._close(mail)
+                return
+            idle.append((mail, created_at))
+
+    def discard(self, mail):
+        """Close a connection that should not be reused, e.g. after an error."""
+        with self._lock:
+            self._created.pop(id(mail), None)
+        self._close(mail)
+
+    def close_all(self):
+        """Log out all idle connections, e.g. when a worker process shuts down."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for mail, _ in connections:
+                self._close(mail)
+
+    def _check_process(self):
+        """Forget connections inherited from a parent process after a fork."""
+        if os.getpid() != self._pid:
+            self._idle = {}
+            self._created = {}
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _is_healthy(mail):
+        """Check a connection with NOOP."""
+        try:
+            return mail.noop()[0] == "OK"
+        except Exception as e:
+            logger.info(f"Discarding pooled IMAP connection: {str(e)}")
+            return False
+
+    @staticmethod
+    def _close(mail):
+        """Log out, ignoring errors from connections that are already dead."""
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+
+# Connection pool shared by all ingestion runs in this process
+connection_pool = IMAPConnectionPool()
@@ -0,0 +1,401 @@
+"""
+Email ingestion as separate fetch, parse, classify and persist stages.
+
+process_emails works through a mailbox batch by batch, doing all the work
+for a batch in one place. This service splits the same work into stages
+that can be run, retried, scaled and timed on their own:
+
+    fetch     download emails by UID and stage their raw content
+    parse     extract bug ID, subject and description
+    classify  detect status and priority
+    persist   store the bugs and ProcessedMessage keys, flag the emails read
+
+Stages pass each other a compact JSON envelope instead of messages:
+
+    {"emails": 3, "messages": [{"uid": "7", "key": "<message_key>"}, ...]}
+
+Everything else waits in a MessageStore under the email's message_key():
+fetch stages the raw email under the key itself; parse reads it back and
+stores "bug_id", "subject" and "description" as JSON under key + ":parsed";
+classify adds "status" and "priority" under key + ":classified"; persist
+reads those fields back and deletes all three. The envelope only carries
+markers of how far each email got: "parsed" and "classified", "skipped"
+for emails stored by an earlier run, which are only flagged, and "error"
+for an email that cannot be parsed, which is left unread like in
+process_emails.
+
+run_pipeline() runs all stages in this process with an in-memory store.
+issues.tasks.pipeline_chain() runs them as chained Celery tasks with a
+Redis or database store, so raw emails never travel through the broker.
+"""
+import email
+import json
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.utils.timezone import now
+from issues import classifier
+from issues.imap import chunked, connection_pool
+from issues.locks import redis_client
+from issues.management.commands.process_emails import Command as ProcessEmailsCommand
+from issues.management.commands.process_emails import FETCH_BATCH_SIZE, message_key
+from issues.models import StagedMessage
+
+# Seconds a staged raw email is kept for the stages after fetch
+STAGE_TTL = 3600
+
+# Prefix of the Redis keys that hold staged emails
+KEY_PREFIX = "bug-tracker:staged:"
+
+# Suffixes of the store keys that hold the fields of the parse and classify stages
+PARSED_SUFFIX = ":parsed"
+CLASSIFIED_SUFFIX = ":classified"
+
+# Get a logger for the ingestion service
+logger = logging.getLogger('bug_tracker')
+
+
+class LocalMessageStore:
+    """Staged emails in a dict, for stages that run in the same process."""
+
+    def __init__(self):
+        self.messages = {}
+
+    def put_many(self, messages):
+        """Stage raw emails, given as a dict of message_key() -> raw_email."""
+        self.messages.update(messages)
+
+    def get_many(self, keys):
+        """Return a dict of the staged raw emails among `keys`."""
+        return {key: self.messages[key] for key in keys if key in self.messages}
+
+    def delete_many(self, keys):
+        """Drop staged emails."""
+        for key in keys:
+            self.messages.pop(key, None)
+
+
+class RedisMessageStore:
+    """
+    Staged emails as Redis keys that expire after STAGE_TTL.
+
+    Args:
+        url (str): Redis URL from INGEST_STAGE_URL
+    """
+
+    def __init__(self, url):
+        self.client = redis_client(url)
+
+    def put_many(self, messages):
+        """Stage raw emails, given as a dict of message_key() -> raw_email."""
+        pipeline = self.client.pipeline(transaction=False)
+        for key, raw_email in messages.items():
+            pipeline.set(KEY_PREFIX + key, raw_email, ex=STAGE_TTL)
+        pipeline.execute()
+
+    def get_many(self, keys):
+        """Return a dict of the staged raw emails among `keys`."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([KEY_PREFIX + key for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def delete_many(self, keys):
+        """Drop staged emails."""
+        keys = [KEY_PREFIX + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+
+class DatabaseMessageStore:
+    """Staged emails as StagedMessage rows."""
+
+    def put_many(self, messages):
+        """Stage raw emails, given as a dict of message_key() -> raw_email."""
+        StagedMessage.objects.filter(created_at__lt=now() - timedelta(seconds=STAGE_TTL)).delete()
+        StagedMessage.objects.bulk_create(
+            [StagedMessage(key=key, raw=raw_email) for key, raw_email in messages.items()],
+            ignore_conflicts=True,
+        )
+
+    def get_many(self, keys):
+        """Return a dict of the staged raw emails among `keys`."""
+        return {
+            key: bytes(raw_email)
+            for key, raw_email in StagedMessage.objects.filter(key__in=list(keys)).values_list("key", "raw")
+        }
+
+    def delete_many(self, keys):
+        """Drop staged emails."""
+        StagedMessage.objects.filter(key__in=list(keys)).delete()
+
+
+def get_message_store():
+    """
+    Return the store for the backend configured in INGEST_STAGE_URL.
+
+    Returns:
+        RedisMessageStore or DatabaseMessageStore: Store shared by all workers
+    """
+    url = getattr(settings, "INGEST_STAGE_URL", None)
+    if url:
+        return RedisMessageStore(url)
+    return DatabaseMessageStore()
+
+
+def put_fields(store, fields, suffix):
+    """
+    Stage the results of a stage as JSON, next to the raw emails.
+
+    Args:
+        store: Message store of the pipeline
+        fields (dict): message_key() -> dict of bug fields
+        suffix (str): PARSED_SUFFIX or CLASSIFIED_SUFFIX
+    """
+    store.put_many({key + suffix: json.dumps(value).encode() for key, value in fields.items()})
+
+
+def get_fields(store, keys, suffix):
+    """
+    Read back the results of a stage staged by put_fields().
+
+    Args:
+        store: Message store of the pipeline
+        keys (iterable): message_key() of the emails
+        suffix (str): PARSED_SUFFIX or CLASSIFIED_SUFFIX
+
+    Returns:
+        dict: message_key() -> dict of bug fields, for the keys still staged
+    """
+    staged = store.get_many(key + suffix for key in keys)
+    return {key[:-len(suffix)]: json.loads(value) for key, value in staged.items()}
+
+
+def fetch(uids, processor=None, store=None):
+    """
+    Download emails, skip the ones stored before and stage the rest.
+
+    Args:
+        uids (list): UIDs of the emails as strings
+        processor (ProcessEmailsCommand): Command whose connection settings,
+                                          fetch mode and stats to use
+        store: Message store to stage the raw emails in
+
+    Returns:
+        dict: Envelope with the number of "emails" asked for and a message
+              reference per fetched email, in UID order
+
+    Raises:
+        ConnectionError: If no connection to the email server could be made
+    """
+    processor = processor or ProcessEmailsCommand()
+    store = store or get_message_store()
+    mail = connection_pool.acquire(processor.checkpoint_key(), processor.connect_to_email)
+    if not mail:
+        raise ConnectionError("Failed to connect to email server.")
+
+    messages = []
+    try:
+        for batch in processor.fetch_emails(mail, [uid.encode() for uid in uids], FETCH_BATCH_SIZE):
+            keys = {email_id: message_key(raw_email) for email_id, raw_email in batch}
+            with processor.stats.time("dedupe"):
+                fresh, skipped_ids = processor.skip_processed(batch, keys)
+            store.put_many({keys[email_id]: raw_email for email_id, raw_email in fresh})
+            skipped_ids = set(skipped_ids)
+            for email_id, _ in batch:
+                reference = {"uid": email_id.decode(), "key": keys[email_id]}
+                if email_id in skipped_ids:
+                    reference["skipped"] = True
+                messages.append(reference)
+    except Exception:
+        connection_pool.discard(mail)
+        raise
+    connection_pool.release(mail)
+    return {"emails": len(uids), "messages": messages}
+
+
+def parse(envelope, processor=None, store=None):
+    """
+    Extract bug ID, subject and description from the staged emails.
+
+    Args:
+        envelope (dict): Result of fetch()
+        processor (ProcessEmailsCommand): Command whose parse_email() and stats to use
+        store: Message store the emails were staged in
+
+    Returns:
+        dict: The envelope with each message marked "parsed", its fields
+              staged under PARSED_SUFFIX, or with an "error" if it could
+              not be parsed
+    """
+    processor = processor or ProcessEmailsCommand()
+    store = store or get_message_store()
+    staged = store.get_many(
+        message["key"] for message in envelope["messages"] if not message.get("skipped")
+    )
+    messages = []
+    parsed = {}
+    for message in envelope["messages"]:
+        message = dict(message)
+        messages.append(message)
+        if message.get("skipped"):
+            continue
+        raw_email = staged.get(message["key"])
+        if raw_email is None:
+            message["error"] = "Staged email expired before it was parsed"
+            processor.report_parsed(message["uid"].encode(), None, message["error"])
+            continue
+        started = time.perf_counter()
+        try:
+            bug_id, subject, description = processor.parse_email(email.message_from_bytes(raw_email))
+        except Exception as e:
+            message["error"] = str(e)
+            processor.report_parsed(message["uid"].encode(), None, message["error"])
+            continue
+        processor.stats.observe("parse", time.perf_counter() - started, len(raw_email))
+        parsed[message["key"]] = {"bug_id": bug_id, "subject": subject, "description": description}
+        message["parsed"] = True
+    put_fields(store, parsed, PARSED_SUFFIX)
+    return {**envelope, "messages": messages}
+
+
+def classify(envelope, processor=None, store=None):
+    """
+    Detect the status and priority of the parsed emails.
+
+    Args:
+        envelope (dict): Result of parse()
+        processor (ProcessEmailsCommand): Command whose output and stats to use
+        store: Message store the parsed fields were staged in
+
+    Returns:
+        dict: The envelope with each parsed message marked "classified",
+              its fields with "status" and "priority" staged under
+              CLASSIFIED_SUFFIX
+    """
+    processor = processor or ProcessEmailsCommand()
+    store = store or get_message_store()
+    parsed = get_fields(
+        store, (message["key"] for message in envelope["messages"] if message.get("parsed")), PARSED_SUFFIX
+    )
+    messages = []
+    classified = {}
+    for message in envelope["messages"]:
+        message = dict(message)
+        messages.append(message)
+        if not message.get("parsed"):
+            continue
+        fields = parsed.get(message["key"])
+        if fields is None:
+            message["error"] = "Staged email expired before it was classified"
+            processor.report_parsed(message["uid"].encode(), None, message["error"])
+            continue
+        with processor.stats.time("classify"):
+            fields["status"], fields["priority"] = classifier.classify(fields["subject"], fields["description"])
+        processor.report_parsed(message["uid"].encode(), bug_data(fields))
+        classified[message["key"]] = fields
+        message["classified"] = True
+    put_fields(store, classified, CLASSIFIED_SUFFIX)
+    return {**envelope, "messages": messages}
+
+
+def persist(envelope, processor=None, store=None):
+    """
+    Store the classified emails in one transaction and flag them as read.
+
+    Emails that were skipped as stored before are flagged too; emails that
+    could not be parsed stay unread so a later run tries them again, until
+    they fail often enough to be quarantined, see issues.quarantine.
+
+    Args:
+        envelope (dict): Result of classify()
+        processor (ProcessEmailsCommand): Command whose store_batch() and stats to use
+        store: Message store the emails were staged in
+
+    Returns:
+        dict: Number of "emails" asked for, how many were "fetched" and
+              how many were "processed" (stored or stored before), like
+              issues.tasks.process_email_chunk()
+    """
+    processor = processor or ProcessEmailsCommand()
+    store = store or get_message_store()
+    messages = envelope["messages"]
+    keys = {message["uid"].encode(): message["key"] for message in messages}
+    errors = {message["uid"].encode(): message["error"] for message in messages if "error" in message}
+    classified = get_fields(
+        store, (message["key"] for message in messages if message.get("classified")), CLASSIFIED_SUFFIX
+    )
+    for message in messages:
+        if message.get("classified") and message["key"] not in classified:
+            errors[message["uid"].encode()] = "Staged email expired before it was stored"
+    staged = store.get_many(keys[email_id] for email_id in errors)
+    prepared = {
+        "email_ids": [message["uid"].encode() for message in messages],
+        "parsed": [
+            (message["uid"].encode(), bug_data(classified[message["key"]]))
+            for message in messages
+            if message["key"] in classified
+        ],
+        "skipped_ids": [message["uid"].encode() for message in messages if message.get("skipped")],
+        "keys": keys,
+        "errors": errors,
+        # Raw content of failed emails, kept if they are quarantined
+        "raw": {email_id: staged.get(keys[email_id]) for email_id in errors},
+    }
+    read_ids = processor.store_batch(prepared)
+
+    if read_ids:
+        mail = connection_pool.acquire(processor.checkpoint_key(), processor.connect_to_email)
+        if mail:
+            processor.mark_as_read(mail, read_ids)
+            connection_pool.release(mail)
+        else:
+            # Stored emails are recognised by their ProcessedMessage key next time
+            logger.error(f"Could not flag {len(read_ids)} stored email(s) as read")
+    store.delete_many(
+        message["key"] + suffix for message in messages for suffix in ("", PARSED_SUFFIX, CLASSIFIED_SUFFIX)
+    )
+    return {"emails": envelope["emails"], "fetched": len(messages), "processed": len(read_ids)}
+
+
+def bug_data(fields):
+    """
+    Pick the bug fields of a classified email.
+
+    Args:
+        fields (dict): Fields staged by classify()
+
+    Returns:
+        dict: bug_id, subject, description, status and priority, as
+              returned by process_emails' parse_raw_email()
+    """
+    names = ("bug_id", "subject", "description", "status", "priority")
+    return {name: fields[name] for name in names if name in fields}
+
+
+def run_pipeline(uids, processor=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Run all stages in this process, one batch of UIDs at a time.
+
+    Args:
+        uids (list): UIDs of the emails as strings
+        processor (ProcessEmailsCommand): Command shared by the stages
+        batch_size (int): Number of emails that go through the stages together
+
+    Returns:
+        dict: Summed "emails", "fetched" and "processed" counts, see persist()
+    """
+    processor = processor or ProcessEmailsCommand()
+    store = LocalMessageStore()
+    totals = {"emails": len(uids), "fetched": 0, "processed": 0}
+    for batch in chunked(uids, batch_size):
+        envelope = fetch(batch, processor, store)
+        envelope = classify(parse(envelope, processor, store), processor, store)
+        result = persist(envelope, processor, store)
+        totals["fetched"] += result["fetched"]
+        totals["processed"] += result["processed"]
+        if result["fetched"] < result["emails"]:
+            break  # A failed FETCH; later emails are left for the next run
+    return totals
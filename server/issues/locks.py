@@ -0,0 +1,171 @@
+"""
+Lease locks that keep periodic tasks from running on top of each other.
+
+Celery beat starts process_emails_task on a fixed schedule, whether or not
+the previous run has finished. A run first takes a lease; an overlapping run
+finds it taken and returns right away. The lease expires after a TTL unless
+its holder extends it, which a run does each time it makes progress, so a
+long run keeps the lease while a crashed or stuck one loses it.
+
+With INGEST_LOCK_URL set, leases are Redis keys taken with SET NX PX and
+extended or released only by the holder of their token. Without it they are
+TaskLease rows, which is enough for tests and single-host deployments.
+"""
+import functools
+import uuid
+from datetime import timedelta
+import redis
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from issues.models import TaskLease
+
+# Seconds a lease stays valid unless its holder extends it
+LEASE_TTL = 60
+
+# Prefix of the Redis keys that hold leases
+KEY_PREFIX = "bug-tracker:lease:"
+
+# Lease held by the ingestion run in progress on a mailbox, see mailbox_lease()
+EMAIL_LEASE = "process-emails"
+
+# Extends or deletes a key only if it still holds the caller's token
+EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLost(Exception):
+    """Raised when a lease expired and was taken over while its run was still working."""
+
+
+@functools.lru_cache(maxsize=None)
+def redis_client(url):
+    """
+    Return a Redis client for `url`, one per process.
+
+    Args:
+        url (str): Redis URL, e.g. "redis://localhost:6379/0"
+
+    Returns:
+        redis.Redis: Client with its own connection pool
+    """
+    return redis.Redis.from_url(url)
+
+
+class RedisLease:
+    """
+    Lease stored as a Redis key with a millisecond expiry.
+
+    Args:
+        name (str): Name of the guarded task
+        token (str): Token of an existing holder, or None to create a new one
+        ttl (float): Seconds the lease stays valid without being extended
+        url (str): Redis URL from INGEST_LOCK_URL
+    """
+
+    def __init__(self, name, token=None, ttl=LEASE_TTL, url=None):
+        self.key = KEY_PREFIX + name
+        self.token = token or uuid.uuid4().hex
+        self.ttl_ms = int(ttl * 1000)
+        self.client = redis_client(url)
+
+    def acquire(self):
+        """Take the lease if nobody holds it; returns True on success."""
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    def extend(self):
+        """Reset the expiry of a held lease; returns False if it was lost."""
+        return bool(self.client.eval(EXTEND_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    def release(self):
+        """Give the lease up if it is still held."""
+        self.client.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+
+
+class DatabaseLease:
+    """
+    Lease stored as a TaskLease row.
+
+    Args:
+        name (str): Name of the guarded task
+        token (str): Token of an existing holder, or None to create a new one
+        ttl (float): Seconds the lease stays valid without being extended
+    """
+
+    def __init__(self, name, token=None, ttl=LEASE_TTL):
+        self.name = name
+        self.token = token or uuid.uuid4().hex
+        self.ttl = timedelta(seconds=ttl)
+
+    def acquire(self):
+        """Take the lease if nobody holds it or it expired; returns True on success."""
+        current = now()
+        # Taking over an expired lease is one conditional UPDATE, so only one
+        # of several competing runs can win it
+        if TaskLease.objects.filter(name=self.name, expires_at__lte=current).update(
+            token=self.token, expires_at=current + self.ttl
+        ):
+            return True
+        try:
+            with transaction.atomic():
+                TaskLease.objects.create(name=self.name, token=self.token, expires_at=current + self.ttl)
+            return True
+        except IntegrityError:
+            return False
+
+    def extend(self):
+        """Reset the expiry of a held lease; returns False if it was lost."""
+        return bool(
+            TaskLease.objects.filter(name=self.name, token=self.token).update(expires_at=now() + self.ttl)
+        )
+
+    def release(self):
+        """Give the lease up if it is still held."""
+        TaskLease.objects.filter(name=self.name, token=self.token).delete()
+
+
+def get_lease(name, token=None, ttl=LEASE_TTL):
+    """
+    Return a lease for the backend configured in INGEST_LOCK_URL.
+
+    Args:
+        name (str): Name of the guarded task
+        token (str): Token handed on by the run that acquired the lease, if any
+        ttl (float): Seconds the lease stays valid without being extended
+
+    Returns:
+        RedisLease or DatabaseLease: Lease object; call acquire() to take it
+    """
+    url = getattr(settings, "INGEST_LOCK_URL", None)
+    if url:
+        return RedisLease(name, token, ttl, url)
+    return DatabaseLease(name, token, ttl)
+
+
+def mailbox_lease(mailbox, token=None, ttl=LEASE_TTL):
+    """
+    Return the EMAIL_LEASE of one mailbox.
+
+    process_emails_task, the listen_emails listener and every MailboxEngine
+    session take it before they ingest a mailbox, so only one of them works
+    on a mailbox at a time while different mailboxes are ingested in parallel.
+
+    Args:
+        mailbox (str): checkpoint_key() of the mailbox
+        token (str): Token handed on by the run that acquired the lease, if any
+        ttl (float): Seconds the lease stays valid without being extended
+
+    Returns:
+        RedisLease or DatabaseLease: Lease object; call acquire() to take it
+    """
+    return get_lease(f"{EMAIL_LEASE}:{mailbox}", token, ttl)
@@ -0,0 +1,357 @@
+"""
+asyncio engine that ingests several IMAP mailboxes concurrently.
+
+Bug reports are routed into one mailbox per product. Reading them one after
+another makes every poll as slow as the sum of all mailboxes; this engine
+keeps one IMAP session per mailbox instead and runs them side by side:
+
+    mailbox session 1 --\\
+    mailbox session 2 ---+--> bounded queue --> database writer
+    mailbox session N --/
+
+Each session logs in, catches up on new mail, then waits in IDLE (or sleeps
+on servers without IDLE) and ingests again whenever mail arrives. Fetching
+and parsing happen in the session; the parsed batches of all sessions go
+through one bounded queue to a single writer, which stores each batch with
+process_emails' store_batch(). When the writer falls behind the queue fills
+up and sessions wait before fetching more, so memory stays bounded.
+
+imaplib and the Django ORM are blocking, so every session runs its IMAP
+commands in its own thread and all database access, reads included, runs in
+the writer's thread. A session only flags emails as read, on its own
+connection, once the writer has committed them.
+
+Each pass takes the lease of its mailbox, see issues.locks.mailbox_lease(),
+so a session and process_emails_task never ingest the same mailbox at once.
+"""
+import asyncio
+import functools
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import OutputWrapper
+from django.db import connections
+from issues.imap import IDLE_TIMEOUT, wait_for_mail
+from issues.locks import LeaseLost, mailbox_lease
+from issues.management.commands.process_emails import Command as ProcessEmailsCommand
+from issues.management.commands.process_emails import FETCH_BATCH_SIZE
+
+# Parsed batches that may wait for the database writer, across all mailboxes
+QUEUE_SIZE = 8
+
+# Seconds a session waits before reconnecting after its connection was lost
+RECONNECT_DELAY = 5
+
+# Seconds to wait before retrying a pass skipped while another run held the mailbox's lease
+LEASE_RETRY_DELAY = 5
+
+# Get a logger for the ingestion engine
+logger = logging.getLogger('bug_tracker')
+
+
+def next_prepared(processor, batches):
+    """
+    Fetch and prepare the next batch of a mailbox.
+
+    Args:
+        processor (ProcessEmailsCommand): Command of the mailbox session
+        batches (generator): fetch_emails() of the session
+
+    Returns:
+        dict: prepare_batch() result, or None when all batches were fetched
+    """
+    batch = next(batches, None)
+    if batch is None:
+        return None
+    return processor.prepare_batch(batch)
+
+
+def store_prepared(processor, prepared, checkpoint, state):
+    """
+    Extend the pass's lease, store a prepared batch and count the emails
+    it took care of.
+
+    Args:
+        processor (ProcessEmailsCommand): Command of the mailbox session
+        prepared (dict): prepare_batch() result
+        checkpoint (MailboxCheckpoint): Sync position to advance, if any
+        state (dict): Pass state with the "lease", whose "stored" count is increased
+
+    Returns:
+        list: UIDs to flag as read, see store_batch()
+
+    Raises:
+        LeaseLost: If the lease expired and another run took it
+    """
+    if not state["lease"].extend():
+        raise LeaseLost(f"Lost the lease of {processor.imap_source} after {state['stored']} email(s)")
+    read_ids = processor.store_batch(prepared, checkpoint)
+    state["stored"] += len(read_ids)
+    return read_ids
+
+
+def sync_stored(processor, checkpoint, status, state, fetched, found):
+    """
+    Sync the checkpoint of a pass once its batches were stored.
+
+    Runs as the pass's last write, so the batches' counts are final; an
+    email that failed keeps the checkpoint where it is, see sync_checkpoint().
+
+    Args:
+        processor (ProcessEmailsCommand): Command of the mailbox session
+        checkpoint (MailboxCheckpoint): Checkpoint from fetch_new_emails(), or None
+        status (dict): STATUS response from fetch_new_emails()
+        state (dict): Pass state with the "stored" count
+        fetched (int): Number of emails fetched by the pass
+        found (int): Number of emails found by the pass
+    """
+    processor.sync_checkpoint(checkpoint, status, fetched == found and state["stored"] == fetched)
+
+
+class MailboxEngine:
+    """
+    Poll or IDLE several IMAP mailboxes concurrently and store their emails.
+
+    Args:
+        sources (list): IMAPSource of each mailbox
+        batch_size (int): Maximum number of UIDs per FETCH command
+        queue_size (int): Parsed batches that may wait for the database writer
+        idle_timeout (float): Seconds to stay in IDLE before re-issuing it
+        reconnect_delay (float): Seconds to wait after a connection failure
+        lease_retry_delay (float): Seconds to wait before retrying a pass
+            skipped while another run held the mailbox's lease
+        wait (callable): wait(mail, timeout) -> bool, waits for new mail in IDLE
+        stdout, stderr: Output streams of the calling command, sys.stdout
+            and sys.stderr by default
+    """
+
+    def __init__(self, sources, batch_size=FETCH_BATCH_SIZE, queue_size=QUEUE_SIZE,
+                 idle_timeout=IDLE_TIMEOUT, reconnect_delay=RECONNECT_DELAY,
+                 lease_retry_delay=LEASE_RETRY_DELAY, wait=wait_for_mail, stdout=None, stderr=None):
+        self.sources = sources
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self.reconnect_delay = reconnect_delay
+        self.lease_retry_delay = lease_retry_delay
+        self.wait = wait
+        self.stdout = stdout or OutputWrapper(sys.stdout)
+        self.stderr = stderr or OutputWrapper(sys.stderr)
+        self.queue = None
+        self.database = None
+        self.parse_pool_owner = None
+
+    def run(self, parse_workers=0, max_cycles=0):
+        """
+        Run all mailbox sessions until each has done --max-cycles waits.
+
+        Args:
+            parse_workers (int): Parse emails in this many processes, shared by all mailboxes
+            max_cycles (int): Stop each session after this many waits (0 runs forever)
+        """
+        self.parse_pool_owner = ProcessEmailsCommand(stdout=self.stdout, stderr=self.stderr)
+        self.parse_pool_owner.start_parse_pool(parse_workers)
+        self.database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-db")
+        try:
+            asyncio.run(self.main(max_cycles))
+        finally:
+            self.database.submit(connections.close_all).result()
+            self.database.shutdown()
+            self.parse_pool_owner.stop_parse_pool()
+
+    async def main(self, max_cycles):
+        """
+        Start the database writer and one session per mailbox.
+
+        Args:
+            max_cycles (int): Stop each session after this many waits (0 runs forever)
+        """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        writer = asyncio.create_task(self.write())
+        try:
+            await asyncio.gather(*(self.session(source, max_cycles) for source in self.sources))
+        finally:
+            await self.queue.put(None)
+            await writer
+
+    def processor_for(self, source):
+        """
+        Create the process_emails command that reads one mailbox.
+
+        Args:
+            source (IMAPSource): Mailbox of the session
+
+        Returns:
+            ProcessEmailsCommand: Command sharing the parse pool and database thread
+        """
+        processor = ProcessEmailsCommand(stdout=self.stdout, stderr=self.stderr)
+        processor.imap_source = source
+        processor.database = self.database
+        processor.parse_pool = self.parse_pool_owner.parse_pool
+        processor.parse_workers = self.parse_pool_owner.parse_workers
+        return processor
+
+    async def session(self, source, max_cycles):
+        """
+        Run the connect / catch up / wait loop of one mailbox.
+
+        Connection failures are logged and followed by a reconnect after
+        `reconnect_delay` seconds; the other sessions keep running.
+
+        Args:
+            source (IMAPSource): Mailbox to read
+            max_cycles (int): Stop after this many waits (0 runs forever)
+        """
+        processor = self.processor_for(source)
+        thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"imap-{source.mailbox}")
+        loop = asyncio.get_running_loop()
+
+        def run(func, *args):
+            return loop.run_in_executor(thread, func, *args)
+
+        cycles = 0
+        try:
+            while not max_cycles or cycles < max_cycles:
+                mail = await run(processor.connect_to_email)
+                if not mail:
+                    cycles += 1
+                    await asyncio.sleep(self.reconnect_delay)
+                    continue
+
+                try:
+                    pending = await self.ingest(processor, mail, run) is None
+                    while not max_cycles or cycles < max_cycles:
+                        cycles += 1
+                        # A skipped pass is retried soon, new mail or not
+                        timeout = self.lease_retry_delay if pending else self.idle_timeout
+                        if await run(self.wait, mail, timeout) or pending:
+                            pending = await self.ingest(processor, mail, run) is None
+                    await run(mail.logout)
+                except Exception as e:
+                    logger.error(f"Connection to {source} lost: {str(e)}")
+                    self.stderr.write(f"Connection to {source} lost: {str(e)}")
+                    await asyncio.sleep(self.reconnect_delay)
+        finally:
+            thread.shutdown()
+
+    async def ingest(self, processor, mail, run):
+        """
+        Run one ingestion pass under the mailbox's lease.
+
+        The pass is skipped while another run, e.g. process_emails_task,
+        holds the lease, and stops early if the lease is lost.
+
+        Args:
+            processor (ProcessEmailsCommand): Command of the mailbox session
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            run (callable): Runs a function in the session's thread
+
+        Returns:
+            int: Number of new emails found, or None if the pass should be retried
+
+        Raises:
+            Exception: The first error of the writer, see ingest_pass()
+        """
+        database = functools.partial(asyncio.get_running_loop().run_in_executor, self.database)
+        lease = mailbox_lease(processor.checkpoint_key())
+        if not await database(lease.acquire):
+            logger.info(f"Email processing run in progress on {processor.imap_source}, retrying the pass later")
+            return None
+        try:
+            return await self.ingest_pass(processor, mail, run, lease)
+        except LeaseLost as e:
+            logger.error(str(e))
+            return None
+        finally:
+            await database(lease.release)
+
+    async def ingest_pass(self, processor, mail, run, lease):
+        """
+        Run one ingestion pass over the new emails of a mailbox.
+
+        Batches are fetched and parsed in the session's thread and queued for
+        the writer; the next batch is fetched while earlier ones are stored.
+        Once the writer has stored all of them, the emails are flagged as
+        read with one UID STORE and the pass's stage timings are stored.
+
+        Args:
+            processor (ProcessEmailsCommand): Command of the mailbox session
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            run (callable): Runs a function in the session's thread
+            lease (RedisLease or DatabaseLease): Lease of the mailbox, extended before every batch is stored
+
+        Returns:
+            int: Number of new emails found
+
+        Raises:
+            Exception: The first error of the writer, after the stored emails were flagged
+        """
+        checkpoint, email_ids, status = await run(processor.fetch_new_emails, mail)
+        batches = processor.fetch_emails(mail, email_ids, self.batch_size)
+        state = {"failed": False, "stored": 0, "lease": lease}
+        writes = []
+        fetched = 0
+        while True:
+            prepared = await run(next_prepared, processor, batches)
+            if prepared is None:
+                break
+            fetched += len(prepared["email_ids"])
+            writes.append(await self.submit(
+                state, functools.partial(store_prepared, processor, prepared, checkpoint, state)
+            ))
+        writes.append(await self.submit(
+            state,
+            functools.partial(sync_stored, processor, checkpoint, status, state, fetched, len(email_ids)),
+        ))
+
+        read_ids, error = [], None
+        for write in writes:
+            try:
+                read_ids += await write or []
+            except Exception as e:
+                error = error or e
+        await run(processor.mark_as_read, mail, read_ids)
+        if error is not None:
+            raise error
+        await asyncio.get_running_loop().run_in_executor(
+            self.database, processor.save_stats, "listen_emails", len(email_ids)
+        )
+        return len(email_ids)
+
+    async def submit(self, state, job):
+        """
+        Queue a write for the database writer, waiting while the queue is full.
+
+        Args:
+            state (dict): Pass state shared by the writes of one ingestion pass
+            job (callable): Function that writes to the database
+
+        Returns:
+            asyncio.Future: Resolves to the return value of `job`
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((state, job, future))
+        return future
+
+    async def write(self):
+        """
+        Store queued batches one after another in the database thread.
+
+        Once a write of an ingestion pass fails, the remaining writes of that
+        pass are dropped, so its checkpoint never moves past emails that were
+        not stored. Writes of other mailboxes are not affected.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            state, job, future = item
+            if state["failed"]:
+                future.set_result(None)
+                continue
+            try:
+                future.set_result(await loop.run_in_executor(self.database, job))
+            except Exception as e:
+                state["failed"] = True
+                future.set_exception(e)
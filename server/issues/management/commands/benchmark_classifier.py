@@ -0,0 +1,147 @@
+import re
+import time
+from django.core.management.base import BaseCommand, CommandError
+from issues import classifier
+
+# Filler sentence repeated to build large synthetic email bodies
+FILLER = "The application shows a blank page after login and the logs contain a stack trace. "
+
+# Subjects used for the benchmark; the last one only matches through the body
+SUBJECTS = [
+    "Bug ID: BUG-1 Status: closed",
+    "Bug ID: BUG-2 [in progress] Priority: Low",
+    "Bug ID: BUG-3 crash on save",
+]
+
+
+def legacy_extract_status(subject, description):
+    """
+    Reference implementation of status detection before issues.classifier.
+
+    Kept to compare speed and results against the compiled classifier.
+
+    Args:
+        subject (str): Email subject line
+        description (str): Email body text
+
+    Returns:
+        str: "open", "closed", "resolved" or "in_progress"
+    """
+    combined_text = f"{subject} {description}".lower()
+    status_patterns = [
+        r"(?:status|state)\s*:\s*(open|closed|resolved|in[-_\s]progress)",
+        r"\[(open|closed|resolved|in[-_\s]progress)\]",
+        r"(?:bug|issue|ticket) (?:is|has been|was) (open(?:ed)?|clos(?:ed|ing)|resolv(?:ed|ing)|in[-_\s]progress)",
+        r"\b(open(?:ed)?|clos(?:ed|ing)|resolv(?:ed|ing)|in[-_\s]progress)\b",
+    ]
+    for pattern in status_patterns:
+        match = re.search(pattern, combined_text, re.IGNORECASE)
+        if match:
+            status_text = match.group(1).lower()
+            if re.match(r"open(?:ed)?", status_text):
+                return "open"
+            elif re.match(r"clos(?:ed|ing)", status_text):
+                return "closed"
+            elif re.match(r"resolv(?:ed|ing)", status_text):
+                return "resolved"
+            elif re.match(r"in[-_\s]progress", status_text):
+                return "in_progress"
+    return "open"
+
+
+def legacy_determine_priority(subject, description):
+    """
+    Reference implementation of priority detection before issues.classifier.
+
+    Args:
+        subject (str): Email subject line
+        description (str): Email body text
+
+    Returns:
+        str: "High", "Medium" or "Low"
+    """
+    text = f"{subject} {description}".lower()
+    high_keywords = ["urgent", "high", "critical", "blocker", "emergency", "p1", "priority 1"]
+    medium_keywords = ["medium", "normal", "moderate", "p2", "priority 2"]
+    low_keywords = ["low", "minor", "trivial", "p3", "priority 3", "can wait"]
+    priority_match = re.search(r"priority\s*:\s*(high|medium|low)", text, re.IGNORECASE)
+    if priority_match:
+        return priority_match.group(1).capitalize()
+    for keyword in high_keywords:
+        if keyword in text:
+            return "High"
+    for keyword in medium_keywords:
+        if keyword in text:
+            return "Medium"
+    for keyword in low_keywords:
+        if keyword in text:
+            return "Low"
+    return "Medium"
+
+
+def legacy_classify(subject, description):
+    """Status and priority the way process_emails determined them before."""
+    return legacy_extract_status(subject, description), legacy_determine_priority(subject, description)
+
+
+class Command(BaseCommand):
+    """
+    Micro-benchmark of the email classifier against the previous implementation.
+
+    Builds synthetic email bodies of the requested size, classifies them with
+    both implementations, checks that the results agree and reports the
+    average time per email.
+    """
+    help = "Compare the compiled status/priority classifier with the previous implementation"
+
+    def add_arguments(self, parser):
+        """
+        Register command line options.
+
+        Args:
+            parser (argparse.ArgumentParser): Parser for this command
+        """
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=2_000_000,
+            help="Approximate size of each synthetic email body in bytes",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times each email is classified per implementation",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run the benchmark and print timings.
+
+        Args:
+            *args: Variable length argument list
+            **options: Command line options
+
+        Raises:
+            CommandError: If the two implementations disagree on any email
+        """
+        body = FILLER * max(1, options["size"] // len(FILLER)) + "Reported again, still resolving."
+        emails = [(subject, body) for subject in SUBJECTS]
+        repeat = max(1, options["repeat"])
+
+        timings = {}
+        results = {}
+        for name, classify in (("legacy", legacy_classify), ("compiled", classifier.classify)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results[name] = [classify(subject, description) for subject, description in emails]
+            timings[name] = (time.perf_counter() - start) / (repeat * len(emails))
+            self.stdout.write(f"{name}: {timings[name] * 1000:.2f} ms per email")
+
+        if results["legacy"] != results["compiled"]:
+            raise CommandError(f"Results differ: {results['legacy']} != {results['compiled']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Classified {len(emails)} emails of {len(body)} bytes, "
+            f"speedup {timings['legacy'] / timings['compiled']:.1f}x"
+        ))
@@ -0,0 +1,395 @@
+import imaplib
+import json
+import random
+import sys
+import time
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.timezone import now
+from issues.fake_imap import FakeIMAPServer
+from issues.management.commands.process_emails import Command as ProcessEmailsCommand
+from issues.management.commands.process_emails import FETCH_BATCH_SIZE
+from issues.metrics import Histogram
+from issues.models import Bug
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Kinds of synthetic emails and their default share of the corpus
+DEFAULT_MIX = {"plain": 50, "attachment": 15, "charset": 20, "thread": 15}
+
+# Share of plain emails that update an earlier bug instead of reporting a new one
+UPDATE_SHARE = 0.2
+
+# Mailbox the benchmark reads; its checkpoint never collides with the real account's
+BENCHMARK_SOURCE = "imap://benchmark@benchmark.invalid/INBOX"
+
+# Text in other languages and a charset that can encode it, for "charset" emails
+FOREIGN_TEXTS = [
+    ("iso-8859-1", "Fehler beim Speichern: die Änderungen gehen verloren, sehr dringend."),
+    ("windows-1252", "L’application plante à l’ouverture du fichier – priorité haute."),
+    ("koi8-r", "Приложение падает при сохранении файла, ошибка критическая."),
+    ("shift_jis", "保存するとアプリがクラッシュします。至急対応をお願いします。"),
+    ("gb2312", "保存文件时程序崩溃，问题已解决。"),
+]
+
+# Sentences the synthetic bug reports are made of
+SENTENCES = [
+    "The application shows a blank page after login.",
+    "Saving a report fails with a stack trace in the logs.",
+    "This is urgent, customers are blocked.",
+    "Minor layout issue on the settings page, can wait.",
+    "Status: in progress, a fix is being reviewed.",
+    "The bug is resolved in the latest build.",
+    "Priority: low",
+    "Steps to reproduce: open the dashboard and refresh twice.",
+]
+
+
+def parse_mix(value):
+    """
+    Parse the --mix option.
+
+    Args:
+        value (str): Comma-separated kind=weight pairs, e.g. "plain=3,thread=1"
+
+    Returns:
+        dict: Weight of each kind in DEFAULT_MIX, 0 for kinds left out
+
+    Raises:
+        CommandError: If a kind is unknown or a weight is not a number
+    """
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for pair in value.split(","):
+        kind, _, weight = pair.partition("=")
+        kind = kind.strip()
+        if kind not in mix:
+            raise CommandError(f"Unknown email kind {kind!r}; use {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise CommandError(f"Weight of {kind} must be a number, got {weight!r}")
+    if not any(mix.values()):
+        raise CommandError("--mix needs at least one kind with a positive weight")
+    return mix
+
+
+def generate_corpus(count, mix=None, attachment_kb=256, thread_depth=30, seed=0):
+    """
+    Build a reproducible corpus of synthetic bug report emails.
+
+    Kinds of emails:
+        plain       short text/plain report; some update an earlier bug
+        attachment  multipart/mixed with a text part and a binary attachment
+        charset     report in another language and a non-UTF-8 charset,
+                    with an RFC 2047 encoded subject
+        thread      reply to an earlier report with In-Reply-To/References
+                    headers and a long chain of quoted replies
+
+    Args:
+        count (int): Number of emails
+        mix (dict): Weight of each kind, defaults to DEFAULT_MIX
+        attachment_kb (int): Size of each attachment in KiB
+        thread_depth (int): Number of earlier messages quoted in a reply
+        seed (int): Seed of the random generator; equal arguments give equal corpora
+
+    Returns:
+        list: (kind, raw_email) tuples in delivery order
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = [kind for kind in mix if mix[kind] > 0]
+    weights = [mix[kind] for kind in kinds]
+    corpus = []
+    for number in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        reported = number - 1 if number else 0
+        if kind == "thread" or (kind == "plain" and rng.random() < UPDATE_SHARE):
+            bug_number = rng.randint(0, reported)
+        else:
+            bug_number = number
+        text = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 6)))
+        subject = f"Bug ID: BENCH-{bug_number} - {text.split('.')[0]}"
+
+        if kind == "attachment":
+            # A fixed boundary keeps the corpus reproducible
+            msg = MIMEMultipart(boundary=f"=====bench-{number}-{rng.getrandbits(64):016x}=====")
+            msg.attach(MIMEText(text, "plain", "utf-8"))
+            attachment = MIMEApplication(rng.randbytes(attachment_kb * 1024), Name="dump.bin")
+            attachment["Content-Disposition"] = 'attachment; filename="dump.bin"'
+            msg.attach(attachment)
+        elif kind == "charset":
+            charset, foreign = rng.choice(FOREIGN_TEXTS)
+            msg = MIMEText(f"{foreign}\n{text}", "plain", charset)
+            subject = Header(f"Bug ID: BENCH-{bug_number} - {foreign[:20]}", charset)
+        elif kind == "thread":
+            subject = f"Re: {subject}"
+            quoted = [
+                f"On day {depth}, someone wrote:\n" + "> " * (depth + 1) + rng.choice(SENTENCES)
+                for depth in range(thread_depth)
+            ]
+            msg = MIMEText(text + "\n\n" + "\n".join(quoted), "plain", "utf-8")
+            references = " ".join(f"<bench-{bug_number}-{depth}@benchmark.invalid>" for depth in range(thread_depth))
+            msg["In-Reply-To"] = f"<bench-{bug_number}-{thread_depth - 1}@benchmark.invalid>"
+            msg["References"] = references
+        else:
+            msg = MIMEText(text, "plain", "utf-8")
+
+        msg["Subject"] = subject
+        msg["From"] = f"reporter{rng.randint(1, 50)}@benchmark.invalid"
+        msg["Message-ID"] = f"<bench-{number}@benchmark.invalid>"
+        corpus.append((kind, msg.as_bytes()))
+    return corpus
+
+
+def peak_rss_kb():
+    """
+    Return the peak resident set size of this process and its children.
+
+    Returns:
+        int: Peak RSS in KiB, or None where the resource module is missing
+    """
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class TimedProcessEmails(ProcessEmailsCommand):
+    """
+    process_emails that records the latency of every email.
+
+    An email's latency runs from the start of the UID FETCH that downloads
+    it until the transaction that stores it has committed, so it covers the
+    fetch, dedupe, parse, classify and write stages of its batch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self.run_stats = None
+        self.batch_started = None
+
+    def fetch_emails(self, mail, email_ids, batch_size=FETCH_BATCH_SIZE):
+        """Yield the batches of process_emails, noting when each FETCH started."""
+        batches = super().fetch_emails(mail, email_ids, batch_size)
+        while True:
+            started = time.perf_counter()
+            batch = next(batches, None)
+            if batch is None:
+                return
+            self.batch_started = started
+            yield batch
+
+    def process_batch(self, mail, batch, checkpoint=None):
+        """Store a batch and record the latency of its emails."""
+        stored = super().process_batch(mail, batch, checkpoint)
+        self.latencies += [time.perf_counter() - self.batch_started] * len(batch)
+        return stored
+
+    def save_stats(self, source, emails):
+        """Keep the stage timings of the run for the report before they are stored."""
+        self.run_stats = self.stats
+        super().save_stats(source, emails)
+
+
+def run_benchmark(corpus, batch_size=FETCH_BATCH_SIZE, parse_workers=0, full_fetch=False):
+    """
+    Serve a corpus from a fake IMAP server and ingest it with process_emails.
+
+    Runs against whatever database is configured; the command creates a
+    throwaway one first.
+
+    Args:
+        corpus (list): (kind, raw_email) tuples from generate_corpus()
+        batch_size (int): --batch-size of process_emails
+        parse_workers (int): --parse-workers of process_emails
+        full_fetch (bool): Download whole messages instead of their text parts
+
+    Returns:
+        dict: Throughput, latency percentiles, peak RSS and stage timings
+    """
+    with FakeIMAPServer() as server:
+        for _, raw_email in corpus:
+            server.deliver(raw_email)
+        command = TimedProcessEmails(stdout=StringIO(), stderr=StringIO())
+        options = ["--source", BENCHMARK_SOURCE, "--batch-size", str(batch_size)]
+        if parse_workers:
+            options += ["--parse-workers", str(parse_workers)]
+        if full_fetch:
+            options.append("--full-fetch")
+
+        rss_before = peak_rss_kb()
+        connect = lambda host: imaplib.IMAP4(*server.address)
+        with patch("imaplib.IMAP4_SSL", side_effect=connect):
+            started = time.perf_counter()
+            call_command(command, *options)
+            elapsed = time.perf_counter() - started
+
+    latencies = Histogram()
+    for latency in command.latencies:
+        latencies.observe(latency)
+    kinds = {}
+    for kind, _ in corpus:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    return {
+        "corpus": {
+            "messages": len(corpus),
+            "bytes": sum(len(raw_email) for _, raw_email in corpus),
+            "kinds": kinds,
+        },
+        "options": {"batch_size": batch_size, "parse_workers": parse_workers, "full_fetch": full_fetch},
+        "processed": len(command.latencies),
+        "bugs": Bug.objects.count(),
+        "elapsed": elapsed,
+        "messages_per_second": len(command.latencies) / elapsed if elapsed else None,
+        "latency": {
+            "p50": latencies.quantile(0.5),
+            "p99": latencies.quantile(0.99),
+            "max": latencies.max,
+        },
+        "peak_rss_kb": peak_rss_kb(),
+        "peak_rss_before_run_kb": rss_before,
+        "stages": command.run_stats.summary() if command.run_stats else None,
+    }
+
+
+class Command(BaseCommand):
+    """
+    End-to-end throughput benchmark of email ingestion.
+
+    Generates a synthetic corpus, serves it from the in-process fake IMAP
+    server and runs the real process_emails command against it, then
+    reports messages per second, p50/p99 latency per email and peak RSS.
+    Results are saved as JSON and can be compared with an earlier run.
+    """
+    help = "Benchmark process_emails end to end on a synthetic corpus served by a fake IMAP server"
+
+    def add_arguments(self, parser):
+        """
+        Register command line options.
+
+        Args:
+            parser (argparse.ArgumentParser): Parser for this command
+        """
+        parser.add_argument("--messages", type=int, default=1000, help="Number of emails in the corpus")
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()),
+            help="Relative share of each kind of email, e.g. plain=5,attachment=1,charset=2,thread=2",
+        )
+        parser.add_argument("--attachment-kb", type=int, default=256, help="Size of each attachment in KiB")
+        parser.add_argument(
+            "--thread-depth", type=int, default=30, help="Number of quoted messages in each reply chain"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus generator")
+        parser.add_argument(
+            "--batch-size", type=int, default=FETCH_BATCH_SIZE, help="--batch-size of process_emails"
+        )
+        parser.add_argument("--parse-workers", type=int, default=0, help="--parse-workers of process_emails")
+        parser.add_argument("--full-fetch", action="store_true", help="--full-fetch of process_emails")
+        parser.add_argument(
+            "--output", help="Where to save the JSON results (default: ingest-benchmark-<time>.json)"
+        )
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+        parser.add_argument(
+            "--reuse-database",
+            action="store_true",
+            help="Store the bugs in the configured database instead of a throwaway test database",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Generate the corpus, run the benchmark and report the results.
+
+        Args:
+            *args: Variable length argument list
+            **options: Command line options
+        """
+        mix = parse_mix(options["mix"])
+        started_at = now()
+        corpus = generate_corpus(
+            options["messages"], mix, options["attachment_kb"], options["thread_depth"], options["seed"]
+        )
+
+        old_name = None
+        if not options["reuse_database"]:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmark(
+                corpus, options["batch_size"], options["parse_workers"], options["full_fetch"]
+            )
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        results["started_at"] = started_at.isoformat()
+        results["corpus"]["seed"] = options["seed"]
+
+        self.report(results)
+        if options["compare"]:
+            self.compare(results, options["compare"])
+
+        output = options["output"] or f"ingest-benchmark-{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(output, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+    def report(self, results):
+        """
+        Print the headline numbers of a run.
+
+        Args:
+            results (dict): Result of run_benchmark()
+        """
+        corpus, latency = results["corpus"], results["latency"]
+        self.stdout.write(
+            f"Ingested {results['processed']} of {corpus['messages']} emails "
+            f"({corpus['bytes'] / 1_048_576:.1f} MiB) in {results['elapsed']:.2f} s"
+        )
+        self.stdout.write(f"Throughput: {results['messages_per_second']:.1f} messages/s")
+        if latency["p50"] is not None:
+            self.stdout.write(
+                f"Latency per email: p50 {latency['p50'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms"
+            )
+        if results["peak_rss_kb"] is not None:
+            self.stdout.write(f"Peak RSS: {results['peak_rss_kb'] / 1024:.1f} MiB")
+
+    def compare(self, results, path):
+        """
+        Print how a run differs from an earlier one.
+
+        Args:
+            results (dict): Result of run_benchmark()
+            path (str): JSON file saved by an earlier run
+
+        Raises:
+            CommandError: If the file cannot be read
+        """
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        rows = [
+            ("messages/s", baseline.get("messages_per_second"), results["messages_per_second"]),
+            ("p50 latency s", baseline.get("latency", {}).get("p50"), results["latency"]["p50"]),
+            ("p99 latency s", baseline.get("latency", {}).get("p99"), results["latency"]["p99"]),
+            ("peak RSS KiB", baseline.get("peak_rss_kb"), results["peak_rss_kb"]),
+        ]
+        for name, before, after in rows:
+            if before and after is not None:
+                self.stdout.write(f"{name}: {before:.6g} -> {after:.6g} ({(after - before) / before:+.1%})")
@@ -1,10 +1,34 @@
 import imaplib
 import email
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
 from email.header import decode_header
+from email.parser import BytesHeaderParser
 import re
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
 from django.utils.timezone import now
-from issues.models import Bug
+from issues import classifier
+from issues.locks import LeaseLost
+from issues.mail_sources import IMAPSource, MailSource, source_from_spec
+from issues.metrics import IngestStats, record_run
+from issues.models import Bug, FailedMessage, MailboxCheckpoint, ProcessedMessage
+from issues.quarantine import move_to_quarantine, quarantined_keys, record_failures
+from issues.sequences import AUTO_ID_PREFIX, auto_ids
+from issues.imap import (
+    PARTIAL_HEADER_FIELDS,
+    chunked,
+    compress_uid_set,
+    connection_pool,
+    fetch_item,
+    find_text_part,
+    mailbox_status,
+    parse_fetch_items,
+    parse_fetch_response,
+    text_part_message,
+)
 import os
 import django
 import logging
@@ -17,46 +41,343 @@ django.setup()
 EMAIL_HOST = "imap.gmail.com"  # IMAP server for Gmail
 EMAIL_USER = "bugTracker404@gmail.com"  # Email account that receives bug reports
 EMAIL_PASSWORD = "jenl qufz avdg crbx"  # App Password for Gmail (more secure than regular password)
-MAILBOX = "INBOX"  # Mailbox to check for new emails
+MAILBOX = "INBOX"  # Mailbox to check for new emails (the above are defaults for --source imap)
 BUG_ID_PATTERN = r"Bug ID: (\S+)"  # Regex pattern to extract bug ID from email subjects
+FETCH_BATCH_SIZE = 200  # Number of messages requested per UID FETCH round trip
 
 # Get a logger for the email processor
 logger = logging.getLogger('bug_tracker')
 
+
+def parse_raw_email(raw_email, command=None, timings=None):
+    """
+    Parse and classify one raw email without touching the database.
+    
+    Module-level so it can run in the worker processes of a parse pool.
+    
+    Args:
+        raw_email (bytes): Full RFC822 content of the email
+        command (Command): Command whose parse_email() to use; a new one
+                           is created when omitted
+        timings (dict): If given, receives the seconds spent in the "parse"
+                        and "classify" stages
+        
+    Returns:
+        dict: bug_id, subject, description, status and priority
+    """
+    started = time.perf_counter()
+    msg = email.message_from_bytes(raw_email)
+    bug_id, subject, description = (command or Command()).parse_email(msg)
+    parsed = time.perf_counter()
+
+    # Determine status and priority in a single scan of the text
+    bug_status, bug_priority = classifier.classify(subject, description)
+    if timings is not None:
+        timings["parse"] = parsed - started
+        timings["classify"] = time.perf_counter() - parsed
+    return {
+        "bug_id": bug_id,
+        "subject": subject,
+        "description": description,
+        "status": bug_status,
+        "priority": bug_priority,
+    }
+
+
+def message_key(raw_email):
+    """
+    Identify an email across deliveries, fetch modes and retries.
+    
+    Uses the Message-ID header, which survives re-delivery and is also
+    present in partially fetched messages. Emails without one fall back to
+    a hash of their raw bytes.
+    
+    Args:
+        raw_email (bytes): RFC822 content of the email
+        
+    Returns:
+        str: Hex SHA-256 digest used as ProcessedMessage.message_hash
+    """
+    headers = BytesHeaderParser().parsebytes(raw_email, headersonly=True)
+    message_id = str(headers.get("Message-ID") or "").strip()
+    if message_id:
+        return hashlib.sha256(b"message-id:" + message_id.encode("utf-8", "surrogateescape")).hexdigest()
+    return hashlib.sha256(raw_email).hexdigest()
+
+
+def parse_in_worker(raw_email):
+    """
+    Pool-friendly wrapper around parse_raw_email().
+    
+    Exceptions are returned instead of raised, so one bad email does not
+    abort the other results of the batch. Workers do not touch the
+    database, so emails without a bug ID come back with bug_id None and
+    the parent process assigns one.
+    
+    Args:
+        raw_email (bytes): Full RFC822 content of the email
+        
+    Returns:
+        tuple: (bug_data, None, timings) on success, (None, error message,
+               timings) on failure, with timings as in parse_raw_email()
+    """
+    timings = {}
+    command = Command()
+    command.defer_auto_ids = True
+    try:
+        return parse_raw_email(raw_email, command, timings), None, timings
+    except Exception as e:
+        return None, str(e), timings
+
+
 """Command to fetch and process unread bug report emails from a mailbox."""
 class Command(BaseCommand):
     help = "Fetch and process unread bug report emails"
+    parse_pool = None  # ProcessPoolExecutor used by parse_messages(), if any
+    parse_workers = 0  # Number of processes in parse_pool
+    partial_fetch = True  # Fetch only headers and the text part instead of whole messages
+    imap_source = IMAPSource(EMAIL_HOST, EMAIL_USER, EMAIL_PASSWORD, MAILBOX)  # Mailbox read by ingest()
+    database = None  # Executor that runs all database access, set by MailboxEngine
+    defer_auto_ids = False  # Leave bug_id None instead of allocating AUTO IDs, set in parse workers
+    source_key = None  # FailedMessage mailbox of the file source being read, see failure_key()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = IngestStats()  # Stage timings of the current run, see issues.metrics
+        self.quarantined = set()  # email_ids quarantined by store_batch(), until mark_as_read() moves them
+
+    def add_arguments(self, parser):
+        """
+        Register command line options.
+
+        Args:
+            parser (argparse.ArgumentParser): Parser for this command
+        """
+        parser.add_argument(
+            "--source",
+            default="imap",
+            help="Where to read emails from: imap (default), imap://user@host/MAILBOX, "
+                 "maildir:PATH or mbox:PATH",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=FETCH_BATCH_SIZE,
+            help="Number of messages to fetch per IMAP round trip",
+        )
+        parser.add_argument(
+            "--pooled",
+            action="store_true",
+            help="Reuse an authenticated connection kept open by this process",
+        )
+        parser.add_argument(
+            "--full-fetch",
+            action="store_true",
+            help="Download whole messages, attachments included, instead of "
+                 "only the header fields and text part that are parsed",
+        )
+        parser.add_argument(
+            "--parse-workers",
+            type=int,
+            nargs="?",
+            const=os.cpu_count(),
+            default=0,
+            help="Parse and classify emails in this many worker processes "
+                 "(defaults to the number of CPU cores when given without a value; "
+                 "not available inside daemonic Celery worker processes)",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print the time and bytes spent in each ingestion stage",
+        )
 
     def handle(self, *args, **kwargs):
         """
         Main function to fetch and process emails.
         
         This is the entry point of the command that:
-        1. Connects to the email server
-        2. Fetches unread emails
-        3. Processes each email to extract bug information
-        4. Creates or updates bug records in the database
-        5. Marks the emails as read
-        6. Logs the results
+        1. Connects to the email server, or reuses a pooled connection with
+           --pooled; with --source maildir:/mbox: reads local files instead
+        2. Finds emails newer than the mailbox checkpoint and fetches them
+           in batches of --batch-size UIDs
+        3. Processes each email to extract bug information, in a pool of
+           --parse-workers processes when given
+        4. Creates or updates bug records in the database, one transaction per batch
+        5. Marks the emails of each committed batch as read
+        6. Logs the results and stores the time spent in each stage as an
+           IngestRun, printing it with --stats
         """
         self.stdout.write(f"Starting email processing at {now().strftime('%Y-%m-%d %H:%M:%S')}")
-        mail = self.connect_to_email()
-        if not mail:
-            self.stdout.write(self.style.ERROR("Failed to connect to email server."))
-            return
+        try:
+            source = source_from_spec(kwargs.get("source"), self.imap_source)
+        except ValueError as e:
+            raise CommandError(str(e))
 
-        email_ids = self.fetch_unread_emails(mail)
-        if not email_ids:
-            self.stdout.write(self.style.SUCCESS("No unread emails to process."))
-            return
+        batch_size = kwargs.get("batch_size") or FETCH_BATCH_SIZE
+        self.partial_fetch = not kwargs.get("full_fetch", False)
+        self.start_parse_pool(kwargs.get("parse_workers") or 0)
+        try:
+            if isinstance(source, IMAPSource):
+                self.imap_source = source
+                found = self.ingest_from_imap(batch_size, kwargs.get("pooled", False))
+            else:
+                found = self.ingest_from_source(source, batch_size)
+        finally:
+            self.stop_parse_pool()
 
-        for email_id in email_ids:
-            self.process_email(mail, email_id)
+        if kwargs.get("stats"):
+            for line in self.stats.report():
+                self.stdout.write(line)
+        self.save_stats("process_emails", found)
 
-        mail.logout()
+        if found is None:
+            return
+        if not found:
+            self.stdout.write(self.style.SUCCESS("No unread emails to process."))
+            return
         self.stdout.write(self.style.SUCCESS("Successfully processed emails."))
         self.stdout.write(f"Completed email processing at {now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
+
+    def ingest_from_imap(self, batch_size, pooled=False):
+        """
+        Connect to the configured IMAP mailbox and run one ingestion pass.
+        
+        Args:
+            batch_size (int): Maximum number of UIDs per FETCH command
+            pooled (bool): Reuse a connection kept open by this process
+            
+        Returns:
+            int: Number of new emails found, or None if the connection failed
+        """
+        if pooled:
+            mail = connection_pool.acquire(self.checkpoint_key(), self.connect_to_email)
+        else:
+            mail = self.connect_to_email()
+        if not mail:
+            self.stdout.write(self.style.ERROR("Failed to connect to email server."))
+            return None
+
+        try:
+            found = self.ingest(mail, batch_size)
+        except Exception:
+            if pooled:
+                connection_pool.discard(mail)
+            raise
+
+        if pooled:
+            connection_pool.release(mail)
+        else:
+            mail.logout()
+        return found
+
+    def ingest_from_source(self, source, batch_size):
+        """
+        Run all emails of a file-based mail source through the pipeline.
+        
+        Each batch goes through process_batch() exactly like an IMAP batch;
+        the source is told which emails were stored once a batch commits.
+        
+        Args:
+            source (MailSource): Maildir or mbox source
+            batch_size (int): Maximum number of emails per batch
+            
+        Returns:
+            int: Number of emails read
+        """
+        found = 0
+        # Failures are recorded under the file source, not the IMAP mailbox
+        self.source_key = source.source_key
+        try:
+            for batch in source.batches(batch_size):
+                self.process_batch(source, batch)
+                found += len(batch)
+        finally:
+            self.source_key = None
+            source.close()
+        return found
+
+    def save_stats(self, source, emails):
+        """
+        Store the stage timings recorded so far as an IngestRun and start over.
+        
+        Args:
+            source (str): What did the run, e.g. "process_emails"
+            emails (int): Number of new emails the run handled
+        """
+        record_run(self.stats, source, emails)
+        self.stats = IngestStats()
+
+    def start_parse_pool(self, workers):
+        """
+        Start worker processes for parse_messages().
+        
+        Args:
+            workers (int): Number of processes; 0 or 1 parses in this process
+        """
+        if workers > 1:
+            self.parse_pool = ProcessPoolExecutor(max_workers=workers)
+            self.parse_workers = workers
+
+    def stop_parse_pool(self):
+        """Shut down the parse pool started by start_parse_pool(), if any."""
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+            self.parse_workers = 0
+
+    def ingest(self, mail, batch_size=FETCH_BATCH_SIZE, lease=None):
+        """
+        Run one ingestion pass over the new emails of a connected mailbox.
+        
+        Shared by handle() and long-running callers such as the
+        listen_emails command, which keep the connection open between passes.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client with the mailbox selected
+            batch_size (int): Maximum number of UIDs per FETCH command
+            lease: Lease held for the pass, see issues.locks; extended after
+                   every batch
+            
+        Returns:
+            int: Number of new emails found
+            
+        Raises:
+            LeaseLost: If the lease expired and another run took it
+        """
+        checkpoint, email_ids, status = self.fetch_new_emails(mail)
+        fetched = handled = 0
+        for batch in self.fetch_emails(mail, email_ids, batch_size):
+            handled += self.process_batch(mail, batch, checkpoint)
+            fetched += len(batch)
+            if lease is not None and not lease.extend():
+                raise LeaseLost(f"Lost the email lease after {fetched} email(s)")
+        # Emails that failed are retried by UID, see retry_uids(); until they
+        # succeed or are quarantined, the next poll must not skip the search
+        self.sync_checkpoint(checkpoint, status, fetched == len(email_ids) and handled == fetched)
+        return len(email_ids)
+
+    def sync_checkpoint(self, checkpoint, status, complete):
+        """
+        Move the checkpoint to the end of the mailbox after a complete pass.
+        
+        Everything below UIDNEXT has been seen once every requested email
+        was fetched and stored, so the next poll can start from there.
+        
+        Args:
+            checkpoint (MailboxCheckpoint): Checkpoint from fetch_new_emails(), or None
+            status (dict): STATUS response from fetch_new_emails()
+            complete (bool): Whether every email found by the pass was fetched
+                             and stored, skipped or quarantined; callers pass
+                             False when any of them failed
+        """
+        if checkpoint is None or not complete:
+            return
+        synced = (max(checkpoint.last_uid, status["UIDNEXT"] - 1), status.get("HIGHESTMODSEQ"))
+        if checkpoint.pk is None or synced != (checkpoint.last_uid, checkpoint.highest_modseq):
+            checkpoint.last_uid, checkpoint.highest_modseq = synced
+            checkpoint.save()
+
     def connect_to_email(self):
         """
         Connect to the email server via IMAP.
@@ -68,36 +389,353 @@ class Command(BaseCommand):
         Returns:
             imaplib.IMAP4_SSL: Connected IMAP client object, or None if connection fails
         """
+        source = self.imap_source
         try:
-            mail = imaplib.IMAP4_SSL(EMAIL_HOST)
-            mail.login(EMAIL_USER, EMAIL_PASSWORD)
-            mail.select(MAILBOX)
+            with self.stats.time("connect"):
+                mail = imaplib.IMAP4_SSL(source.host)
+                mail.login(source.user, source.password)
+                mail.select(source.mailbox)
             return mail
         except Exception as e:
             self.stderr.write(f"Error connecting to email: {e}")
             return None
 
+    def checkpoint_key(self):
+        """
+        Return the MailboxCheckpoint key for the configured mailbox.
+        
+        Returns:
+            str: Account, server and mailbox name, e.g. "user@imap.gmail.com/INBOX"
+        """
+        return self.imap_source.checkpoint_key
+
+    def failure_key(self):
+        """
+        Return the FailedMessage mailbox of the emails being stored.
+        
+        Returns:
+            str: source_key of the file source being read, if any, else
+                 the checkpoint_key() of the IMAP mailbox
+        """
+        return self.source_key or self.checkpoint_key()
+
+    def load_checkpoint(self):
+        """
+        Return the stored MailboxCheckpoint of the configured mailbox.
+        
+        Returns:
+            MailboxCheckpoint: Stored sync position, or None before the first sync
+        """
+        return MailboxCheckpoint.objects.filter(mailbox=self.checkpoint_key()).first()
+
+    def query(self, func, *args):
+        """
+        Run a database read, in the database thread of a MailboxEngine if set.
+        
+        Args:
+            func (callable): Function that reads from the database
+            *args: Arguments for `func`
+            
+        Returns:
+            The return value of `func`
+        """
+        if self.database is None:
+            return func(*args)
+        return self.database.submit(func, *args).result()
+
+    def fetch_new_emails(self, mail):
+        """
+        Find the emails that arrived since the last sync of the mailbox.
+        
+        Reads UIDVALIDITY and UIDNEXT (plus HIGHESTMODSEQ on CONDSTORE
+        servers) with one STATUS command and compares them with the stored
+        MailboxCheckpoint:
+        - unchanged UIDNEXT or HIGHESTMODSEQ: nothing new, no search at all
+        - known UIDVALIDITY: UID SEARCH for UID last_uid+1:* only
+        - no checkpoint or UIDVALIDITY changed: fall back to a search for
+          unread emails and start a new checkpoint
+        
+        With a checkpoint, emails that failed on an earlier poll and are not
+        quarantined yet are fetched again too, see retry_uids().
+        
+        Emails are found by UID rather than by the \\Seen flag, so reading
+        the mailbox in a mail client does not hide them from the tracker.
+        If the server does not answer STATUS, the UNSEEN search is used
+        without a checkpoint.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            
+        Returns:
+            tuple: (checkpoint, email_ids, status) where checkpoint is a
+                   MailboxCheckpoint (unsaved for a new sync) or None and
+                   status is the parsed STATUS response
+        """
+        with self.stats.time("search"):
+            items = ("UIDVALIDITY", "UIDNEXT")
+            if "CONDSTORE" in getattr(mail, "capabilities", ()):
+                items += ("HIGHESTMODSEQ",)
+            status = mailbox_status(mail, self.imap_source.mailbox, items)
+            if status is None:
+                return None, self.fetch_unread_emails(mail), None
+
+            checkpoint = self.query(self.load_checkpoint)
+            if checkpoint is None or checkpoint.uidvalidity != status["UIDVALIDITY"]:
+                if checkpoint is not None:
+                    logger.warning(
+                        f"UIDVALIDITY of {self.imap_source.mailbox} changed from {checkpoint.uidvalidity} "
+                        f"to {status['UIDVALIDITY']}, resyncing unread emails"
+                    )
+                else:
+                    checkpoint = MailboxCheckpoint(mailbox=self.checkpoint_key())
+                checkpoint.uidvalidity = status["UIDVALIDITY"]
+                checkpoint.last_uid = 0
+                checkpoint.highest_modseq = None
+                email_ids = self.search_uids(mail, 'UNSEEN')
+            else:
+                retry_ids = self.retry_uids(mail)
+                modseq = status.get("HIGHESTMODSEQ")
+                if (modseq is not None and modseq == checkpoint.highest_modseq) or (
+                    status["UIDNEXT"] <= checkpoint.last_uid + 1
+                ):
+                    return checkpoint, retry_ids, status
+
+                email_ids = self.search_uids(mail, 'UID', f"{checkpoint.last_uid + 1}:*")
+                if email_ids is not None:
+                    # "n:*" always matches the highest UID, even when it is below n
+                    email_ids = [uid for uid in email_ids if int(uid) > checkpoint.last_uid]
+                    email_ids = sorted(set(email_ids) | set(retry_ids), key=int)
+
+            # Leave the checkpoint untouched when the search failed
+            if email_ids is None:
+                return None, [], None
+            return checkpoint, email_ids, status
+
+    def failed_uids(self):
+        """
+        Return the UIDs of emails of the configured mailbox that are still retried.
+        
+        Returns:
+            list: UIDs (as bytes) of FailedMessage rows that are not quarantined;
+                  rows without a numeric UID are not IMAP emails and are left out
+        """
+        return [
+            uid.encode()
+            for uid in FailedMessage.objects.filter(mailbox=self.checkpoint_key(), quarantined_at__isnull=True)
+            .values_list("uid", flat=True)
+            if uid.isdigit()
+        ]
+
+    def forget_failures(self, email_ids):
+        """
+        Drop the failure records of emails that are no longer in the mailbox.
+        
+        Args:
+            email_ids (iterable): UIDs (as bytes)
+        """
+        FailedMessage.objects.filter(
+            mailbox=self.checkpoint_key(), uid__in=[email_id.decode() for email_id in email_ids]
+        ).delete()
+
+    def retry_uids(self, mail):
+        """
+        Find the emails that failed on an earlier poll, to fetch them again.
+        
+        Failed emails stay unread, but the checkpoint moves past them with
+        the rest of their batch, so a search from the checkpoint never finds
+        them again. Their UIDs are kept in FailedMessage rows instead and
+        looked up with one UID SEARCH; emails that were deleted or moved away
+        in the meantime are forgotten.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            
+        Returns:
+            list: UIDs (as bytes) of failed emails still in the mailbox
+        """
+        failed = set(self.query(self.failed_uids))
+        if not failed:
+            return []
+        found = self.search_uids(mail, 'UID', compress_uid_set(sorted(failed, key=int)))
+        if found is None:
+            return []
+        # The compressed set may span UIDs that did not fail
+        found = [uid for uid in found if uid in failed]
+        gone = failed.difference(found)
+        if gone:
+            logger.info(f"Forgetting {len(gone)} failed email(s) that left {self.imap_source.mailbox}")
+            self.query(self.forget_failures, gone)
+        return found
+
     def fetch_unread_emails(self, mail):
         """
         Fetch unread emails.
         
         Searches the selected mailbox for unread emails using the UNSEEN flag.
+        UIDs are used rather than sequence numbers so that IDs stay valid
+        across the batched fetches that follow.
         
         Args:
             mail (imaplib.IMAP4_SSL): Connected IMAP client
             
         Returns:
-            list: List of email IDs (as bytes), empty list if none found or error occurs
+            list: List of email UIDs (as bytes), empty list if none found or error occurs
+        """
+        return self.search_uids(mail, 'UNSEEN') or []
+
+    def search_uids(self, mail, *criteria):
+        """
+        Run a UID SEARCH and return the matching UIDs.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            *criteria: Search criteria, e.g. 'UNSEEN' or 'UID', '5:*'
+            
+        Returns:
+            list: Matching UIDs (as bytes), or None if the search failed
         """
         try:
-            status, messages = mail.search(None, 'UNSEEN')
+            status, messages = mail.uid('SEARCH', None, *criteria)
             if status != "OK":
-                return []
+                return None
 
             return messages[0].split()
         except Exception as e:
             self.stderr.write(f"Error fetching emails: {e}")
+            return None
+
+    def fetch_emails(self, mail, email_ids, batch_size=FETCH_BATCH_SIZE):
+        """
+        Fetch the content of the given emails in batches.
+        
+        Issues one round of UID FETCH per batch of `batch_size` UIDs instead
+        of one per message, and yields each batch as soon as it arrives so
+        that processing can start before the whole backlog has been
+        downloaded. A failed FETCH stops the iteration, so the mailbox
+        checkpoint never advances past emails that were not fetched.
+        BODY.PEEK is used so that fetching does not set the \\Seen flag;
+        emails are only marked read by mark_as_read().
+        
+        By default only the parts parse_email() reads are downloaded, see
+        fetch_text_parts(); with --full-fetch whole messages are.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            email_ids (list): UIDs (as bytes) of the emails to fetch
+            batch_size (int): Maximum number of UIDs per FETCH command
+            
+        Yields:
+            list: (email_id, raw_email) tuples for the messages of one batch
+        """
+        for batch in chunked(email_ids, batch_size):
+            uid_set = compress_uid_set(batch)
+            try:
+                with self.stats.time("fetch") as measured:
+                    if self.partial_fetch:
+                        messages = self.fetch_text_parts(mail, uid_set)
+                    else:
+                        messages = self.fetch_full_messages(mail, uid_set)
+                    measured["bytes"] = sum(len(raw_email) for _, raw_email in messages or [])
+            except Exception as e:
+                logger.error(f"Error fetching emails {uid_set}: {str(e)}")
+                self.stderr.write(f"Error fetching emails {uid_set}: {str(e)}")
+                return
+            if messages is None:
+                logger.error(f"Failed to fetch emails {uid_set}")
+                self.stderr.write(f"Failed to fetch emails {uid_set}")
+                return
+
+            yield messages
+
+    def fetch_full_messages(self, mail, uid_set):
+        """
+        Download whole messages with one UID FETCH.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            uid_set (str): IMAP UID set
+            
+        Returns:
+            list: (email_id, raw_email) tuples, or None if the FETCH failed
+        """
+        if not uid_set:
             return []
+        status, msg_data = mail.uid('FETCH', uid_set, "(UID BODY.PEEK[])")
+        if status != "OK":
+            return None
+        return parse_fetch_response(msg_data)
+
+    def fetch_text_parts(self, mail, uid_set):
+        """
+        Download only the header fields and text part of each message.
+        
+        parse_email() only reads the Subject header and the first text/plain
+        part that is not an attachment. This fetches BODYSTRUCTURE and the
+        needed header fields first, then only the text part of each message
+        by section number: one extra UID FETCH per distinct section, usually
+        one or two per batch. Attachments are never downloaded, so memory
+        and bandwidth per email are bounded by the size of its text.
+        
+        Messages whose structure the server did not report, or whose text
+        part did not come back, are downloaded whole as a fallback.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client
+            uid_set (str): IMAP UID set
+            
+        Returns:
+            list: (email_id, raw_email) tuples, where raw_email is a minimal
+                  message with the fetched headers and text part, or None
+                  if a FETCH failed
+        """
+        fields = " ".join(PARTIAL_HEADER_FIELDS)
+        status, msg_data = mail.uid(
+            'FETCH', uid_set, f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({fields})])"
+        )
+        if status != "OK":
+            return None
+
+        structures = {}  # email_id -> (header, text part or None)
+        sections = {}  # section -> email_ids whose text is in that section
+        order = []
+        for items in parse_fetch_items(msg_data):
+            email_id = items.get("UID")
+            if not isinstance(email_id, bytes):
+                continue
+            order.append(email_id)
+            header = fetch_item(items, "BODY[HEADER")
+            structure = items.get("BODYSTRUCTURE")
+            if header is None or not isinstance(structure, list):
+                continue
+            part = find_text_part(structure)
+            structures[email_id] = (header, part)
+            if part is not None:
+                sections.setdefault(part["section"], []).append(email_id)
+
+        bodies = {}
+        for section, email_ids in sections.items():
+            status, msg_data = mail.uid('FETCH', compress_uid_set(email_ids), f"(UID BODY.PEEK[{section}])")
+            if status != "OK":
+                return None
+            for items in parse_fetch_items(msg_data):
+                body = fetch_item(items, f"BODY[{section}]")
+                if isinstance(body, bytes) and items.get("UID") in email_ids:
+                    bodies[items["UID"]] = body
+
+        messages = {}
+        for email_id, (header, part) in structures.items():
+            if part is None:
+                messages[email_id] = text_part_message(header, None, b"")
+            elif email_id in bodies:
+                messages[email_id] = text_part_message(header, part, bodies[email_id])
+
+        missing = [email_id for email_id in order if email_id not in messages]
+        if missing:
+            full = self.fetch_full_messages(mail, compress_uid_set(missing))
+            if full is None:
+                return None
+            messages.update(full)
+        return [(email_id, messages[email_id]) for email_id in order if email_id in messages]
 
     def parse_email(self, msg):
         """
@@ -108,7 +746,8 @@ class Command(BaseCommand):
         2. Subject (with bug ID prefix removed if present)
         3. Description from the message body
         
-        If no bug ID is found in the subject, it generates an automatic one.
+        If no bug ID is found in the subject, it allocates an automatic one
+        unless defer_auto_ids is set.
         
         Args:
             msg (email.message.Message): Email message to parse
@@ -143,14 +782,24 @@ class Command(BaseCommand):
             # Handle simple text messages
             description = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8")
 
-        # If no bug_id is found, generate one
-        if not bug_id:
-            # Generate a unique ID based on timestamp and part of subject
-            timestamp = now().strftime("%Y%m%d%H%M%S")
-            subject_slug = re.sub(r'[^a-z0-9]', '', subject.lower()[:10])
-            bug_id = f"AUTO-{timestamp}-{subject_slug}"
+        # If no bug_id is found, allocate one
+        if not bug_id and not self.defer_auto_ids:
+            bug_id = self.auto_bug_id()
             
         return bug_id, subject, description
+
+    def auto_bug_id(self):
+        """
+        Allocate a bug ID for an email without one in its subject.
+        
+        IDs come from the block-allocated sequence in issues.sequences, so
+        they are unique across processes and threads, unlike the old
+        timestamp and subject based IDs.
+        
+        Returns:
+            str: A new ID like "AUTO-1042"
+        """
+        return f"{AUTO_ID_PREFIX}{auto_ids.next_value(self.query)}"
         
     def extract_status(self, subject, description):
         """
@@ -162,6 +811,8 @@ class Command(BaseCommand):
         - [open]/[closed]/etc.
         - "Bug is now closed"/etc.
         
+        The patterns are compiled once per process in issues.classifier.
+        
         Args:
             subject (str): Email subject line
             description (str): Email body text
@@ -170,39 +821,7 @@ class Command(BaseCommand):
             str: Detected status ("open", "closed", "resolved", "in_progress")
                  Default is "open" if no status indicators are found
         """
-        # Normalize text for pattern matching
-        combined_text = f"{subject} {description}".lower()
-        
-        # Define status patterns with common prefixes
-        status_patterns = [
-            # Match formal status indicators like "Status: open"
-            r"(?:status|state)\s*:\s*(open|closed|resolved|in[-_\s]progress)",
-            # Match bracketed status like "[open]"
-            r"\[(open|closed|resolved|in[-_\s]progress)\]",
-            # Match status verbs like "closing this bug"
-            r"(?:bug|issue|ticket) (?:is|has been|was) (open(?:ed)?|clos(?:ed|ing)|resolv(?:ed|ing)|in[-_\s]progress)",
-            # Match direct status mentions
-            r"\b(open(?:ed)?|clos(?:ed|ing)|resolv(?:ed|ing)|in[-_\s]progress)\b",
-        ]
-        
-        # Try each pattern
-        for pattern in status_patterns:
-            match = re.search(pattern, combined_text, re.IGNORECASE)
-            if match:
-                status_text = match.group(1).lower()
-                
-                # Normalize various status formats
-                if re.match(r"open(?:ed)?", status_text):
-                    return "open"
-                elif re.match(r"clos(?:ed|ing)", status_text):
-                    return "closed"
-                elif re.match(r"resolv(?:ed|ing)", status_text):
-                    return "resolved"
-                elif re.match(r"in[-_\s]progress", status_text):
-                    return "in_progress"
-        
-        # Default status for new bugs
-        return "open"
+        return classifier.extract_status(subject, description)
 
     def determine_priority(self, subject, description):
         """
@@ -212,6 +831,8 @@ class Command(BaseCommand):
         1. Formal notation like "Priority: High"
         2. Keywords like "urgent", "critical", "trivial", etc.
         
+        The keywords are compiled once per process in issues.classifier.
+        
         Args:
             subject (str): Email subject line
             description (str): Email body text
@@ -220,105 +841,469 @@ class Command(BaseCommand):
             str: Detected priority level ("High", "Medium", "Low")
                  Default is "Medium" if no priority indicators are found
         """
-        text = f"{subject} {description}".lower()  # Combine and lowercase text
-
-        # Keywords for each priority level
-        high_keywords = ["urgent", "high", "critical", "blocker", "emergency", "p1", "priority 1"]
-        medium_keywords = ["medium", "normal", "moderate", "p2", "priority 2"]
-        low_keywords = ["low", "minor", "trivial", "p3", "priority 3", "can wait"]
-        
-        # Check for priority indicators with formal notation (e.g., "Priority: High")
-        priority_match = re.search(r"priority\s*:\s*(high|medium|low)", text, re.IGNORECASE)
-        if priority_match:
-            return priority_match.group(1).capitalize()
-            
-        # Check for keywords
-        for keyword in high_keywords:
-            if keyword in text:
-                return "High"
-        
-        for keyword in medium_keywords:
-            if keyword in text:
-                return "Medium"
-                
-        for keyword in low_keywords:
-            if keyword in text:
-                return "Low"
-                
-        # Default to Medium priority
-        return "Medium"
+        return classifier.determine_priority(subject, description)
 
     def process_email(self, mail, email_id):
         """
-        Process a single email and update/create a Bug record.
+        Fetch a single email by UID and process it.
         
-        This method:
-        1. Fetches the full email content
-        2. Parses it to extract bug information
-        3. Determines status and priority
-        4. Creates a new bug or updates an existing one
-        5. Marks the email as read
+        The batched path in handle() is preferred; this is kept for callers
+        that need to (re)process one specific message.
         
         Args:
             mail (imaplib.IMAP4_SSL): Connected IMAP client
-            email_id (bytes): ID of the email to process
+            email_id (bytes): UID of the email to process
         """
         try:
-            # Fetch the email content
-            status, msg_data = mail.fetch(email_id, "(RFC822)")
+            status, msg_data = mail.uid('FETCH', email_id, "(UID BODY.PEEK[])")
             if status != "OK":
                 logger.error(f"Failed to fetch email {email_id}")
                 self.stderr.write(f"Failed to fetch email {email_id}")
                 return
+        except Exception as e:
+            logger.error(f"Error processing email {email_id}: {str(e)}")
+            self.stderr.write(f"Error processing email {email_id}: {str(e)}")
+            return
+
+        self.process_batch(mail, parse_fetch_response(msg_data))
+
+    def process_batch(self, mail, batch, checkpoint=None):
+        """
+        Process one batch of fetched emails inside a single transaction.
+        
+        Emails that were already stored by an earlier run (see
+        skip_processed()) are dropped first. The rest are parsed and
+        classified (see parse_messages()), then stored together by
+        save_bugs(), and their keys are recorded as ProcessedMessage rows.
+        The UIDs of the emails that were stored successfully, and of the
+        skipped ones, are flagged as read with one UID STORE, and only once
+        the batch transaction has committed: an email is never marked read
+        when its database write did not make it.
+        
+        The mailbox checkpoint is advanced to the highest UID of the batch in
+        the same transaction, so bug records and sync position always agree.
+        Emails that failed are left unread and logged, and their UID is kept
+        in a FailedMessage row so the next poll fetches them again, see
+        retry_uids().
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client, or the MailSource
+                the batch was read from
+            batch (list): (email_id, raw_email) tuples to process
+            checkpoint (MailboxCheckpoint): Sync position to advance, if any
+            
+        Returns:
+            int: Number of emails stored, or skipped as stored before
+        """
+        prepared = self.prepare_batch(batch)
+        read_ids = self.store_batch(prepared, checkpoint)
+        # Runs right away, or once an enclosing transaction has committed
+        transaction.on_commit(lambda: self.mark_as_read(mail, read_ids))
+        return len(read_ids)
+
+    def prepare_batch(self, batch):
+        """
+        Drop already processed emails and parse the rest, without writing anything.
+        
+        This is the part of process_batch() that can run concurrently for
+        several mailboxes; store_batch() does the writes.
+        
+        Args:
+            batch (list): (email_id, raw_email) tuples to process
+            
+        Returns:
+            dict: email_ids of the batch, (email_id, bug_data) tuples in
+                  "parsed", "skipped_ids", the message_key() of each email
+                  in "keys", and the "raw" content of the emails to store
+                  and the "errors" of those that could not be parsed
+        """
+        keys = {email_id: message_key(raw_email) for email_id, raw_email in batch}
+        with self.stats.time("dedupe"):
+            fresh, skipped_ids = self.skip_processed(batch, keys)
+        errors = {}
+        return {
+            "email_ids": [email_id for email_id, _ in batch],
+            "parsed": self.parse_messages(fresh, errors),
+            "errors": errors,
+            "raw": dict(fresh),
+            "skipped_ids": skipped_ids,
+            "keys": keys,
+        }
+
+    def store_batch(self, prepared, checkpoint=None):
+        """
+        Store a batch from prepare_batch() in one transaction.
+        
+        Emails that could not be parsed or stored have their failure counted
+        afterwards; those failing for the INGEST_QUARANTINE_AFTER-th time are
+        quarantined and returned with the stored ones, so they are flagged as
+        read too, see issues.quarantine.
+        
+        Args:
+            prepared (dict): Result of prepare_batch()
+            checkpoint (MailboxCheckpoint): Sync position to advance, if any
+            
+        Returns:
+            list: email_ids to mark as read once the transaction has committed
+        """
+        parsed, keys = prepared["parsed"], prepared["keys"]
+        errors = prepared.setdefault("errors", {})
+        with self.stats.time("write"):
+            with transaction.atomic():
+                processed_ids = self.save_bugs(parsed, errors)
+                # A concurrent run that stored the same email makes this insert
+                # fail on the unique index; the whole batch then rolls back and
+                # is skipped as already processed on the next run
+                bug_ids = {email_id: bug_data["bug_id"] for email_id, bug_data in parsed}
+                ProcessedMessage.objects.bulk_create([
+                    ProcessedMessage(message_hash=keys[email_id], bug_id=bug_ids[email_id])
+                    for email_id in processed_ids
+                ])
+                if checkpoint is not None and prepared["email_ids"]:
+                    checkpoint.last_uid = max(
+                        checkpoint.last_uid, max(int(email_id) for email_id in prepared["email_ids"])
+                    )
+                    checkpoint.save()
+                if processed_ids:
+                    # Emails that failed before and have now been stored
+                    FailedMessage.objects.filter(
+                        message_hash__in=[keys[email_id] for email_id in processed_ids]
+                    ).delete()
+            quarantined = record_failures(errors, keys, prepared.get("raw", {}), self.failure_key())
+        self.quarantined.update(quarantined)
+        return processed_ids + prepared["skipped_ids"] + quarantined
+
+    def skip_processed(self, batch, keys):
+        """
+        Drop emails that have already been stored, with one query per batch.
+        
+        Emails appearing twice within the batch are only kept once.
+        
+        Args:
+            batch (list): (email_id, raw_email) tuples
+            keys (dict): message_key() of each email_id
+            
+        Returns:
+            tuple: (batch without the processed emails, email_ids that were skipped)
+        """
+        if not batch:
+            return [], []
+        seen = set(self.query(self.processed_keys, set(keys.values())))
+        fresh, skipped_ids = [], []
+        for email_id, raw_email in batch:
+            if keys[email_id] in seen:
+                skipped_ids.append(email_id)
+                continue
+            seen.add(keys[email_id])
+            fresh.append((email_id, raw_email))
+        if skipped_ids:
+            logger.info(f"Skipping {len(skipped_ids)} already processed email(s)")
+            self.stdout.write(f"Skipping {len(skipped_ids)} already processed email(s)")
+        return fresh, skipped_ids
+
+    def processed_keys(self, keys):
+        """
+        Return which of the given message keys have a ProcessedMessage row
+        or belong to a quarantined email.
+        
+        Args:
+            keys (set): message_key() values
+            
+        Returns:
+            list: The keys that were stored before or quarantined
+        """
+        return list(
+            ProcessedMessage.objects.filter(message_hash__in=keys).values_list("message_hash", flat=True)
+        ) + quarantined_keys(keys)
 
-            # Parse the email message
-            msg = email.message_from_bytes(msg_data[0][1])
-            bug_id, subject, description = self.parse_email(msg)
+    def mark_as_read(self, mail, email_ids):
+        """
+        Flag the given emails as read with a single UID STORE command.
+        
+        Quarantined emails among them are then moved to the quarantine
+        folder, if one is configured. Emails read from a file-based
+        MailSource are marked by the source.
+        
+        Args:
+            mail (imaplib.IMAP4_SSL): Connected IMAP client, or a MailSource
+            email_ids (list): UIDs of the emails to flag
+        """
+        if not email_ids:
+            return
+        if isinstance(mail, MailSource):
+            mail.mark_as_read(email_ids)
+            return
+        uid_set = compress_uid_set(email_ids)
+        try:
+            with self.stats.time("flag"):
+                status, _ = mail.uid('STORE', uid_set, "+FLAGS", "\\Seen")
+            if status != "OK":
+                logger.error(f"Failed to mark emails {uid_set} as read")
+                self.stderr.write(f"Failed to mark emails {uid_set} as read")
+        except Exception as e:
+            logger.error(f"Error marking emails {uid_set} as read: {str(e)}")
+            self.stderr.write(f"Error marking emails {uid_set} as read: {str(e)}")
 
-            # Print debug info about extracted data
-            self.stdout.write(f"Extracted bug_id: {bug_id} from email with subject: {subject}")
+        quarantined = [email_id for email_id in email_ids if email_id in self.quarantined]
+        if quarantined:
+            self.quarantined.difference_update(quarantined)
+            with self.stats.time("flag"):
+                move_to_quarantine(mail, compress_uid_set(quarantined))
 
-            # Extract status using the improved method
-            bug_status = self.extract_status(subject, description)
+    def parse_messages(self, batch, errors=None):
+        """
+        Parse and classify the emails of a batch, keeping batch order.
+        
+        MIME parsing and classification are pure CPU work. With a parse pool
+        the raw messages are fanned out to worker processes and the results
+        collected in order; database writes always stay in this process.
+        
+        Args:
+            batch (list): (email_id, raw_email) tuples
+            errors (dict): If given, receives the error of each email that
+                           could not be parsed
             
-            # Determine priority
-            bug_priority = self.determine_priority(subject, description)
-
-            # Log what we're about to do
-            logger.info(f"Processing bug ID: {bug_id}, Status: {bug_status}, Priority: {bug_priority}")
-            self.stdout.write(f"Processing bug ID: {bug_id}, Status: {bug_status}, Priority: {bug_priority}")
-
-            # Create or update the bug
-            bug, created = Bug.objects.get_or_create(
-                bug_id=bug_id,
-                defaults={
-                    "subject": subject,
-                    "description": description,
-                    "status": bug_status,
-                    "priority": bug_priority,
-                    "created_at": now(),
-                    "updated_at": now(),
-                    "modified_count": 0,
-                },
+        Returns:
+            list: (email_id, bug_data) tuples for the emails that could be parsed
+        """
+        if self.parse_pool is None or len(batch) < 2:
+            results = [self.parse_message(email_id, raw_email, errors) for email_id, raw_email in batch]
+        else:
+            chunksize = max(1, len(batch) // (self.parse_workers * 4))
+            outcomes = self.parse_pool.map(
+                parse_in_worker, [raw_email for _, raw_email in batch], chunksize=chunksize
             )
+            results = []
+            for (email_id, raw_email), (bug_data, error, timings) in zip(batch, outcomes):
+                self.observe_parsing(raw_email, timings)
+                if bug_data is not None and bug_data["bug_id"] is None:
+                    bug_data["bug_id"] = self.auto_bug_id()
+                if error is not None and errors is not None:
+                    errors[email_id] = error
+                results.append(self.report_parsed(email_id, bug_data, error))
+        return [
+            (email_id, bug_data)
+            for (email_id, _), bug_data in zip(batch, results)
+            if bug_data is not None
+        ]
 
-            # If the bug already exists, update fields
-            if not created:
-                # Update everything except the bug_id
-                bug.subject = subject
-                bug.description = description
-                bug.status = bug_status
-                bug.priority = bug_priority
-                bug.modified_count += 1
-                bug.updated_at = now()
-                bug.save()
-                self.stdout.write(f"Updated Bug: {bug_id} with {bug.modified_count} modification(s).")
+    def parse_message(self, email_id, raw_email, errors=None):
+        """
+        Parse and classify a single fetched email.
+        
+        This method:
+        1. Parses the raw email to extract bug information
+        2. Determines status and priority with one classifier pass
+        
+        Args:
+            email_id (bytes): UID of the email being processed
+            raw_email (bytes): Full RFC822 content of the email
+            errors (dict): If given, receives the error if the email cannot be parsed
+            
+        Returns:
+            dict: bug_id, subject, description, status and priority,
+                  or None if the email could not be parsed
+        """
+        timings = {}
+        try:
+            bug_data = parse_raw_email(raw_email, self, timings)
+        except Exception as e:
+            if errors is not None:
+                errors[email_id] = str(e)
+            return self.report_parsed(email_id, None, str(e))
+        self.observe_parsing(raw_email, timings)
+        return self.report_parsed(email_id, bug_data)
+
+    def observe_parsing(self, raw_email, timings):
+        """
+        Add the parse and classify timings of one email to the run's stats.
+        
+        Args:
+            raw_email (bytes): Full RFC822 content of the email
+            timings (dict): Timings filled in by parse_raw_email()
+        """
+        if "parse" in timings:
+            self.stats.observe("parse", timings["parse"], len(raw_email))
+            self.stats.observe("classify", timings["classify"])
+
+    def report_parsed(self, email_id, bug_data, error=None):
+        """
+        Log the outcome of parsing one email.
+        
+        Args:
+            email_id (bytes): UID of the email
+            bug_data (dict): Parsed bug fields, or None on failure
+            error (str): Error message if parsing failed
+            
+        Returns:
+            dict: `bug_data` unchanged, None if parsing failed
+        """
+        if error is not None:
+            logger.error(f"Error processing email {email_id}: {error}")
+            self.stderr.write(f"Error processing email {email_id}: {error}")
+            return None
+
+        # Print debug info about extracted data
+        self.stdout.write(
+            f"Extracted bug_id: {bug_data['bug_id']} from email with subject: {bug_data['subject']}"
+        )
+        message = (
+            f"Processing bug ID: {bug_data['bug_id']}, "
+            f"Status: {bug_data['status']}, Priority: {bug_data['priority']}"
+        )
+        logger.info(message)
+        self.stdout.write(message)
+        return bug_data
+
+    def save_bugs(self, parsed, errors=None):
+        """
+        Store the bugs of a batch, in bulk where possible.
+        
+        The bulk path runs in its own savepoint. If it fails, for example
+        because another worker created one of the bugs in the meantime, every
+        email is stored on its own with save_bug() instead, so one bad email
+        cannot keep the rest of the batch from being stored.
+        
+        Args:
+            parsed (list): (email_id, bug_data) tuples from parse_message()
+            errors (dict): If given, receives the error of each email whose
+                           bug record could not be stored
+            
+        Returns:
+            list: email_ids whose bug records were stored
+        """
+        if not parsed:
+            return []
+        try:
+            with transaction.atomic():
+                self.bulk_save_bugs([bug_data for _, bug_data in parsed])
+            return [email_id for email_id, _ in parsed]
+        except Exception as e:
+            logger.warning(f"Bulk save failed, storing emails one by one: {str(e)}")
+
+        return [email_id for email_id, bug_data in parsed if self.save_bug(email_id, bug_data, errors)]
+
+    def bulk_save_bugs(self, bugs):
+        """
+        Create and update the bugs of a batch with a fixed number of queries.
+        
+        Existing bugs are locked and loaded with one IN query, missing ones
+        are inserted with bulk_create() and then all of them are written with
+        one bulk_update(). Several emails for the same bug_id collapse into
+        one row write: the last email provides the fields and modified_count
+        grows by one per email, just as if they had been stored one after
+        another.
+        
+        Chunks of a fanned out run store batches at the same time, so the
+        count is incremented with F() rather than from the value read, and
+        a bug another chunk inserted in the meantime is updated instead of
+        failing the insert.
+        
+        Args:
+            bugs (list): bug_data dicts from parse_message(), in email order
+        """
+        merged = {}
+        for bug_data in bugs:
+            previous = merged.get(bug_data["bug_id"])
+            merged[bug_data["bug_id"]] = (bug_data, previous[1] + 1 if previous else 1)
+
+        def lock(bug_ids):
+            return Bug.objects.select_for_update().only("id", "bug_id", "modified_count").in_bulk(
+                bug_ids, field_name="bug_id"
+            )
+
+        existing = lock(list(merged))
+        timestamp = now()
+        missing = [bug_id for bug_id in merged if bug_id not in existing]
+        if missing:
+            # Inserted one below the count, as the update adds one per email
+            # and the first email only creates the bug
+            Bug.objects.bulk_create(
+                [
+                    Bug(**merged[bug_id][0], created_at=timestamp, updated_at=timestamp, modified_count=-1)
+                    for bug_id in missing
+                ],
+                ignore_conflicts=True,
+            )
+            existing.update(lock(missing))
+
+        to_update, messages = [], []
+        for bug_id, (bug_data, email_count) in merged.items():
+            bug = existing[bug_id]
+            if bug_id in missing:
+                messages.append(f"Created new Bug: {bug_id}")
             else:
-                self.stdout.write(f"Created new Bug: {bug_id}")
+                messages.append(
+                    f"Updated Bug: {bug_id} with {bug.modified_count + email_count} modification(s)."
+                )
+            # Update everything except the bug_id
+            bug.subject = bug_data["subject"]
+            bug.description = bug_data["description"]
+            bug.status = bug_data["status"]
+            bug.priority = bug_data["priority"]
+            bug.modified_count = F("modified_count") + email_count
+            bug.updated_at = timestamp
+            to_update.append(bug)
+
+        Bug.objects.bulk_update(
+            to_update,
+            ["subject", "description", "status", "priority", "modified_count", "updated_at"],
+        )
+        for message in messages:
+            self.stdout.write(message)
+
+    def save_bug(self, email_id, bug_data, errors=None):
+        """
+        Create or update the Bug record for a single email in its own savepoint.
+        
+        Args:
+            email_id (bytes): UID of the email being processed
+            bug_data (dict): Parsed fields from parse_message()
+            errors (dict): If given, receives the error if the write fails
+            
+        Returns:
+            bool: True if the bug record was stored, False if the write failed
+        """
+        bug_id = bug_data["bug_id"]
+        try:
+            # The savepoint keeps a failure here from rolling back the other
+            # emails of the batch
+            with transaction.atomic():
+                bug, created = Bug.objects.get_or_create(
+                    bug_id=bug_id,
+                    defaults={
+                        "subject": bug_data["subject"],
+                        "description": bug_data["description"],
+                        "status": bug_data["status"],
+                        "priority": bug_data["priority"],
+                        "created_at": now(),
+                        "updated_at": now(),
+                        "modified_count": 0,
+                    },
+                )
+
+                # If the bug already exists, update fields
+                if not created:
+                    # Update everything except the bug_id
+                    bug.subject = bug_data["subject"]
+                    bug.description = bug_data["description"]
+                    bug.status = bug_data["status"]
+                    bug.priority = bug_data["priority"]
+                    # Incremented in the database, other chunks may be storing the same bug
+                    bug.modified_count = F("modified_count") + 1
+                    bug.updated_at = now()
+                    bug.save()
+                    bug.refresh_from_db(fields=["modified_count"])
 
-            # Mark the email as read to prevent reprocessing
-            mail.store(email_id, "+FLAGS", "\\Seen")
+            if created:
+                self.stdout.write(f"Created new Bug: {bug_id}")
+            else:
+                self.stdout.write(f"Updated Bug: {bug_id} with {bug.modified_count} modification(s).")
+            return True
             
         except Exception as e:
             logger.error(f"Error processing email {email_id}: {str(e)}")
-            self.stderr.write(f"Error processing email {email_id}: {str(e)}")
\ No newline at end of file
+            self.stderr.write(f"Error processing email {email_id}: {str(e)}")
+            if errors is not None:
+                errors[email_id] = str(e)
+            return False
\ No newline at end of file
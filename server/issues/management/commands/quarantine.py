@@ -0,0 +1,144 @@
+from django.core.management.base import BaseCommand, CommandError
+from issues.management.commands.process_emails import Command as ProcessEmailsCommand
+from issues.models import FailedMessage
+
+
+class Command(BaseCommand):
+    """
+    List and re-drive emails that failed to be ingested.
+
+    Without options, prints every email with a failure count, quarantined
+    ones marked with Q. --redrive runs stored emails through the parse and
+    store steps of process_emails again, for example after a parser fix;
+    emails that are stored successfully leave the quarantine, the others
+    count one more failure. --discard forgets emails for good.
+    """
+    help = "List, re-drive or discard emails that failed to be ingested"
+
+    def add_arguments(self, parser):
+        """
+        Register command line options.
+
+        Args:
+            parser (argparse.ArgumentParser): Parser for this command
+        """
+        parser.add_argument(
+            "--quarantined",
+            action="store_true",
+            help="Only list quarantined emails, not those still being retried",
+        )
+        parser.add_argument(
+            "--redrive",
+            nargs="+",
+            type=int,
+            metavar="ID",
+            help="Process these failed emails again",
+        )
+        parser.add_argument(
+            "--redrive-all",
+            action="store_true",
+            help="Process every quarantined email again",
+        )
+        parser.add_argument(
+            "--discard",
+            nargs="+",
+            type=int,
+            metavar="ID",
+            help="Delete these failed emails from the quarantine without processing them",
+        )
+
+    def handle(self, *args, **options):
+        """
+        List, re-drive or discard failed emails.
+
+        Args:
+            *args: Variable length argument list
+            **options: Command line options
+
+        Raises:
+            CommandError: If an ID does not exist
+        """
+        if options["discard"]:
+            failed = self.select(options["discard"])
+            failed.delete()
+            self.stdout.write(self.style.SUCCESS(f"Discarded {len(options['discard'])} email(s)."))
+        elif options["redrive"] or options["redrive_all"]:
+            if options["redrive_all"]:
+                failed = FailedMessage.objects.filter(quarantined_at__isnull=False)
+            else:
+                failed = self.select(options["redrive"])
+            self.redrive(failed.order_by("id"))
+        else:
+            failed = FailedMessage.objects.order_by("id")
+            if options["quarantined"]:
+                failed = failed.filter(quarantined_at__isnull=False)
+            self.list(failed)
+
+    def select(self, ids):
+        """
+        Look up failed emails by ID.
+
+        Args:
+            ids (list): FailedMessage IDs
+
+        Returns:
+            QuerySet: The failed emails
+
+        Raises:
+            CommandError: If any of the IDs does not exist
+        """
+        failed = FailedMessage.objects.filter(id__in=ids)
+        missing = set(ids) - set(failed.values_list("id", flat=True))
+        if missing:
+            raise CommandError(f"No failed email with ID {', '.join(map(str, sorted(missing)))}")
+        return failed
+
+    def list(self, failed):
+        """
+        Print one line per failed email.
+
+        Args:
+            failed (QuerySet): FailedMessage rows to list
+        """
+        rows = list(failed)
+        if not rows:
+            self.stdout.write("No failed emails.")
+            return
+        self.stdout.write(f"{'ID':>5}   {'fails':>5}  {'last failure':<16}  mailbox / UID / subject / error")
+        for row in rows:
+            marker = "Q" if row.quarantined_at else " "
+            self.stdout.write(
+                f"{row.id:>5} {marker} {row.failures:>5}  {row.last_failed_at:%Y-%m-%d %H:%M}  "
+                f"{row.mailbox} UID {row.uid}  {row.subject[:40]!r}  {row.last_error[:80]}"
+            )
+
+    def redrive(self, failed):
+        """
+        Process failed emails again from their stored content.
+
+        Args:
+            failed (QuerySet): FailedMessage rows to re-drive
+        """
+        processor = ProcessEmailsCommand(stdout=self.stdout, stderr=self.stderr)
+        stored = 0
+        for row in failed:
+            if row.raw is None:
+                self.stderr.write(f"Email {row.id} has no stored content and cannot be re-driven")
+                continue
+            row_id = row.id
+            # Lift the quarantine so prepare_batch() does not skip the email
+            row.quarantined_at = None
+            row.save(update_fields=["quarantined_at"])
+            # A new failure is counted under the mailbox the email came from
+            processor.source_key = row.mailbox or None
+            prepared = processor.prepare_batch([(row.uid.encode(), bytes(row.raw))])
+            if prepared["skipped_ids"]:
+                # Stored in the meantime, e.g. from another copy of the email
+                row.delete()
+            processor.store_batch(prepared)
+            if FailedMessage.objects.filter(id=row_id).exists():
+                self.stderr.write(f"Email {row_id} failed again")
+            else:
+                stored += 1
+        processor.save_stats("quarantine", stored)
+        self.stdout.write(self.style.SUCCESS(f"Re-drove {stored} email(s) successfully."))
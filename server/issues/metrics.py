@@ -0,0 +1,280 @@
+"""
+Per-stage timing and byte counts of email ingestion.
+
+Every ingestion run records how long each stage took and how many bytes
+went through it, so a slow run can be attributed to the network (connect,
+search, fetch, flag), the CPU (parse, classify) or the database (dedupe,
+write):
+
+    connect   TLS handshake, LOGIN and SELECT
+    search    STATUS and UID SEARCH for new emails
+    fetch     UID FETCH of a batch; bytes are the downloaded messages
+    parse     MIME parsing of one email; bytes are the raw message
+    classify  status and priority detection of one email
+    dedupe    lookup of a batch's message keys among the stored emails
+    write     database transaction of a batch
+    flag      UID STORE of the \\Seen flag for a batch
+
+Durations go into histograms with fixed exponential buckets, which can be
+merged across runs and processes by adding up bucket counts. A run's
+IngestStats is printed by `process_emails --stats` and stored as an
+IngestRun row, which the ingest metrics endpoint merges.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from issues.models import IngestRun
+
+# Ingestion stages in pipeline order
+STAGES = ("connect", "search", "fetch", "dedupe", "parse", "classify", "write", "flag")
+
+# Upper bounds of the histogram buckets in seconds: 0.1 ms doubling up to about 52 s
+BUCKETS = tuple(0.0001 * 2 ** exponent for exponent in range(20)) + (math.inf,)
+
+# Number of IngestRun rows kept for the metrics endpoint
+RUNS_KEPT = 1000
+
+
+class Histogram:
+    """
+    Distribution of durations in fixed buckets.
+
+    Quantiles are estimated by linear interpolation within the bucket that
+    holds them, the way Prometheus' histogram_quantile() does, and clamped
+    to the smallest and largest observed value.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        """
+        Record one duration.
+
+        Args:
+            value (float): Duration in seconds
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Add the observations of another histogram to this one.
+
+        Args:
+            other (Histogram): Histogram to add
+        """
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the recorded durations.
+
+        Args:
+            q (float): Quantile between 0 and 1, e.g. 0.99
+
+        Returns:
+            float: Estimated duration in seconds, or None without observations
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if BUCKETS[index] != math.inf else self.max
+                estimate = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def to_dict(self):
+        """Return a JSON-serialisable representation, see from_dict()."""
+        return {"counts": self.counts, "count": self.count, "sum": self.sum, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a histogram from to_dict() output.
+
+        Args:
+            data (dict): Result of to_dict()
+
+        Returns:
+            Histogram: The restored histogram
+        """
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class IngestStats:
+    """
+    Stage durations and byte counts of one or more ingestion runs.
+
+    Safe to record into from several threads, as the mailbox engine does.
+    """
+
+    def __init__(self):
+        self.durations = {stage: Histogram() for stage in STAGES}
+        self.bytes = {stage: 0 for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, nbytes=0):
+        """
+        Record one operation of a stage.
+
+        Args:
+            stage (str): One of STAGES
+            seconds (float): How long the operation took
+            nbytes (int): Bytes the operation handled
+        """
+        with self.lock:
+            self.durations[stage].observe(seconds)
+            self.bytes[stage] += nbytes
+
+    @contextmanager
+    def time(self, stage):
+        """
+        Time the enclosed block as one operation of `stage`.
+
+        Yields a dict whose "bytes" entry the block can set.
+
+        Args:
+            stage (str): One of STAGES
+        """
+        measured = {"bytes": 0}
+        started = time.perf_counter()
+        try:
+            yield measured
+        finally:
+            self.observe(stage, time.perf_counter() - started, measured["bytes"])
+
+    def merge(self, other):
+        """
+        Add the records of another IngestStats to this one.
+
+        Args:
+            other (IngestStats): Stats to add
+        """
+        with self.lock:
+            for stage in STAGES:
+                self.durations[stage].merge(other.durations[stage])
+                self.bytes[stage] += other.bytes[stage]
+
+    def summary(self):
+        """
+        Summarise every stage.
+
+        Returns:
+            dict: Per stage: number of operations, total and p50/p99 seconds and bytes
+        """
+        return {
+            stage: {
+                "count": self.durations[stage].count,
+                "seconds": self.durations[stage].sum,
+                "p50": self.durations[stage].quantile(0.5),
+                "p99": self.durations[stage].quantile(0.99),
+                "bytes": self.bytes[stage],
+            }
+            for stage in STAGES
+        }
+
+    def report(self):
+        """
+        Format the summary as a table for the --stats option.
+
+        Returns:
+            list: Lines of text
+        """
+        lines = [f"{'stage':<9} {'ops':>7} {'total s':>9} {'p50 ms':>9} {'p99 ms':>9} {'bytes':>12}"]
+        for stage, row in self.summary().items():
+            p50 = f"{row['p50'] * 1000:.2f}" if row["p50"] is not None else "-"
+            p99 = f"{row['p99'] * 1000:.2f}" if row["p99"] is not None else "-"
+            lines.append(
+                f"{stage:<9} {row['count']:>7} {row['seconds']:>9.3f} {p50:>9} {p99:>9} {row['bytes']:>12}"
+            )
+        return lines
+
+    def to_dict(self):
+        """Return a JSON-serialisable representation, see from_dict()."""
+        return {
+            stage: {"durations": self.durations[stage].to_dict(), "bytes": self.bytes[stage]}
+            for stage in STAGES
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild stats from to_dict() output; stages missing from `data` stay empty.
+
+        Args:
+            data (dict): Result of to_dict()
+
+        Returns:
+            IngestStats: The restored stats
+        """
+        stats = cls()
+        for stage, record in data.items():
+            if stage in stats.durations:
+                stats.durations[stage] = Histogram.from_dict(record["durations"])
+                stats.bytes[stage] = record["bytes"]
+        return stats
+
+
+def record_run(stats, source, emails=0):
+    """
+    Store the stats of a finished run as an IngestRun row.
+
+    Only the newest RUNS_KEPT runs are kept.
+
+    Args:
+        stats (IngestStats): Stats of the run
+        source (str): What did the run, e.g. "process_emails"
+        emails (int): Number of new emails the run handled
+
+    Returns:
+        IngestRun: The stored run
+    """
+    run = IngestRun.objects.create(source=source, emails=emails or 0, stats=stats.to_dict())
+    IngestRun.objects.filter(id__lte=run.id - RUNS_KEPT).delete()
+    return run
+
+
+def recent_stats(runs=100):
+    """
+    Merge the stats of the most recent runs.
+
+    Args:
+        runs (int): Number of runs to merge
+
+    Returns:
+        tuple: (IngestStats, number of runs merged, number of emails they handled)
+    """
+    stats = IngestStats()
+    merged = emails = 0
+    for data, run_emails in IngestRun.objects.order_by("-id").values_list("stats", "emails")[:runs]:
+        stats.merge(IngestStats.from_dict(data))
+        merged += 1
+        emails += run_emails
+    return stats, merged, emails
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0004_alter_bug_created_at_alter_bug_modified_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mailbox', models.CharField(max_length=255, unique=True)),
+                ('uidvalidity', models.BigIntegerField()),
+                ('last_uid', models.BigIntegerField(default=0)),
+                ('highest_modseq', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
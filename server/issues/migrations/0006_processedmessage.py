@@ -0,0 +1,22 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0005_mailboxcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_hash', models.CharField(max_length=64, unique=True)),
+                ('bug_id', models.CharField(max_length=50)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0006_processedmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('token', models.CharField(max_length=32)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
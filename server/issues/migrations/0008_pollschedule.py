@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0007_tasklease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('token', models.CharField(max_length=32)),
+                ('interval', models.FloatField()),
+                ('last_found', models.IntegerField(default=0)),
+                ('next_run_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0008_pollschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('emails', models.IntegerField(default=0)),
+                ('stats', models.JSONField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
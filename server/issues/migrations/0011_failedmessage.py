@@ -0,0 +1,29 @@
+# Generated by Django 4.2.20 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0010_stagedmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_hash', models.CharField(max_length=64, unique=True)),
+                ('mailbox', models.CharField(blank=True, max_length=255)),
+                ('uid', models.CharField(blank=True, max_length=100)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('failures', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('raw', models.BinaryField(null=True)),
+                ('first_failed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_failed_at', models.DateTimeField(auto_now=True)),
+                ('quarantined_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
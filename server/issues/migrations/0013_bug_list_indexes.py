@@ -0,0 +1,33 @@
+# Generated by Django 4.2.20 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0012_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bug',
+            index=models.Index(fields=['status', 'priority', 'updated_at'], name='bug_status_priority_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bug',
+            index=models.Index(fields=['priority', 'updated_at'], name='bug_priority_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bug',
+            index=models.Index(fields=['updated_at', 'id'], name='bug_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bug',
+            index=models.Index(fields=['created_at', 'id'], name='bug_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bug',
+            index=models.Index(fields=['modified_count', 'updated_at'], name='bug_modified_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0013_bug_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stagedmessage',
+            name='key',
+            field=models.CharField(max_length=80, unique=True),
+        ),
+    ]
@@ -52,6 +52,16 @@ class Bug(models.Model):
     # Counter tracking how many times this bug has been modified
     modified_count = models.IntegerField(default=0)
 
+    class Meta:
+        # Composite indexes for the filters and orderings of the bug list
+        indexes = [
+            models.Index(fields=["status", "priority", "updated_at"], name="bug_status_priority_upd_idx"),
+            models.Index(fields=["priority", "updated_at"], name="bug_priority_updated_idx"),
+            models.Index(fields=["updated_at", "id"], name="bug_updated_id_idx"),
+            models.Index(fields=["created_at", "id"], name="bug_created_id_idx"),
+            models.Index(fields=["modified_count", "updated_at"], name="bug_modified_updated_idx"),
+        ]
+
     def __str__(self):
         """
         String representation of the Bug model.
@@ -59,4 +69,256 @@ class Bug(models.Model):
         Returns:
             str: The bug_id, providing a clear identifier when this object is displayed
         """
-        return self.bug_id
\ No newline at end of file
+        return self.bug_id
+
+class MailboxCheckpoint(models.Model):
+    """
+    Sync position of the email ingester in one IMAP mailbox.
+    
+    Instead of searching the whole mailbox for UNSEEN messages on every poll,
+    the ingester remembers the highest UID it has processed and only asks
+    for newer ones. UIDs are only meaningful together with the mailbox's
+    UIDVALIDITY; when the server changes it, the checkpoint is reset.
+    """
+    
+    # Identifies the mailbox, e.g. "bugs@example.com@imap.example.com/INBOX"
+    mailbox = models.CharField(max_length=255, unique=True)
+    
+    # UIDVALIDITY reported by the server when last_uid was recorded
+    uidvalidity = models.BigIntegerField()
+    
+    # Highest UID that has been processed; the next poll fetches UID last_uid+1:*
+    last_uid = models.BigIntegerField(default=0)
+    
+    # HIGHESTMODSEQ at the last complete sync, for servers supporting CONDSTORE
+    highest_modseq = models.BigIntegerField(null=True, blank=True)
+    
+    # Timestamp of the last checkpoint update
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        String representation of the MailboxCheckpoint model.
+        
+        Returns:
+            str: The mailbox and its last processed UID
+        """
+        return f"{self.mailbox} @ {self.last_uid}"
+
+class ProcessedMessage(models.Model):
+    """
+    Record of an email that has already been turned into a bug update.
+    
+    An email can reach the ingester more than once: a run can fail after
+    storing the bug but before flagging the email as read, and tasks are
+    retried. Each stored email leaves its key here, so a second delivery
+    is recognised and skipped instead of bumping modified_count again.
+    """
+    
+    # SHA-256 of the Message-ID header, or of the raw message if it has none
+    message_hash = models.CharField(max_length=64, unique=True)
+    
+    # Bug that the email created or updated
+    bug_id = models.CharField(max_length=50)
+    
+    # Timestamp when the email was processed
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        String representation of the ProcessedMessage model.
+        
+        Returns:
+            str: The message hash and the bug it was applied to
+        """
+        return f"{self.message_hash} -> {self.bug_id}"
+
+class TaskLease(models.Model):
+    """
+    Lease that lets only one run of a periodic task work at a time.
+    
+    Used by issues.locks when no Redis server is configured for task locks.
+    A lease that is not extended before expires_at can be taken over, so a
+    crashed worker does not block the task forever.
+    """
+    
+    # Name of the task the lease guards, e.g. "process-emails"
+    name = models.CharField(max_length=100, unique=True)
+    
+    # Random token of the holder; only the holder can extend or release the lease
+    token = models.CharField(max_length=32)
+    
+    # When the lease runs out unless it is extended
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        """
+        String representation of the TaskLease model.
+        
+        Returns:
+            str: The lease name and its expiry time
+        """
+        return f"{self.name} until {self.expires_at}"
+
+class PollSchedule(models.Model):
+    """
+    State of the adaptive email polling loop, see issues.polling.
+    
+    Each process_emails_task run schedules the next one itself. The row
+    remembers the current interval and which scheduled run is the live one,
+    so late or duplicate runs can tell that they have been superseded.
+    """
+    
+    # Name of the polled task, e.g. "process-emails"
+    name = models.CharField(max_length=100, unique=True)
+    
+    # Token passed to the scheduled run; runs with another token are stale
+    token = models.CharField(max_length=32)
+    
+    # Seconds between the last run and the scheduled one
+    interval = models.FloatField()
+    
+    # Number of new emails the last run found
+    last_found = models.IntegerField(default=0)
+    
+    # When the scheduled run is due
+    next_run_at = models.DateTimeField()
+
+    def __str__(self):
+        """
+        String representation of the PollSchedule model.
+        
+        Returns:
+            str: The task name and its current interval
+        """
+        return f"{self.name} every {self.interval:g}s"
+
+class IngestRun(models.Model):
+    """
+    Stage timings and byte counts of one email ingestion run.
+    
+    Written at the end of every process_emails run, Celery ingestion task and
+    listener pass, so the ingest metrics endpoint can merge them no matter
+    which process did the work. See issues.metrics for the format of `stats`.
+    """
+    
+    # What did the run, e.g. "process_emails" or "process_email_chunk"
+    source = models.CharField(max_length=50)
+    
+    # Number of new emails the run handled
+    emails = models.IntegerField(default=0)
+    
+    # IngestStats.to_dict() of the run
+    stats = models.JSONField()
+    
+    # Timestamp when the run finished
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        String representation of the IngestRun model.
+        
+        Returns:
+            str: The source and the number of emails of the run
+        """
+        return f"{self.source}: {self.emails} email(s) at {self.finished_at}"
+
+class StagedMessage(models.Model):
+    """
+    Raw email or stage results waiting between the stages of the ingestion pipeline.
+    
+    Used by issues.ingest when no Redis server is configured for staging.
+    The fetch stage writes a row with the raw email, parse and classify
+    one each with their fields as JSON, and the persist stage deletes them;
+    rows left behind by a failed pipeline are removed once they are older
+    than STAGE_TTL.
+    """
+    
+    # message_key() of the email, with a suffix for stage results
+    key = models.CharField(max_length=80, unique=True)
+    
+    # RFC822 content as fetched, or JSON fields of a stage
+    raw = models.BinaryField()
+    
+    # Timestamp when the fetch stage stored the email
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        String representation of the StagedMessage model.
+        
+        Returns:
+            str: The message key and when it was staged
+        """
+        return f"{self.key} staged at {self.created_at}"
+
+class FailedMessage(models.Model):
+    """
+    Failure count of an email that could not be ingested, see issues.quarantine.
+    
+    After INGEST_QUARANTINE_AFTER failures the email is quarantined: it is
+    flagged as read, later runs skip it, and it waits here with its raw
+    content until it is re-driven with the quarantine command.
+    """
+    
+    # SHA-256 of the Message-ID header, or of the raw message if it has none
+    message_hash = models.CharField(max_length=64, unique=True)
+    
+    # Mailbox the email was read from, e.g. "user@imap.gmail.com/INBOX", or the
+    # file source, e.g. "maildir:/var/mail/bugs"
+    mailbox = models.CharField(max_length=255, blank=True)
+    
+    # UID (or file source id) of the email when it last failed
+    uid = models.CharField(max_length=100, blank=True)
+    
+    # Decoded subject, for listings
+    subject = models.CharField(max_length=255, blank=True)
+    
+    # Number of runs the email failed in
+    failures = models.IntegerField(default=0)
+    
+    # Error of the last failure
+    last_error = models.TextField(blank=True)
+    
+    # Content as last fetched, used to re-drive the email
+    raw = models.BinaryField(null=True)
+    
+    # Timestamps of the first and the last failure
+    first_failed_at = models.DateTimeField(auto_now_add=True)
+    last_failed_at = models.DateTimeField(auto_now=True)
+    
+    # When the email was quarantined, None while it is still retried
+    quarantined_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """
+        String representation of the FailedMessage model.
+        
+        Returns:
+            str: The email's mailbox and UID and its number of failures
+        """
+        return f"{self.mailbox} UID {self.uid}: {self.failures} failure(s)"
+
+class IdSequence(models.Model):
+    """
+    Counter behind a block-allocated ID sequence, see issues.sequences.
+    
+    next_value is the first value no process has reserved yet; each process
+    moves it forward by a whole block with one UPDATE.
+    """
+    
+    # Name of the sequence, e.g. "auto-bug-id"
+    name = models.CharField(max_length=100, unique=True)
+    
+    # First value of the next block to hand out
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        """
+        String representation of the IdSequence model.
+        
+        Returns:
+            str: The sequence name and its next free value
+        """
+        return f"{self.name} at {self.next_value}"
+
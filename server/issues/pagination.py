@@ -0,0 +1,255 @@
+"""
+Keyset (cursor) pagination for the bug list.
+
+Page number pagination runs a COUNT(*) over the filtered table on every
+page, and its OFFSET makes the database walk past every earlier row, so
+page 10,000 costs ten thousand times page 1. Keyset pagination instead
+remembers the sort key of the last row it returned and asks for the rows
+after it:
+
+    WHERE updated_at <= :v AND (updated_at < :v OR id < :id)
+    ORDER BY updated_at DESC, id DESC LIMIT :size
+
+which the composite (updated_at, id) index answers with a range scan of
+one page, however deep. The sort key is whatever issues.filters ordered
+the queryset by, always ending in id so it is unique.
+
+Cursors are opaque base64 strings holding the sort key values, the
+ordering they belong to and the direction. The total count is only
+computed when asked for with ?count=true.
+"""
+import base64
+import json
+from collections import OrderedDict
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def wants_cursor_pagination(params):
+    """
+    Tell whether a bug list request asks for cursor pagination.
+
+    Args:
+        params (QueryDict): Query parameters of the request
+
+    Returns:
+        bool: True for ?pagination=cursor or a request that carries a cursor
+    """
+    return params.get("pagination") == "cursor" or "cursor" in params
+
+
+def wants_count(params):
+    """
+    Tell whether a cursor paginated request asks for the total count.
+
+    Args:
+        params (QueryDict): Query parameters of the request
+
+    Returns:
+        bool: True for ?count=true or ?count=1
+    """
+    return params.get("count") in ("1", "true")
+
+
+def encode_cursor(ordering, values, reverse=False):
+    """
+    Build an opaque cursor.
+
+    Args:
+        ordering (list): Ordering fields of the queryset, e.g. ["-updated_at", "-id"]
+        values (list): Sort key values of the row to continue from, as strings
+        reverse (bool): True for a cursor to the rows before that row
+
+    Returns:
+        str: URL-safe cursor
+    """
+    data = json.dumps({"o": list(ordering), "v": values, "r": reverse}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    """
+    Read a cursor made by encode_cursor() for the same ordering.
+
+    Args:
+        cursor (str): Cursor from the request
+        ordering (list): Ordering fields of the queryset
+
+    Returns:
+        tuple: (values as strings, reverse)
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another ordering
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values, reverse = data["v"], bool(data["r"])
+        cursor_ordering = data["o"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if cursor_ordering != list(ordering) or len(values) != len(ordering):
+        raise ValueError("Cursor does not match the requested ordering")
+    return values, reverse
+
+
+def after(ordering, values):
+    """
+    Build the condition for rows that come after a sort key.
+
+    For ordering (a, b, id) that is a > x OR (a = x AND b > y) OR
+    (a = x AND b = y AND id > z), with < for descending fields. The first
+    field's >= / <= is added on top so the database can start an index
+    range scan at the cursor instead of evaluating the OR on every row.
+
+    Args:
+        ordering (list): Ordering fields, "-" for descending
+        values (list): Sort key values, converted to the fields' types
+
+    Returns:
+        Q: The filter condition
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    first = ordering[0]
+    return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & condition
+
+
+def invert(ordering):
+    """
+    Reverse the direction of every ordering field.
+
+    Args:
+        ordering (list): Ordering fields, "-" for descending
+
+    Returns:
+        list: The same fields in the opposite direction
+    """
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+class BugCursorPagination(BasePagination):
+    """
+    Keyset pagination with opaque next/previous cursors.
+
+    The queryset must be ordered by unique sort keys, as issues.filters
+    orders it. Page sizes follow BugPagination.
+
+    Query parameters:
+        cursor: Cursor from a previous response's next or previous link
+        page_size: Number of items per page (default: 10, max: 50)
+        count: "true" to include the total number of matching bugs
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10  # Default number of items per page
+    page_size_query_param = 'page_size'  # Allow clients to specify page size
+    max_page_size = 50  # Maximum number of items per page
+
+    def get_page_size(self, request):
+        """
+        Return the page size asked for, within max_page_size.
+
+        Args:
+            request: The HTTP request object
+
+        Returns:
+            int: Number of items per page
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of the queryset after or before the request's cursor.
+
+        Args:
+            queryset (QuerySet): Ordered queryset to paginate
+            request: The HTTP request object
+            view: The view being paginated
+
+        Returns:
+            list: The objects of the page, in queryset order
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        self.request = request
+        self.ordering = list(queryset.query.order_by)
+        self.count = queryset.count() if wants_count(request.query_params) else None
+        size = self.get_page_size(request)
+        fields = [queryset.model._meta.get_field(field.lstrip("-")) for field in self.ordering]
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        raw_values, reverse = decode_cursor(cursor, self.ordering) if cursor else (None, False)
+        ordering = invert(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if raw_values is not None:
+            try:
+                values = [field.to_python(value) for field, value in zip(fields, raw_values)]
+            except Exception:
+                raise ValueError("Invalid cursor")
+            queryset = queryset.filter(after(ordering, values))
+
+        rows = list(queryset[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        def key(row):
+            return [field.value_to_string(row) for field in fields]
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = encode_cursor(self.ordering, key(rows[-1]))
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_cursor = encode_cursor(self.ordering, key(rows[0]), reverse=True)
+        elif cursor:
+            # Past either end: offer the way back from the cursor's own position
+            if reverse:
+                self.next_cursor = encode_cursor(self.ordering, raw_values)
+            else:
+                self.previous_cursor = encode_cursor(self.ordering, raw_values, reverse=True)
+        return rows
+
+    def link(self, cursor):
+        """
+        Build the URL of the page at a cursor.
+
+        Args:
+            cursor (str): Cursor of the page, or None
+
+        Returns:
+            str: Absolute URL, or None without a cursor
+        """
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        """
+        Wrap a page in the response envelope.
+
+        Args:
+            data (list): Serialized objects of the page
+
+        Returns:
+            Response: next, previous, count when asked for, and results
+        """
+        envelope = OrderedDict()
+        if self.count is not None:
+            envelope["count"] = self.count
+        envelope["next"] = self.link(self.next_cursor)
+        envelope["previous"] = self.link(self.previous_cursor)
+        envelope["results"] = data
+        return Response(envelope)
@@ -0,0 +1,101 @@
+"""
+Adaptive polling interval for process_emails_task.
+
+A fixed beat schedule polls as often at night as during an incident storm.
+With INGEST_ADAPTIVE_POLLING enabled, each run schedules the next one with
+apply_async(countdown=...) instead:
+
+- a run that found new mail polls again after INGEST_POLL_MIN_INTERVAL
+- every run that found nothing doubles the interval, up to
+  INGEST_POLL_MAX_INTERVAL
+
+The interval and the token of the scheduled run live in a PollSchedule row.
+Only the run holding the current token continues the chain; the beat entry
+becomes a watchdog that restarts the chain when the scheduled run is
+overdue, for example after a worker was killed.
+"""
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from issues.models import PollSchedule
+
+# Name of the PollSchedule row of process_emails_task
+POLL_NAME = "process-emails"
+
+# Factor the interval grows by after each run that found no mail
+BACKOFF_FACTOR = 2
+
+# Seconds a scheduled run may be late before a beat run restarts the chain
+OVERDUE_GRACE = 60
+
+
+def is_enabled():
+    """Return whether adaptive polling is switched on in the settings."""
+    return getattr(settings, "INGEST_ADAPTIVE_POLLING", False)
+
+
+def next_interval(previous, found):
+    """
+    Compute the delay before the next poll.
+
+    Args:
+        previous (float): Current interval in seconds, or None for the first run
+        found (int): New emails found by the run, or None if it did not get to look
+
+    Returns:
+        float: Seconds until the next run
+    """
+    minimum = settings.INGEST_POLL_MIN_INTERVAL
+    maximum = settings.INGEST_POLL_MAX_INTERVAL
+    if previous is None or found:
+        return minimum
+    if found is None:
+        return min(maximum, max(minimum, previous))
+    return min(maximum, max(minimum, previous * BACKOFF_FACTOR))
+
+
+def claim_poll(token=None):
+    """
+    Decide whether a run of process_emails_task is part of the live chain.
+
+    Args:
+        token (str): Token of a run scheduled by schedule_next_poll(), or None
+                     for a run started by beat or by hand
+
+    Returns:
+        bool: True if the run should go ahead and schedule the next one
+    """
+    schedule = PollSchedule.objects.filter(name=POLL_NAME).first()
+    if token is not None:
+        return schedule is not None and schedule.token == token
+    # Beat only restarts the chain when its scheduled run is overdue
+    return schedule is None or schedule.next_run_at < now() - timedelta(seconds=OVERDUE_GRACE)
+
+
+def schedule_next_poll(task, found):
+    """
+    Record how much mail a run found and schedule the next run.
+
+    Args:
+        task (celery.Task): Task to schedule, process_emails_task
+        found (int): New emails found by the run, or None if it did not get to look
+
+    Returns:
+        float: Seconds until the next run
+    """
+    with transaction.atomic():
+        schedule = (
+            PollSchedule.objects.select_for_update().filter(name=POLL_NAME).first()
+            or PollSchedule(name=POLL_NAME)
+        )
+        interval = next_interval(schedule.interval if schedule.pk else None, found)
+        schedule.token = uuid.uuid4().hex
+        schedule.interval = interval
+        if found is not None:
+            schedule.last_found = found
+        schedule.next_run_at = now() + timedelta(seconds=interval)
+        schedule.save()
+    task.apply_async(kwargs={"poll_token": schedule.token}, countdown=interval)
+    return interval
@@ -0,0 +1,133 @@
+"""
+Quarantine for emails that keep failing to be ingested.
+
+An email that cannot be parsed or stored is left unread so a later run can
+try again. When the failure is permanent, say a broken charset, every run
+that reads it downloads and parses it again: failed emails are fetched
+again by the UID in their FailedMessage row on every poll, see
+process_emails' retry_uids(). Each failure is counted in that row, keyed
+by message_key(); after INGEST_QUARANTINE_AFTER failures the email is
+quarantined:
+
+- it is flagged as read, and moved to the INGEST_QUARANTINE_FOLDER IMAP
+  folder when one is set
+- its raw content and last error stay in the FailedMessage row
+- later runs skip it like an email that was already stored
+
+`python manage.py quarantine` lists failing and quarantined emails and can
+re-drive them through the pipeline once the cause has been fixed.
+"""
+import logging
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from django.conf import settings
+from django.utils.timezone import now
+from issues.models import FailedMessage
+
+# Get a logger for the quarantine
+logger = logging.getLogger('bug_tracker')
+
+
+def message_subject(raw_email):
+    """
+    Decode the subject of an email for listings, without failing.
+
+    Args:
+        raw_email (bytes): RFC822 content of the email
+
+    Returns:
+        str: The decoded subject, or "" if there is none or it cannot be decoded
+    """
+    try:
+        headers = BytesHeaderParser().parsebytes(raw_email, headersonly=True)
+        return str(make_header(decode_header(headers.get("Subject") or "")))[:255]
+    except Exception:
+        return ""
+
+
+def record_failures(errors, keys, raw_emails, mailbox):
+    """
+    Count one more failure for each failed email of a batch.
+
+    Args:
+        errors (dict): Error message of each failed email_id
+        keys (dict): message_key() of each email_id
+        raw_emails (dict): Raw content of each email_id, where available
+        mailbox (str): Mailbox the emails were read from
+
+    Returns:
+        list: email_ids that have failed often enough to be quarantined now
+    """
+    quarantined = []
+    for email_id, error in errors.items():
+        failed, _ = FailedMessage.objects.get_or_create(
+            message_hash=keys[email_id], defaults={"mailbox": mailbox, "uid": email_id.decode()}
+        )
+        # The UID the next poll retries the email under, see process_emails' retry_uids()
+        failed.mailbox, failed.uid = mailbox, email_id.decode()
+        failed.failures += 1
+        failed.last_error = error
+        if raw_emails.get(email_id) is not None:
+            failed.raw = raw_emails[email_id]
+            failed.subject = message_subject(raw_emails[email_id])
+        if failed.quarantined_at is None and failed.failures >= settings.INGEST_QUARANTINE_AFTER:
+            failed.quarantined_at = now()
+            quarantined.append(email_id)
+            logger.warning(f"Quarantined email {email_id} of {mailbox} after {failed.failures} failures: {error}")
+        failed.save()
+    return quarantined
+
+
+def quarantined_keys(keys):
+    """
+    Return which of the given message keys belong to quarantined emails.
+
+    Args:
+        keys (set): message_key() values
+
+    Returns:
+        list: The keys of quarantined emails
+    """
+    return list(
+        FailedMessage.objects.filter(message_hash__in=keys, quarantined_at__isnull=False)
+        .values_list("message_hash", flat=True)
+    )
+
+
+def move_to_quarantine(mail, uid_set, folder=None):
+    """
+    Move quarantined emails to the quarantine IMAP folder, if one is set.
+
+    Uses UID MOVE where the server supports it. Otherwise the emails are
+    copied and flagged \\Deleted, leaving the expunge to the server.
+
+    Args:
+        mail (imaplib.IMAP4_SSL): Connected IMAP client
+        uid_set (str): IMAP UID set of the emails
+        folder (str): Target folder, defaults to INGEST_QUARANTINE_FOLDER
+
+    Returns:
+        bool: True if the emails were moved
+    """
+    folder = folder or getattr(settings, "INGEST_QUARANTINE_FOLDER", None)
+    if not folder:
+        return False
+    try:
+        if "MOVE" in getattr(mail, "capabilities", ()):
+            status, _ = mail.uid("MOVE", uid_set, folder)
+            if status != "OK":
+                # Most servers refuse to move into a folder that does not exist yet
+                mail.create(folder)
+                status, _ = mail.uid("MOVE", uid_set, folder)
+        else:
+            mail.create(folder)
+            status, _ = mail.uid("COPY", uid_set, folder)
+            if status == "OK":
+                status, _ = mail.uid("STORE", uid_set, "+FLAGS", "\\Deleted")
+    except Exception as e:
+        logger.error(f"Error moving emails {uid_set} to {folder}: {str(e)}")
+        return False
+    if status != "OK":
+        logger.error(f"Failed to move emails {uid_set} to {folder}")
+        return False
+    return True
@@ -0,0 +1,123 @@
+"""
+Block-allocated ID sequences.
+
+Emails without a bug ID in their subject get an automatic one. It used to
+be built from the current second and the start of the subject, so two
+reports with similar subjects arriving in the same second were merged into
+one bug, which got more likely the faster emails were ingested.
+
+Automatic IDs now come from a sequence. Each process reserves a block of
+BLOCK_SIZE consecutive values with a single UPDATE and hands them out from
+memory, so IDs are unique across workers at the cost of one query per block.
+Values of a block that a process did not use before it exited are skipped.
+The sequence of automatic IDs starts after the highest AUTO-<n> bug ID that
+already exists, so it never hands out an ID a bug already has.
+"""
+import os
+import threading
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from issues.models import Bug, IdSequence
+
+# Name of the sequence behind automatic bug IDs
+AUTO_ID_SEQUENCE = "auto-bug-id"
+
+# Prefix of automatic bug IDs, followed by a value of AUTO_ID_SEQUENCE
+AUTO_ID_PREFIX = "AUTO-"
+
+# Number of values a process reserves at a time
+BLOCK_SIZE = 1000
+
+
+def first_value(name):
+    """
+    Return the value a new sequence starts at.
+
+    AUTO_ID_SEQUENCE starts after the highest AUTO-<n> bug ID, e.g. one
+    entered by hand or allocated before the sequence row existed; IDs from
+    the old AUTO-<timestamp>-<subject> scheme do not match and are ignored.
+
+    Args:
+        name (str): Name of the sequence
+
+    Returns:
+        int: First value of the sequence
+    """
+    if name != AUTO_ID_SEQUENCE:
+        return 1
+    bug_ids = Bug.objects.filter(bug_id__regex=rf"^{AUTO_ID_PREFIX}[0-9]+$").values_list("bug_id", flat=True)
+    return max((int(bug_id[len(AUTO_ID_PREFIX):]) for bug_id in bug_ids), default=0) + 1
+
+
+def reserve_block(name, size=BLOCK_SIZE):
+    """
+    Reserve the next block of a sequence.
+
+    The UPDATE locks the row until the transaction ends, so concurrent
+    callers always get disjoint blocks.
+
+    Args:
+        name (str): Name of the sequence
+        size (int): Number of values to reserve
+
+    Returns:
+        int: First value of the block; the block ends before first + size
+    """
+    with transaction.atomic():
+        if not IdSequence.objects.filter(name=name).update(next_value=F("next_value") + size):
+            try:
+                start = first_value(name)
+                with transaction.atomic():
+                    IdSequence.objects.create(name=name, next_value=start + size)
+                return start
+            except IntegrityError:
+                # Another process created the sequence in the meantime
+                IdSequence.objects.filter(name=name).update(next_value=F("next_value") + size)
+        return IdSequence.objects.get(name=name).next_value - size
+
+
+class SequenceAllocator:
+    """
+    Hands out the values of a sequence from blocks reserved by this process.
+
+    Safe to use from several threads. A forked child process reserves its
+    own blocks instead of reusing its parent's.
+
+    Args:
+        name (str): Name of the sequence
+        block_size (int): Number of values to reserve at a time
+    """
+
+    def __init__(self, name, block_size=BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.next = self.end = 0
+
+    def next_value(self, run=None):
+        """
+        Return the next value, reserving a new block when this one is used up.
+
+        Args:
+            run (callable): run(func, *args) that performs the reservation, for
+                            callers that route database access through one
+                            thread; by default it runs right here
+
+        Returns:
+            int: A value no other caller of the sequence gets
+        """
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.next = self.end = 0
+            if self.next >= self.end:
+                start = (run or (lambda func, *args: func(*args)))(reserve_block, self.name, self.block_size)
+                self.next, self.end = start, start + self.block_size
+            value = self.next
+            self.next += 1
+            return value
+
+
+# Source of automatic bug IDs in this process
+auto_ids = SequenceAllocator(AUTO_ID_SEQUENCE)
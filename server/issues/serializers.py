@@ -1,7 +1,33 @@
 from rest_framework import serializers
 from .models import Bug
 
-class BugSerializer(serializers.ModelSerializer):
+# Number of description characters in the bug list's description_preview
+DESCRIPTION_PREVIEW_LENGTH = 200
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that outputs only the fields a request asks for.
+    
+    Takes two extra keyword arguments:
+    - fields: names of the fields to output; defaults to default_fields,
+      or every field if that is None
+    - omit: names of fields to leave out
+    """
+    default_fields = None  # Fields output when no fields are asked for; None for all
+    annotated_fields = ()  # Method fields the views fill from a queryset annotation of the same name
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = fields or self.default_fields
+        if keep is not None:
+            for name in set(self.fields) - set(keep):
+                self.fields.pop(name)
+        for name in omit or ():
+            self.fields.pop(name, None)
+
+
+class BugSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Bug model.
     
@@ -9,13 +35,56 @@ class BugSerializer(serializers.ModelSerializer):
     incoming data for creating or updating Bug records.
     
     This serializer includes all fields from the Bug model, providing a complete
-    representation of bug data for the API.
+    representation of bug data for the API. The fields and omit arguments
+    of SparseFieldsetMixin narrow it down.
     """
     class Meta:
         model = Bug
         fields = '__all__'
 
 
+class BugListSerializer(BugSerializer):
+    """
+    Compact serializer for the bug list.
+    
+    Descriptions of emailed bugs are often tens of KB and the list never
+    shows them, so by default it outputs a description_preview of the
+    first DESCRIPTION_PREVIEW_LENGTH characters instead. The full
+    description is still available with ?fields=.
+    """
+    description_preview = serializers.SerializerMethodField()
+    annotated_fields = ('description_preview',)
+
+    class Meta(BugSerializer.Meta):
+        fields = [
+            'id', 'bug_id', 'subject', 'description', 'status', 'priority',
+            'created_at', 'updated_at', 'modified_count', 'description_preview',
+        ]
+
+    default_fields = [
+        'id', 'bug_id', 'subject', 'status', 'priority',
+        'created_at', 'updated_at', 'modified_count', 'description_preview',
+    ]
+
+    def get_description_preview(self, bug):
+        """
+        Return the start of the description.
+        
+        Uses the description_preview annotation BugListView adds, so the
+        full description does not have to be read from the database.
+        
+        Args:
+            bug (Bug): The bug being serialized
+            
+        Returns:
+            str: At most DESCRIPTION_PREVIEW_LENGTH characters
+        """
+        preview = getattr(bug, 'description_preview', None)
+        if preview is None:
+            preview = bug.description[:DESCRIPTION_PREVIEW_LENGTH]
+        return preview
+
+
 class BugModificationSerializer(serializers.Serializer):
     """
     Serializer for bug modification statistics.
@@ -28,4 +97,51 @@ class BugModificationSerializer(serializers.Serializer):
     - count: The number of bugs modified on that date
     """
     date = serializers.DateField()
-    count = serializers.IntegerField()
\ No newline at end of file
+    count = serializers.IntegerField()
+
+
+def compile_representation(serializer):
+    """
+    Build a converter from values_list() rows to a serializer's output.
+    
+    Instantiating models and dispatching every value through the
+    serializer's fields costs more than the query for a page of bugs. For
+    read-only responses the views select the output columns with
+    values_list() instead and convert each row with the function returned
+    here, which applies the DateTimeField formatting and choice mapping the
+    serializer would, so the JSON is byte-for-byte the same.
+    
+    Args:
+        serializer (SparseFieldsetMixin): Serializer whose output to reproduce
+        
+    Returns:
+        tuple: (column names to pass to values_list(), convert(row) -> dict),
+               or None if a field cannot be converted without the serializer;
+               convert() only reads the first len(names) values of a row
+    """
+    names, steps = [], []
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.DateTimeField):
+            step = field.to_representation
+        elif isinstance(field, serializers.ChoiceField):
+            mapping = field.choice_strings_to_values
+            step = lambda value, mapping=mapping: mapping.get(str(value), value)
+        elif isinstance(field, (serializers.CharField, serializers.IntegerField)):
+            step = None
+        elif name in serializer.annotated_fields:
+            step = None
+        else:
+            return None
+        if field.source != name and name not in serializer.annotated_fields:
+            return None
+        names.append(name)
+        steps.append(step)
+    columns = list(zip(names, steps))
+
+    def convert(row):
+        return {
+            name: value if step is None or value is None else step(value)
+            for (name, step), value in zip(columns, row)
+        }
+    return names, convert
+
@@ -5,34 +5,332 @@
 # and added to the database without blocking the main application.
 
 import logging
-from celery import shared_task
-from django.core.management import call_command
+from celery import chain, chord, shared_task
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from issues import ingest
+from issues.imap import chunked, connection_pool
+from issues.locks import EMAIL_LEASE, LeaseLost, mailbox_lease
+from issues.management.commands.process_emails import Command as ProcessEmailsCommand
+from issues.management.commands.process_emails import FETCH_BATCH_SIZE
+from issues.models import MailboxCheckpoint
+from issues.polling import claim_poll, is_enabled, schedule_next_poll
 
 # Get logger instance for recording task execution information
 logger = logging.getLogger('bug_tracker')
 
+# Number of UIDs handed to each process_email_chunk subtask
+CHUNK_SIZE = 500
+
 @shared_task
-def process_emails_task():
+def process_emails_task(poll_token=None):
     """
     Process unread bug report emails.
-    This task calls the custom management command 'process_emails'.
     
-    The task connects to the configured email server, fetches unread emails,
-    parses them to extract bug information, and creates or updates bug records.
+    This task is the coordinator of an ingestion pass. It finds the emails
+    that arrived since the mailbox checkpoint, splits their UIDs into chunks
+    of CHUNK_SIZE and fans the chunks out to process_email_chunk subtasks
+    with a Celery chord, so every worker process fetches, parses and stores
+    a share of a large backlog. finish_email_ingest() runs once all chunks
+    are done, adds up their counts and advances the checkpoint.
+    
+    A backlog that fits into one chunk is processed right here, without the
+    round trips through the broker.
+    
+    With INGEST_STAGED_PIPELINE, every chunk runs through the fetch, parse,
+    classify and persist stages of issues.ingest instead: as a chain of
+    stage tasks when fanned out, see pipeline_chain(), or in this process.
+    
+    Only one run works on the mailbox at a time: the run holds the
+    mailbox's EMAIL_LEASE, see issues.locks.mailbox_lease(), until
+    finish_email_ingest() releases it, and chunks extend it after every
+    batch they store. When beat fires while a run, the listener or a
+    MailboxEngine session is still working on the mailbox, the new run
+    finds the lease taken and returns immediately. If a chunk fails, the
+    lease is left to expire.
+    
+    IMAP connections are taken from the worker process's connection pool,
+    so consecutive runs in the same process skip the TLS handshake and LOGIN.
+    
+    With INGEST_ADAPTIVE_POLLING, each run schedules the next one after an
+    interval that depends on how much mail it found, see issues.polling.
     
+    Args:
+        poll_token (str): Token of a run scheduled by adaptive polling
+        
     Returns:
-        str: Success message if emails were processed successfully
+        str: Success message if emails were processed or dispatched successfully
         
     Raises:
         Exception: Any exception that occurred during processing is re-raised
                    to ensure Celery marks the task as failed for proper monitoring
     """
+    adaptive = is_enabled()
+    if adaptive and not claim_poll(poll_token):
+        return "Skipped, next poll already scheduled"
+
+    found = None
+    try:
+        result, found = ingest_new_emails()
+        return result
+    finally:
+        if adaptive:
+            schedule_next_poll(process_emails_task, found)
+
+def ingest_new_emails():
+    """
+    Run one coordinated ingestion pass, see process_emails_task().
+    
+    Returns:
+        tuple: (result message, number of new emails found or None if the
+               run did not get to search the mailbox)
+    """
+    processor = ProcessEmailsCommand()
+    lease = mailbox_lease(processor.checkpoint_key())
+    if not lease.acquire():
+        logger.info("Previous email processing run still in progress, skipping")
+        return "Skipped, previous run still in progress", None
+
     try:
         logger.info("Starting scheduled email processing task")
-        call_command('process_emails')
+        mail = connection_pool.acquire(processor.checkpoint_key(), processor.connect_to_email)
+        if not mail:
+            logger.error("Failed to connect to email server.")
+            lease.release()
+            return "Failed to connect to email server.", None
+        try:
+            checkpoint, email_ids, status = processor.fetch_new_emails(mail)
+        except Exception:
+            connection_pool.discard(mail)
+            raise
+        connection_pool.release(mail)
+        # The emails themselves are counted by the chunks that process them
+        processor.save_stats("process_emails_task", 0)
+
+        # UIDs travel through the broker as JSON strings
+        chunks = [[uid.decode() for uid in chunk] for chunk in chunked(email_ids, CHUNK_SIZE)]
+        mailbox = processor.checkpoint_key()
+        staged = getattr(settings, "INGEST_STAGED_PIPELINE", False)
+        if len(chunks) > 1:
+            if staged:
+                header = [pipeline_chain(chunk, lease.token) for chunk in chunks]
+            else:
+                header = [process_email_chunk.s(chunk, lease.token) for chunk in chunks]
+            chord(header)(finish_email_ingest.s(mailbox, status, lease.token))
+            logger.info(f"Dispatched {len(email_ids)} new email(s) in {len(chunks)} chunks")
+            return f"Dispatched {len(chunks)} chunks of new emails", len(email_ids)
+
+        if staged:
+            results = [ingest.run_pipeline(chunk, processor) for chunk in chunks]
+            processor.save_stats("ingest_pipeline", sum(len(chunk) for chunk in chunks))
+        else:
+            results = [process_email_chunk(chunk, lease.token) for chunk in chunks]
+        finish_email_ingest(results, mailbox, status, lease.token)
         logger.info("Email processing task completed successfully")
-        return "Emails processed successfully"
+        return "Emails processed successfully", len(email_ids)
     except Exception as e:
+        lease.release()
         logger.error(f"Error processing emails: {str(e)}")
         # Re-raise if you want Celery to mark the task as failed
-        raise
\ No newline at end of file
+        raise
+
+@shared_task
+def process_email_chunk(uids, lease_token=None):
+    """
+    Fetch, parse and store one chunk of new emails.
+    
+    Chunks are processed without a mailbox checkpoint: they may finish in
+    any order, so only finish_email_ingest() moves the checkpoint, once all
+    of them succeeded. Emails that were stored by an earlier attempt are
+    recognised by their ProcessedMessage key and not applied twice.
+    
+    Every stored batch extends the run's lease. A chunk whose lease was
+    taken over by a newer run stops, leaving the rest to that run.
+    
+    Args:
+        uids (list): UIDs of the emails as strings
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: Number of "emails" in the chunk, how many were "fetched" and
+              how many were "processed" (stored or stored before)
+        
+    Raises:
+        ConnectionError: If no connection to the email server could be made
+        LeaseLost: If the run's lease expired and another run took it
+    """
+    processor = ProcessEmailsCommand()
+    lease = mailbox_lease(processor.checkpoint_key(), lease_token) if lease_token else None
+    mail = connection_pool.acquire(processor.checkpoint_key(), processor.connect_to_email)
+    if not mail:
+        raise ConnectionError("Failed to connect to email server.")
+
+    fetched = processed = 0
+    try:
+        for batch in processor.fetch_emails(mail, [uid.encode() for uid in uids], FETCH_BATCH_SIZE):
+            processed += processor.process_batch(mail, batch)
+            fetched += len(batch)
+            if lease is not None and not lease.extend():
+                raise LeaseLost(f"Lost the {EMAIL_LEASE} lease after {fetched} email(s)")
+    except Exception:
+        connection_pool.discard(mail)
+        raise
+    connection_pool.release(mail)
+    processor.save_stats("process_email_chunk", len(uids))
+    return {"emails": len(uids), "fetched": fetched, "processed": processed}
+
+def pipeline_chain(uids, lease_token=None):
+    """
+    Build the chain of stage tasks that ingests one chunk of new emails.
+    
+    The stages hand each other compact message references; raw emails wait
+    in the message store of issues.ingest. Each stage extends the run's
+    lease before it starts.
+    
+    Args:
+        uids (list): UIDs of the emails as strings
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        celery.canvas.Signature: Chain whose result is persist_emails_stage()'s,
+                                 in the format of process_email_chunk()
+    """
+    return chain(
+        fetch_emails_stage.s(uids, lease_token),
+        parse_emails_stage.s(lease_token),
+        classify_emails_stage.s(lease_token),
+        persist_emails_stage.s(lease_token),
+    )
+
+def extend_lease(lease_token):
+    """
+    Extend the run's EMAIL_LEASE before a stage task starts working.
+    
+    Args:
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Raises:
+        LeaseLost: If the lease expired and another run took it
+    """
+    mailbox = ProcessEmailsCommand.imap_source.checkpoint_key
+    if lease_token and not mailbox_lease(mailbox, lease_token).extend():
+        raise LeaseLost(f"Lost the {EMAIL_LEASE} lease")
+
+@shared_task
+def fetch_emails_stage(uids, lease_token=None):
+    """
+    Fetch stage of pipeline_chain(), see issues.ingest.fetch().
+    
+    Args:
+        uids (list): UIDs of the emails as strings
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: Envelope of message references for parse_emails_stage()
+    """
+    extend_lease(lease_token)
+    processor = ProcessEmailsCommand()
+    envelope = ingest.fetch(uids, processor)
+    processor.save_stats("fetch_emails_stage", 0)
+    return envelope
+
+@shared_task
+def parse_emails_stage(envelope, lease_token=None):
+    """
+    Parse stage of pipeline_chain(), see issues.ingest.parse().
+    
+    Args:
+        envelope (dict): Result of fetch_emails_stage()
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: Envelope of parsed message references for classify_emails_stage()
+    """
+    extend_lease(lease_token)
+    processor = ProcessEmailsCommand()
+    envelope = ingest.parse(envelope, processor)
+    processor.save_stats("parse_emails_stage", 0)
+    return envelope
+
+@shared_task
+def classify_emails_stage(envelope, lease_token=None):
+    """
+    Classify stage of pipeline_chain(), see issues.ingest.classify().
+    
+    Args:
+        envelope (dict): Result of parse_emails_stage()
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: Envelope of classified message references for persist_emails_stage()
+    """
+    extend_lease(lease_token)
+    processor = ProcessEmailsCommand()
+    envelope = ingest.classify(envelope, processor)
+    processor.save_stats("classify_emails_stage", 0)
+    return envelope
+
+@shared_task
+def persist_emails_stage(envelope, lease_token=None):
+    """
+    Persist stage of pipeline_chain(), see issues.ingest.persist().
+    
+    Args:
+        envelope (dict): Result of classify_emails_stage()
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: "emails", "fetched" and "processed" counts like process_email_chunk()
+    """
+    extend_lease(lease_token)
+    processor = ProcessEmailsCommand()
+    result = ingest.persist(envelope, processor)
+    # The emails of the chunk are counted once, by the stage that stores them
+    processor.save_stats("persist_emails_stage", result["emails"])
+    return result
+
+@shared_task
+def finish_email_ingest(results, mailbox, status, lease_token=None):
+    """
+    Add up the counts of all chunks, advance the mailbox checkpoint when
+    every email was stored and release the run's lease.
+    
+    Args:
+        results (list): Return values of process_email_chunk()
+        mailbox (str): MailboxCheckpoint key of the mailbox
+        status (dict): STATUS response the coordinator searched with, or None
+        lease_token (str): Token of the EMAIL_LEASE held by the run, if any
+        
+    Returns:
+        dict: Summed "emails", "fetched" and "processed" counts
+    """
+    totals = {"emails": 0, "fetched": 0, "processed": 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result[key]
+
+    if status is not None:
+        checkpoint = MailboxCheckpoint.objects.filter(mailbox=mailbox).first()
+        if checkpoint is None:
+            checkpoint = MailboxCheckpoint(mailbox=mailbox, uidvalidity=status["UIDVALIDITY"])
+        elif checkpoint.uidvalidity != status["UIDVALIDITY"]:
+            checkpoint.uidvalidity = status["UIDVALIDITY"]
+            checkpoint.last_uid = 0
+            checkpoint.highest_modseq = None
+        # A failed email keeps the checkpoint where it is, see sync_checkpoint()
+        ProcessEmailsCommand().sync_checkpoint(
+            checkpoint, status, totals["processed"] == totals["fetched"] == totals["emails"]
+        )
+
+    if lease_token:
+        mailbox_lease(mailbox, lease_token).release()
+    logger.info(
+        f"Processed {totals['processed']} of {totals['emails']} new email(s) "
+        f"in {len(results)} chunk(s)"
+    )
+    return totals
+
+@worker_process_shutdown.connect
+def close_email_connections(**kwargs):
+    """Log out pooled IMAP connections when a worker process exits."""
+    connection_pool.close_all()
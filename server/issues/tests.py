@@ -17,8 +17,86 @@ from django.core.management import call_command
 import sys
 from io import StringIO
 from unittest.mock import patch, MagicMock
+import email
 import imaplib
+import threading
 from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+
+def build_fetch_response(messages):
+    """
+    Build a UID FETCH response in the shape imaplib returns it.
+
+    Args:
+        messages (list): List of (uid, raw_email) tuples, uid as bytes
+
+    Returns:
+        list: One (header, literal) tuple plus closing b')' per message
+    """
+    data = []
+    for seq, (uid, raw_email) in enumerate(messages, start=1):
+        data.append((b'%d (UID %s BODY[] {%d}' % (seq, uid, len(raw_email)), raw_email))
+        data.append(b')')
+    return data
+
+
+def mock_uid_commands(search_result, messages=None, fetch_status='OK'):
+    """
+    Create a side effect for IMAP4.uid() that serves SEARCH, FETCH and STORE.
+
+    FETCH understands whole-message fetches as well as the BODYSTRUCTURE,
+    HEADER.FIELDS and section fetches used for partial downloads.
+
+    Args:
+        search_result (tuple): Value returned for UID SEARCH
+        messages (dict): Raw email bytes keyed by UID (bytes)
+        fetch_status (str): Status returned for UID FETCH
+
+    Returns:
+        function: Side effect suitable for MagicMock.uid
+    """
+    from issues.fake_imap import body_section, body_structure, header_fields
+    messages = messages or {}
+
+    def uid(command, *args):
+        if command == 'SEARCH':
+            return search_result
+        if command == 'FETCH':
+            if fetch_status != 'OK':
+                return (fetch_status, [b'Failed to fetch'])
+            requested = []
+            for part in str(args[0]).split(','):
+                start, _, end = part.partition(':')
+                requested.extend(str(u).encode() for u in range(int(start), int(end or start) + 1))
+            found = [(u, messages[u]) for u in requested if u in messages]
+            items = args[1]
+            if 'BODYSTRUCTURE' in items:
+                fields = re.search(r'HEADER\.FIELDS \(([^)]*)\)', items).group(1)
+                data = []
+                for seq, (u, raw) in enumerate(found, start=1):
+                    structure = body_structure(email.message_from_bytes(raw)).encode()
+                    header = header_fields(raw, fields.split())
+                    data.append((
+                        b'%d (UID %s BODYSTRUCTURE %s BODY[HEADER.FIELDS (%s)] {%d}'
+                        % (seq, u, structure, fields.encode(), len(header)),
+                        header,
+                    ))
+                    data.append(b')')
+                return ('OK', data)
+            section = re.search(r'BODY\.PEEK\[([^\]]*)\]', items).group(1)
+            if section:
+                data = []
+                for seq, (u, raw) in enumerate(found, start=1):
+                    body = body_section(raw, section)
+                    data.append((b'%d (UID %s BODY[%s] {%d}' % (seq, u, section.encode(), len(body)), body))
+                    data.append(b')')
+                return ('OK', data)
+            return ('OK', build_fetch_response(found))
+        return ('OK', [None])
+
+    return uid
+
 
 class BugEmailProcessingTest(TestCase):
     """
@@ -894,6 +972,278 @@ class BugModificationViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class BugListViewTests(TestCase):
+    """Tests for filtering and ordering the bug list"""
+
+    def setUp(self):
+        """Create bugs with distinct statuses, priorities and dates"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='lister', password='pw'))
+        self.today = now()
+        for number, (bug_status, priority, days_ago, modified) in enumerate([
+            ("open", "High", 3, 0),
+            ("open", "low", 2, 4),
+            ("resolved", "Medium", 1, 1),
+            ("closed", "high", 0, 2),
+        ], start=1):
+            bug = Bug.objects.create(bug_id=f"LIST-{number}", subject=f"Bug {number}", description="",
+                                     status=bug_status, priority=priority, modified_count=modified)
+            # auto_now fields ignore values passed to create()
+            Bug.objects.filter(id=bug.id).update(
+                created_at=self.today - timedelta(days=days_ago), updated_at=self.today - timedelta(days=days_ago)
+            )
+
+    def bug_ids(self, **params):
+        """Return the bug IDs the list returns for the given query parameters"""
+        response = self.client.get(reverse('bug-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [bug['bug_id'] for bug in response.data['results']]
+
+    def test_filters(self):
+        """Status, priority, date range and modified_count filters should combine"""
+        from django.utils.timezone import localtime
+        self.assertEqual(self.bug_ids(status="open"), ["LIST-1", "LIST-2"])
+        self.assertEqual(self.bug_ids(priority="high"), ["LIST-1", "LIST-4"])
+        self.assertEqual(self.bug_ids(status="open,closed", priority="High"), ["LIST-1", "LIST-4"])
+        self.assertEqual(self.bug_ids(min_modified=2), ["LIST-2", "LIST-4"])
+        day = localtime(self.today - timedelta(days=2)).date().isoformat()
+        self.assertEqual(self.bug_ids(updated_before=day), ["LIST-1", "LIST-2"])
+        self.assertEqual(self.bug_ids(created_after=day), ["LIST-2", "LIST-3", "LIST-4"])
+
+    def test_ordering(self):
+        """Whitelisted fields should order the whole table, not just one page"""
+        self.assertEqual(self.bug_ids(ordering="-updated_at"), ["LIST-4", "LIST-3", "LIST-2", "LIST-1"])
+        self.assertEqual(self.bug_ids(ordering="-modified_count", page_size=2), ["LIST-2", "LIST-4"])
+
+    def test_invalid_parameters_are_rejected(self):
+        """Unknown ordering fields and malformed values should return 400"""
+        for params in ({"ordering": "description"}, {"updated_after": "yesterday"}, {"min_modified": "x"}):
+            response = self.client.get(reverse('bug-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.data)
+
+
+class CursorPaginationTests(TestCase):
+    """Tests for keyset pagination of the bug list"""
+
+    def setUp(self):
+        """Create bugs that share update times, so the id tie-breaker matters"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='pager', password='pw'))
+        base = now()
+        for number in range(1, 24):
+            bug = Bug.objects.create(bug_id=f"PAGE-{number}", subject="Paged", description="")
+            Bug.objects.filter(id=bug.id).update(updated_at=base - timedelta(minutes=number // 3))
+        self.expected = list(Bug.objects.order_by('-updated_at', '-id').values_list('bug_id', flat=True))
+
+    def get(self, url, params=None):
+        """GET a page and return its data"""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_walks_forward_and_back_without_count_or_offset(self):
+        """Cursors should visit every bug once in order, both ways, without COUNT or OFFSET"""
+        from django.db import connection
+
+        pages, statements = [], []
+        # CaptureQueriesContext loses queries when a request resets the query log
+        with connection.execute_wrapper(lambda execute, sql, *args: statements.append(sql) or execute(sql, *args)):
+            data = self.get(reverse('bug-list'), {'pagination': 'cursor', 'ordering': '-updated_at', 'page_size': 10})
+            pages.append(data)
+            while data['next']:
+                data = self.get(data['next'])
+                pages.append(data)
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertEqual([bug['bug_id'] for page in pages for bug in page['results']], self.expected)
+        sql = " ".join(statements)
+        self.assertIn('LIMIT', sql)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+        backwards = [pages[-1]['results']]
+        data = pages[-1]
+        while data['previous']:
+            data = self.get(data['previous'])
+            backwards.insert(0, data['results'])
+        self.assertEqual(backwards, [page['results'] for page in pages])
+
+    def test_count_on_request_and_bad_cursors(self):
+        """count=true should add the total; foreign or garbled cursors should return 400"""
+        data = self.get(reverse('bug-list'), {'pagination': 'cursor', 'count': 'true', 'status': 'open'})
+        self.assertEqual(data['count'], 23)
+        self.assertEqual(len(data['results']), 10)
+
+        response = self.client.get(data['next'].replace('status=open', 'ordering=bug_id'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('bug-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsetTests(TestCase):
+    """Tests for ?fields= / ?omit= and the compact bug list"""
+
+    def setUp(self):
+        """Create bugs with long descriptions, like emailed reports"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='sparse', password='pw'))
+        for number in range(1, 6):
+            Bug.objects.create(bug_id=f"SPARSE-{number}", subject="Long", description="trace line\n" * 2000)
+
+    def test_list_is_compact_and_does_not_read_descriptions(self):
+        """The default list should carry a preview and only read the start of each description"""
+        from django.db import connection
+        from issues.serializers import DESCRIPTION_PREVIEW_LENGTH
+
+        statements = []
+        with connection.execute_wrapper(lambda execute, sql, *args: statements.append(sql) or execute(sql, *args)):
+            compact = self.client.get(reverse('bug-list'))
+        full = self.client.get(reverse('bug-list'), {'fields': 'bug_id,subject,description'})
+
+        bug = compact.data['results'][0]
+        self.assertNotIn('description', bug)
+        self.assertEqual(bug['description_preview'], ("trace line\n" * 2000)[:DESCRIPTION_PREVIEW_LENGTH])
+        self.assertEqual(set(full.data['results'][0]), {'bug_id', 'subject', 'description'})
+        self.assertLess(len(compact.content) * 10, len(full.content))
+        select = [sql for sql in statements if 'LIMIT' in sql][0]
+        self.assertIn('SUBSTR', select.upper())
+        self.assertNotRegex(select, r'(?<!SUBSTR\()"issues_bug"\."description"')
+
+    def test_fields_and_omit_on_detail(self):
+        """The detail endpoint should honour fields and omit and reject unknown names"""
+        url = reverse('bug-detail', args=['SPARSE-1'])
+        self.assertEqual(set(self.client.get(url, {'fields': 'bug_id,status'}).data), {'bug_id', 'status'})
+        data = self.client.get(url, {'omit': 'description'}).data
+        self.assertNotIn('description', data)
+        self.assertEqual(data['bug_id'], 'SPARSE-1')
+        self.assertIn('description', self.client.get(url).data)
+
+        response = self.client.get(url, {'fields': 'bug_id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('bug-list'), {'fields': 'description_preview'})
+        self.assertEqual(list(response.data['results'][0]), ['description_preview'])
+
+
+class FastSerializationTests(TestCase):
+    """Tests for serving bug reads from values_list() rows"""
+
+    def setUp(self):
+        """Create bugs covering choices, free-form priorities, unicode and microseconds"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='fast', password='pw'))
+        for number, (bug_status, priority) in enumerate(
+            [("open", "High"), ("in_progress", "medium"), ("resolved", "Low"), ("closed", "high")], start=1
+        ):
+            Bug.objects.create(bug_id=f"FAST-{number}", subject=f"Zürich crash \u2013 {number}",
+                               description="Stack trace: ✓ " * (number * 40), status=bug_status,
+                               priority=priority, modified_count=number)
+
+    def test_json_is_identical_to_serializer_output(self):
+        """The fast path should produce byte-identical responses to BugSerializer"""
+        from issues.views import BugDetailView, BugListView
+
+        requests = [
+            (reverse('bug-list'), {}),
+            (reverse('bug-list'), {'fields': 'bug_id,description,created_at', 'ordering': '-updated_at'}),
+            (reverse('bug-list'), {'pagination': 'cursor', 'ordering': 'priority', 'page_size': 2}),
+            (reverse('bug-list'), {'omit': 'description_preview,id', 'status': 'open,closed'}),
+            (reverse('bug-detail', args=['FAST-2']), {}),
+            (reverse('bug-detail', args=['FAST-3']), {'omit': 'description'}),
+            (reverse('bug-detail', args=['FAST-404']), {}),
+        ]
+        for url, params in requests:
+            fast = self.client.get(url, params)
+            with patch.object(BugListView, 'fast_serialization', False), \
+                    patch.object(BugDetailView, 'fast_serialization', False):
+                slow = self.client.get(url, params)
+            self.assertEqual(fast.status_code, slow.status_code)
+            self.assertEqual(fast.content, slow.content, f"{url} {params}")
+
+    def test_rows_skip_model_instances(self):
+        """The fast path should never build Bug instances"""
+        with patch.object(Bug, '__init__', side_effect=AssertionError("Bug instantiated")):
+            self.assertEqual(self.client.get(reverse('bug-list')).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(reverse('bug-detail', args=['FAST-1'])).status_code,
+                             status.HTTP_200_OK)
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for ETag / Last-Modified validation of the bug endpoints"""
+
+    def setUp(self):
+        """Create a few bugs"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='cacher', password='pw'))
+        for number in range(1, 4):
+            Bug.objects.create(bug_id=f"ETAG-{number}", subject="Cached", description="Body", status="open")
+
+    def get(self, url, params=None, **headers):
+        """GET a URL, recording the SQL it runs in self.statements"""
+        from django.db import connection
+
+        self.statements = []
+        with connection.execute_wrapper(lambda execute, sql, *args: self.statements.append(sql) or execute(sql, *args)):
+            return self.client.get(url, params, **headers)
+
+    def test_detail_revalidation(self):
+        """An unchanged bug should answer 304 after one query; a change should produce a new ETag"""
+        url = reverse('bug-detail', args=['ETAG-1'])
+        first = self.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        cached = self.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.get(url, {'fields': 'bug_id'})['ETag'], first['ETag'])
+
+        Bug.objects.filter(bug_id='ETAG-1').update(modified_count=1)
+        changed = self.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(self.get(reverse('bug-detail', args=['ETAG-404'])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_revalidation(self):
+        """The list ETag should follow the filtered rows, including deletions"""
+        url = reverse('bug-list')
+        first = self.get(url, {'status': 'open'})
+        etag = first['ETag']
+        cached = self.get(url, {'status': 'open'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(self.statements), 1)
+        self.assertNotEqual(self.get(url, {'status': 'open', 'page_size': 2})['ETag'], etag)
+
+        Bug.objects.filter(bug_id='ETAG-3').delete()
+        self.assertEqual(self.get(url, {'status': 'open'}, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+        self.assertNotIn('ETag', self.get(url, {'pagination': 'cursor'}))
+        self.assertEqual(self.get(url, {'ordering': 'secret'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_etag_follows_modifications_without_updated_at(self):
+        """Modifications written with update() leave updated_at alone but change the list ETag"""
+        url = reverse('bug-list')
+        etag = self.get(url)['ETag']
+        Bug.objects.filter(bug_id='ETAG-2').update(modified_count=1, description="Changed")
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_errors_carry_no_validators(self):
+        """A 400 for invalid parameters should not come with an ETag or Last-Modified"""
+        invalid = [
+            (reverse('bug-list'), {'fields': 'secret'}),
+            (reverse('bug-list'), {'pagination': 'cursor', 'count': 'true', 'cursor': 'garbage'}),
+            (reverse('bug-detail', args=['ETAG-1']), {'fields': 'secret'}),
+        ]
+        for url, params in invalid:
+            response = self.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertNotIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+
 class URLTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -958,7 +1308,7 @@ class ProcessEmailsCommandTest(TestCase):
         mock_imap.return_value = mock_connection
         
         # Mock empty search result (no emails)
-        mock_connection.search.return_value = ('OK', [b''])
+        mock_connection.uid.side_effect = mock_uid_commands(('OK', [b'']))
         
         # Capture command output
         out = StringIO()
@@ -979,7 +1329,7 @@ class ProcessEmailsCommandTest(TestCase):
         mock_imap.assert_called_once()
         mock_connection.login.assert_called_once()
         mock_connection.select.assert_called_once()
-        mock_connection.search.assert_called_once()
+        mock_connection.uid.assert_called_once_with('SEARCH', None, 'UNSEEN')
     
     @patch('imaplib.IMAP4_SSL')
     
@@ -990,7 +1340,7 @@ class ProcessEmailsCommandTest(TestCase):
         mock_imap.return_value = mock_connection
         
         # Mock emails found
-        mock_connection.search.return_value = ('OK', [b'1 2'])
+        search_result = ('OK', [b'1 2'])
         
         # Setup mock email data
         # First email - new bug
@@ -1012,10 +1362,9 @@ class ProcessEmailsCommandTest(TestCase):
         '''
         
         # Mock fetching email data
-        mock_connection.fetch.side_effect = [
-            ('OK', [(b'1', email1_data)]),
-            ('OK', [(b'2', email2_data)])
-        ]
+        mock_connection.uid.side_effect = mock_uid_commands(
+            search_result, {b'1': email1_data, b'2': email2_data}
+        )
         
         # Capture command output
         out = StringIO()
@@ -1086,7 +1435,7 @@ class ProcessEmailsCommandTest(TestCase):
         mock_imap.return_value = mock_connection
         
         # Mock one email found
-        mock_connection.search.return_value = ('OK', [b'1'])
+        search_result = ('OK', [b'1'])
         
         # Setup mock email data with missing bug ID
         invalid_email_data = b'''
@@ -1098,7 +1447,7 @@ class ProcessEmailsCommandTest(TestCase):
         '''
         
         # Mock fetching email data
-        mock_connection.fetch.return_value = ('OK', [(b'1', invalid_email_data)])
+        mock_connection.uid.side_effect = mock_uid_commands(search_result, {b'1': invalid_email_data})
         
         # Capture command output
         out = StringIO()
@@ -1131,7 +1480,7 @@ class ProcessEmailsCommandTest(TestCase):
         mock_imap.return_value = mock_connection
         
         # Mock server error during search
-        mock_connection.search.return_value = ('NO', ['Server error'])
+        mock_connection.uid.side_effect = mock_uid_commands(('NO', ['Server error']))
         
         # Capture command output
         out = StringIO()
@@ -1148,6 +1497,1059 @@ class ProcessEmailsCommandTest(TestCase):
         self.assertIn("No unread emails to process", output)
 
 
+class BatchedFetchTests(TestCase):
+    """Tests for fetching unread emails in batched UID FETCH round trips"""
+
+    @patch('imaplib.IMAP4_SSL')
+    def test_fetch_uses_one_round_trip_per_batch(self, mock_imap):
+        """Five unread emails with --batch-size 2 should be fetched in three batches"""
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+
+        messages = {
+            str(i).encode(): f"Subject: Bug ID: BATCH-{i} - Report\n\nBody {i}".encode()
+            for i in range(1, 6)
+        }
+        mock_connection.uid.side_effect = mock_uid_commands(('OK', [b'1 2 3 4 5']), messages)
+
+        out = StringIO()
+        call_command('process_emails', batch_size=2, stdout=out)
+
+        fetch_calls = [c for c in mock_connection.uid.call_args_list if c[0][0] == 'FETCH']
+        structure_calls = [c for c in fetch_calls if 'BODYSTRUCTURE' in c[0][2]]
+        self.assertEqual([c[0][1] for c in structure_calls], ['1:2', '3:4', '5'])
+        # One more round trip per batch for the text parts, all in section TEXT
+        self.assertEqual(len(fetch_calls), 6)
+        self.assertEqual(Bug.objects.filter(bug_id__startswith="BATCH-").count(), 5)
+
+    @patch('imaplib.IMAP4_SSL')
+    def test_seen_flags_stored_once_per_batch_after_commit(self, mock_imap):
+        """Stored emails should be flagged with one UID STORE per batch once it commits"""
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+
+        messages = {
+            str(i).encode(): f"Subject: Bug ID: FLAG-{i} - Report\n\nBody {i}".encode()
+            for i in (1, 2, 3, 7)
+        }
+        mock_connection.uid.side_effect = mock_uid_commands(('OK', [b'1 2 3 7']), messages)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_emails', stdout=StringIO())
+
+        store_calls = [c for c in mock_connection.uid.call_args_list if c[0][0] == 'STORE']
+        self.assertEqual(len(store_calls), 1)
+        self.assertEqual(store_calls[0][0][1:], ('1:3,7', '+FLAGS', '\\Seen'))
+
+    def test_failed_email_is_not_flagged(self):
+        """An email whose database write fails must not be marked as read"""
+        from issues.management.commands.process_emails import Command
+        command = Command()
+        command.stdout = StringIO()
+        command.stderr = StringIO()
+        mock_mail = MagicMock()
+        mock_mail.uid.return_value = ('OK', [None])
+
+        batch = [
+            (b'1', b"Subject: Bug ID: GOOD-1 - Report\n\nBody"),
+            (b'2', b"Subject: Bug ID: BAD-2 - Report\n\nBody"),
+        ]
+        real_get_or_create = Bug.objects.get_or_create
+
+        def failing_get_or_create(bug_id, defaults):
+            if bug_id == "BAD-2":
+                raise Exception("Database error")
+            return real_get_or_create(bug_id=bug_id, defaults=defaults)
+
+        # Make the bulk write fail so every email is stored on its own
+        with patch('issues.management.commands.process_emails.Bug.objects.bulk_create',
+                   side_effect=Exception("Bulk insert failed")), \
+             patch('issues.management.commands.process_emails.Bug.objects.get_or_create',
+                   side_effect=failing_get_or_create):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                command.process_batch(mock_mail, batch)
+
+        self.assertEqual(len(callbacks), 1)
+        mock_mail.uid.assert_called_once_with('STORE', '1', '+FLAGS', '\\Seen')
+        self.assertTrue(Bug.objects.filter(bug_id="GOOD-1").exists())
+
+    def test_rolled_back_batch_is_not_flagged(self):
+        """No email of a batch is flagged when the batch transaction rolls back"""
+        from django.db import transaction
+        from issues.management.commands.process_emails import Command
+        command = Command()
+        command.stdout = StringIO()
+        command.stderr = StringIO()
+        mock_mail = MagicMock()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    command.process_batch(mock_mail, [(b'1', b"Subject: Bug ID: RB-1 - Report\n\nBody")])
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        mock_mail.uid.assert_not_called()
+        self.assertFalse(Bug.objects.filter(bug_id="RB-1").exists())
+
+    def test_batch_is_stored_with_bulk_queries(self):
+        """Storing a batch should take the same number of queries for 2 or 20 emails"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from issues.management.commands.process_emails import Command
+        command = Command(stdout=StringIO(), stderr=StringIO())
+
+        def query_count(prefix, size):
+            batch = [
+                (str(i).encode(), f"Subject: Bug ID: {prefix}-{i} - Report\n\nBody".encode())
+                for i in range(1, size + 1)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                command.process_batch(MagicMock(), batch)
+            return len(queries)
+
+        self.assertEqual(query_count("SMALL", 2), query_count("LARGE", 20))
+        self.assertEqual(Bug.objects.filter(bug_id__startswith="LARGE-").count(), 20)
+
+    def test_replayed_batch_is_skipped(self):
+        """Emails stored by an earlier run should only be flagged, not applied again"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from issues.management.commands.process_emails import Command
+        from issues.models import ProcessedMessage
+        command = Command(stdout=StringIO(), stderr=StringIO())
+
+        batch = [
+            (b'1', b"Message-ID: <one@example.com>\nSubject: Bug ID: REPLAY-1 - Report\n\nBody"),
+            (b'2', b"Message-ID: <two@example.com>\nSubject: Bug ID: REPLAY-1 - Again\n\nBody"),
+        ]
+        command.process_batch(MagicMock(), batch)
+        self.assertEqual(Bug.objects.get(bug_id="REPLAY-1").modified_count, 1)
+        self.assertEqual(ProcessedMessage.objects.filter(bug_id="REPLAY-1").count(), 2)
+
+        # The same messages come back under new UIDs, e.g. after a failed STORE
+        replay = [(b'8', batch[0][1]), (b'9', batch[1][1].replace(b"Body", b"Changed body"))]
+        mock_mail = MagicMock()
+        mock_mail.uid.return_value = ('OK', [None])
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                command.process_batch(mock_mail, replay)
+
+        lookups = [q for q in queries if 'issues_processedmessage' in q['sql'] and 'SELECT' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        bug = Bug.objects.get(bug_id="REPLAY-1")
+        self.assertEqual((bug.modified_count, bug.description), (1, "Body"))
+        mock_mail.uid.assert_called_once_with('STORE', '8:9', '+FLAGS', '\\Seen')
+
+    def test_emails_without_message_id_use_raw_hash(self):
+        """Without a Message-ID, identical raw emails count once and different ones are kept"""
+        from issues.management.commands.process_emails import Command
+        from issues.models import ProcessedMessage
+        command = Command(stdout=StringIO(), stderr=StringIO())
+
+        raw = b"Subject: Bug ID: RAW-1 - Report\n\nBody"
+        command.process_batch(MagicMock(), [(b'1', raw), (b'2', raw), (b'3', raw + b" more")])
+
+        self.assertEqual(Bug.objects.get(bug_id="RAW-1").modified_count, 1)
+        self.assertEqual(ProcessedMessage.objects.count(), 2)
+
+    def test_emails_for_same_bug_collapse_into_one_write(self):
+        """Several emails for one bug_id should add one modification per email"""
+        from issues.management.commands.process_emails import Command
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        Bug.objects.create(bug_id="SAME-1", subject="Old", description="Old", modified_count=2)
+
+        batch = [
+            (b'1', b"Subject: Bug ID: SAME-1 - First\n\nStatus: in progress"),
+            (b'2', b"Subject: Bug ID: SAME-1 - Second\n\nStatus: resolved"),
+            (b'3', b"Subject: Bug ID: NEW-1 - First\n\nFirst report"),
+            (b'4', b"Subject: Bug ID: SAME-1 - Third\n\nStatus: closed"),
+            (b'5', b"Subject: Bug ID: NEW-1 - Second\n\nFollow-up"),
+        ]
+        command.process_batch(MagicMock(), batch)
+
+        existing = Bug.objects.get(bug_id="SAME-1")
+        self.assertEqual(existing.modified_count, 5)
+        self.assertEqual(existing.status, "closed")
+        self.assertEqual(existing.subject, "Bug ID: SAME-1 - Third")
+        created = Bug.objects.get(bug_id="NEW-1")
+        self.assertEqual(created.modified_count, 1)
+        self.assertEqual(created.description, "Follow-up")
+
+    def test_interleaved_batches_for_same_bug_keep_every_modification(self):
+        """Batches of concurrent chunks for one bug_id neither lose increments nor fail the insert"""
+        from issues.management.commands.process_emails import Command
+        Bug.objects.create(bug_id="RACE-1", subject="Old", description="Old", modified_count=2)
+        first = Command(stdout=StringIO(), stderr=StringIO())
+        second = Command(stdout=StringIO(), stderr=StringIO())
+        interleaved = []
+
+        def store_second_batch_first(method):
+            original = getattr(Bug.objects, method)
+
+            # The other chunk stores its batch after this one has read the bugs
+            def write(*args, **kwargs):
+                if not interleaved:
+                    interleaved.append(True)
+                    second.process_batch(MagicMock(), [
+                        (b'7', f"Subject: Bug ID: RACE-1 - Other {method}\n\nBody".encode()),
+                        (b'8', f"Subject: Bug ID: RACE-2 - Other {method}\n\nBody".encode()),
+                    ])
+                return original(*args, **kwargs)
+            return write
+
+        for method in ('bulk_create', 'bulk_update'):
+            interleaved.clear()
+            with patch.object(Bug.objects, method, side_effect=store_second_batch_first(method)), \
+                    patch.object(Command, 'save_bug', wraps=first.save_bug) as one_by_one:
+                first.process_batch(MagicMock(), [
+                    (f'{method}-1'.encode(), f"Subject: Bug ID: RACE-1 - {method}\n\nBody".encode()),
+                    (f'{method}-2'.encode(), f"Subject: Bug ID: RACE-2 - {method}\n\nBody".encode()),
+                ])
+            one_by_one.assert_not_called()
+
+        # Per pass: one email of each chunk; RACE-2 was created by the first email
+        self.assertEqual(Bug.objects.get(bug_id="RACE-1").modified_count, 6)
+        self.assertEqual(Bug.objects.get(bug_id="RACE-2").modified_count, 3)
+
+    def test_compress_uid_set(self):
+        """Consecutive UIDs should collapse into ranges"""
+        from issues.imap import compress_uid_set
+
+        self.assertEqual(compress_uid_set([b'9', b'1', b'2', b'3', b'5', b'8']), '1:3,5,8:9')
+        self.assertEqual(compress_uid_set([]), '')
+
+    def test_parse_fetch_response(self):
+        """parse_fetch_response should pair each literal with the UID from its header"""
+        from issues.imap import parse_fetch_response
+
+        data = [
+            (b'1 (UID 17 RFC822 {5}', b'first'),
+            b')',
+            (b'2 (FLAGS (\\Seen) UID 42 RFC822 {6}', b'second'),
+            b')',
+            b'malformed entry',
+        ]
+        self.assertEqual(parse_fetch_response(data), [(b'17', b'first'), (b'42', b'second')])
+        self.assertEqual(parse_fetch_response(None), [])
+
+
+class MailSourceTests(TestCase):
+    """Tests for reading bug reports from Maildir and mbox dumps with --source"""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def message(self, bug_id, body="Body", message_id=None):
+        message_id = message_id or bug_id
+        return f"Message-ID: <{message_id}@example.com>\nSubject: Bug ID: {bug_id} - Report\n\n{body}\n".encode()
+
+    def write_maildir(self):
+        import os
+        path = os.path.join(self.tmp.name, "bugs")
+        for subdir in ("new", "cur", "tmp"):
+            os.makedirs(os.path.join(path, subdir))
+        files = {
+            "new/1001.a.host": self.message("DIR-1"),
+            "new/1002.b.host": self.message("DIR-2"),
+            "cur/1000.c.host:2,F": self.message("DIR-3"),
+            "cur/0999.d.host:2,S": self.message("DIR-OLD"),
+        }
+        for name, raw in files.items():
+            with open(os.path.join(path, name), "wb") as message_file:
+                message_file.write(raw)
+        return path
+
+    def test_maildir_imports_unread_messages_and_marks_them_seen(self):
+        """Unread Maildir messages become bugs and are moved to cur/ with the S flag"""
+        import os
+        path = self.write_maildir()
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_emails', source=f"maildir:{path}", batch_size=2, stdout=out)
+
+        self.assertEqual(
+            set(Bug.objects.values_list("bug_id", flat=True)), {"DIR-1", "DIR-2", "DIR-3"}
+        )
+        self.assertEqual(os.listdir(os.path.join(path, "new")), [])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(path, "cur"))),
+            ["0999.d.host:2,S", "1000.c.host:2,FS", "1001.a.host:2,S", "1002.b.host:2,S"],
+        )
+        self.assertIn("Successfully processed emails.", out.getvalue())
+
+        out = StringIO()
+        call_command('process_emails', source=f"maildir:{path}", stdout=out)
+        self.assertIn("No unread emails to process.", out.getvalue())
+
+    def test_mbox_import_is_idempotent(self):
+        """An mbox dump imports every message once, even when imported again"""
+        import mailbox
+        import os
+        path = os.path.join(self.tmp.name, "bugs.mbox")
+        mbox = mailbox.mbox(path)
+        mbox.add(email.message_from_bytes(self.message("BOX-1")))
+        mbox.add(email.message_from_bytes(self.message("BOX-2", body="About BOX-2")))
+        mbox.add(email.message_from_bytes(self.message("BOX-1", body="Update", message_id="reply")))
+        mbox.close()
+
+        call_command('process_emails', source=f"mbox:{path}", stdout=StringIO())
+        call_command('process_emails', source=f"mbox:{path}", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(Bug.objects.count(), 2)
+        bug = Bug.objects.get(bug_id="BOX-1")
+        self.assertEqual((bug.modified_count, bug.description.strip()), (1, "Update"))
+        self.assertEqual(Bug.objects.get(bug_id="BOX-2").description.strip(), "About BOX-2")
+
+    def test_invalid_source_is_rejected(self):
+        """Unknown schemes and missing paths should fail before any work is done"""
+        from django.core.management.base import CommandError
+        for spec in ("pop3://example.com", "maildir:" + self.tmp.name, "mbox:/nonexistent/bugs.mbox"):
+            with self.subTest(spec=spec), self.assertRaises(CommandError):
+                call_command('process_emails', source=spec, stdout=StringIO())
+
+    def test_imap_url_overrides_default_mailbox(self):
+        """Parts of an imap:// URL replace the built-in connection settings"""
+        from issues.mail_sources import IMAPSource, source_from_spec
+        default = IMAPSource("imap.gmail.com", "bugs@gmail.com", "secret")
+        source = source_from_spec("imap://triage%40example.com:pw@imap.example.com/Bugs", default)
+        self.assertEqual(source.checkpoint_key, "triage@example.com@imap.example.com/Bugs")
+        self.assertEqual(source.password, "pw")
+        self.assertIs(source_from_spec("imap", default), default)
+
+
+class ClassifierTests(TestCase):
+    """Tests for the single-pass status and priority classifier"""
+
+    def test_precedence(self):
+        """Earlier rules should win regardless of where they appear in the text"""
+        from issues.classifier import classify
+
+        cases = [
+            ("Crash", "closing soon. Status: in progress", ("in_progress", "Medium")),
+            ("[resolved] crash", "the bug is closed", ("resolved", "Medium")),
+            ("Crash", "reopened: the issue has been resolved", ("resolved", "Medium")),
+            ("Minor glitch", "this is urgent, priority: low", ("open", "Low")),
+            ("Minor glitch", "might be urgent", ("open", "High")),
+            ("Nothing here", "", ("open", "Medium")),
+        ]
+        for subject, description, expected in cases:
+            self.assertEqual(classify(subject, description), expected, (subject, description))
+
+    def test_overlapping_matches(self):
+        """Keywords and status words overlapping a weaker match should still be found"""
+        from issues.classifier import classify
+
+        self.assertEqual(classify("moderatemergency", ""), ("open", "High"))
+        self.assertEqual(classify("status:closed", "prioritY: medium"), ("closed", "Medium"))
+        self.assertEqual(classify("bug is in-progress", "reopen"), ("in_progress", "Medium"))
+
+    def test_matches_previous_implementation(self):
+        """The compiled classifier should agree with the previous methods on random text"""
+        import random
+        from issues.classifier import classify
+        from issues.management.commands.benchmark_classifier import legacy_classify
+
+        tokens = [
+            "status", "state", ":", " ", "[", "]", "open", "opened", "closed", "closing",
+            "resolving", "in progress", "in-progress", "bug", "issue", "ticket", "is",
+            "has been", "was", "priority", "high", "medium", "low", "urgent", "p1", "p3",
+            "priority 2", "can wait", "moderate", "emergency", "below", "de", "\n",
+        ]
+        generator = random.Random(7)
+        for _ in range(2000):
+            subject = "".join(generator.choice(tokens) for _ in range(generator.randint(0, 8)))
+            description = "".join(generator.choice(tokens) for _ in range(generator.randint(0, 12)))
+            self.assertEqual(
+                classify(subject, description),
+                legacy_classify(subject, description),
+                (subject, description),
+            )
+
+    def test_benchmark_command(self):
+        """benchmark_classifier should report timings for both implementations"""
+        out = StringIO()
+        call_command('benchmark_classifier', size=1000, repeat=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("legacy:", output)
+        self.assertIn("compiled:", output)
+        self.assertIn("speedup", output)
+
+
+class ParallelParsingTests(TestCase):
+    """Tests for parsing and classifying emails in a process pool"""
+
+    def test_pool_results_match_serial_parsing(self):
+        """Pooled parsing should return the serial results in batch order and skip bad emails"""
+        from issues.management.commands.process_emails import Command
+
+        batch = [
+            (str(i).encode(), f"Subject: Bug ID: POOL-{i} - Report\n\nStatus: closed, urgent".encode())
+            for i in range(1, 8)
+        ]
+        batch.insert(3, (b'99', b"Subject: Broken\nContent-Type: text/plain; charset=bogus\n\nBody"))
+
+        serial = Command(stdout=StringIO(), stderr=StringIO())
+        pooled = Command(stdout=StringIO(), stderr=StringIO())
+        pooled.start_parse_pool(2)
+        try:
+            results = pooled.parse_messages(batch)
+        finally:
+            pooled.stop_parse_pool()
+
+        self.assertEqual(results, serial.parse_messages(batch))
+        self.assertEqual([email_id for email_id, _ in results], [str(i).encode() for i in range(1, 8)])
+        self.assertEqual(results[0][1]["status"], "closed")
+        self.assertEqual(results[0][1]["priority"], "High")
+        self.assertIn("Error processing email b'99'", pooled.stderr.getvalue())
+        self.assertIsNone(pooled.parse_pool)
+
+    @patch('imaplib.IMAP4_SSL')
+    def test_process_emails_with_parse_workers(self, mock_imap):
+        """--parse-workers should store every email from the parent process"""
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+
+        messages = {
+            str(i).encode(): f"Subject: Bug ID: WORKER-{i} - Report\n\n[resolved]".encode()
+            for i in range(1, 6)
+        }
+        mock_connection.uid.side_effect = mock_uid_commands(('OK', [b'1 2 3 4 5']), messages)
+
+        call_command('process_emails', parse_workers=2, stdout=StringIO())
+
+        bugs = Bug.objects.filter(bug_id__startswith="WORKER-")
+        self.assertEqual(bugs.count(), 5)
+        self.assertEqual(set(bugs.values_list("status", flat=True)), {"resolved"})
+
+    def test_pool_workers_leave_auto_ids_to_parent(self):
+        """Emails without a bug ID should get distinct AUTO IDs allocated by the parent"""
+        from issues.management.commands.process_emails import Command, parse_in_worker
+
+        raw_email = b"Subject: Login page broken\n\nSame report twice"
+        self.assertIsNone(parse_in_worker(raw_email)[0]["bug_id"])
+
+        pooled = Command(stdout=StringIO(), stderr=StringIO())
+        pooled.start_parse_pool(2)
+        try:
+            results = pooled.parse_messages([(b'1', raw_email), (b'2', raw_email)])
+        finally:
+            pooled.stop_parse_pool()
+
+        bug_ids = [bug_data["bug_id"] for _, bug_data in results]
+        self.assertEqual(len(set(bug_ids)), 2)
+        self.assertTrue(all(re.fullmatch(r"AUTO-\d+", bug_id) for bug_id in bug_ids))
+
+
+class IdSequenceTests(TestCase):
+    """Tests for block-allocated ID sequences"""
+
+    def test_values_come_from_blocks_reserved_once(self):
+        """Each block should cost one UPDATE and values should be contiguous"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from issues.models import IdSequence
+        from issues.sequences import SequenceAllocator
+
+        allocator = SequenceAllocator("test", block_size=5)
+        with CaptureQueriesContext(connection) as queries:
+            values = [allocator.next_value() for _ in range(12)]
+
+        self.assertEqual(values, list(range(1, 13)))
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(IdSequence.objects.get(name="test").next_value, 16)
+
+    def test_allocators_hand_out_disjoint_values(self):
+        """Allocators in different workers should never hand out the same value"""
+        from issues.sequences import SequenceAllocator
+
+        workers = [SequenceAllocator("shared", block_size=3) for _ in range(3)]
+        values = [worker.next_value() for _ in range(7) for worker in workers]
+
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_same_subject_without_bug_id_creates_separate_bugs(self):
+        """Two reports with the same subject in the same second should not be merged"""
+        from issues.management.commands.process_emails import Command
+
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        raw_email = b"Subject: Crash on save\n\nIt crashes"
+        parsed = command.parse_messages([(b'1', raw_email), (b'2', raw_email)])
+        command.save_bugs(parsed)
+
+        self.assertEqual(Bug.objects.filter(bug_id__startswith="AUTO-").count(), 2)
+
+    def test_auto_id_sequence_starts_after_existing_auto_ids(self):
+        """A new sequence should not hand out AUTO-n IDs that bugs already have"""
+        from issues.management.commands.process_emails import Command
+        from issues.sequences import AUTO_ID_SEQUENCE, SequenceAllocator
+        for bug_id in ("AUTO-7", "AUTO-12", "AUTO-1700000000-Crash on s", "AUTOMATION-99"):
+            Bug.objects.create(bug_id=bug_id, subject="Existing", description="Body")
+
+        with patch('issues.management.commands.process_emails.auto_ids', SequenceAllocator(AUTO_ID_SEQUENCE)):
+            command = Command(stdout=StringIO(), stderr=StringIO())
+            parsed = command.parse_messages([(b'1', b"Subject: Crash on save\n\nIt crashes")])
+            command.save_bugs(parsed)
+
+        self.assertTrue(Bug.objects.filter(bug_id="AUTO-13", subject="Crash on save").exists())
+
+
+class IMAPConnectionPoolTests(TestCase):
+    """Tests for reusing authenticated IMAP connections across ingestion runs"""
+
+    def setUp(self):
+        from issues.imap import IMAPConnectionPool
+        self.pool = IMAPConnectionPool(max_age=60)
+        self.connections = []
+
+    def connect(self):
+        mail = MagicMock()
+        mail.noop.return_value = ('OK', [b'NOOP completed'])
+        self.connections.append(mail)
+        return mail
+
+    def test_healthy_connection_is_reused(self):
+        """A released connection should be handed out again after a NOOP check"""
+        first = self.pool.acquire("INBOX", self.connect)
+        self.pool.release(first)
+        second = self.pool.acquire("INBOX", self.connect)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.connections), 1)
+        first.noop.assert_called_once()
+        first.logout.assert_not_called()
+
+    def test_connections_are_kept_per_mailbox(self):
+        """A connection is only reused for the mailbox it was opened for"""
+        inbox = self.pool.acquire("INBOX", self.connect)
+        self.pool.release(inbox)
+
+        other = self.pool.acquire("other@imap.example.com/Bugs", self.connect)
+        self.pool.release(other)
+
+        self.assertIsNot(inbox, other)
+        self.assertIs(self.pool.acquire("INBOX", self.connect), inbox)
+        self.assertIs(self.pool.acquire("other@imap.example.com/Bugs", self.connect), other)
+        self.assertEqual(len(self.connections), 2)
+
+    def test_failed_health_check_reconnects(self):
+        """A connection that fails NOOP should be replaced by a new one"""
+        first = self.pool.acquire("INBOX", self.connect)
+        self.pool.release(first)
+        first.noop.side_effect = imaplib.IMAP4.abort("socket error: EOF")
+
+        second = self.pool.acquire("INBOX", self.connect)
+
+        self.assertIsNot(first, second)
+        first.logout.assert_called_once()
+
+    def test_old_connection_is_recycled(self):
+        """Connections older than max_age should be logged out, not reused"""
+        first = self.pool.acquire("INBOX", self.connect)
+        self.pool.release(first)
+
+        with patch('issues.imap.time.monotonic', return_value=time.monotonic() + 120):
+            second = self.pool.acquire("INBOX", self.connect)
+
+        self.assertIsNot(first, second)
+        first.logout.assert_called_once()
+        first.noop.assert_not_called()
+
+    def test_forked_process_does_not_reuse_parent_connections(self):
+        """A pool inherited through fork should start empty in the child"""
+        first = self.pool.acquire("INBOX", self.connect)
+        self.pool.release(first)
+
+        with patch('issues.imap.os.getpid', return_value=-1):
+            second = self.pool.acquire("INBOX", self.connect)
+
+        self.assertIsNot(first, second)
+
+    @patch('imaplib.IMAP4_SSL')
+    def test_pooled_command_runs_share_one_login(self, mock_imap):
+        """Two pooled process_emails runs should connect and log in only once"""
+        from issues.imap import connection_pool
+        self.addCleanup(connection_pool.close_all)
+        mock_connection = MagicMock()
+        mock_connection.noop.return_value = ('OK', [b'NOOP completed'])
+        mock_connection.uid.side_effect = mock_uid_commands(('OK', [b'']))
+        mock_imap.return_value = mock_connection
+
+        call_command('process_emails', pooled=True, stdout=StringIO())
+        call_command('process_emails', pooled=True, stdout=StringIO())
+
+        mock_imap.assert_called_once()
+        mock_connection.login.assert_called_once()
+        mock_connection.logout.assert_not_called()
+        self.assertEqual(
+            [c for c in mock_connection.uid.call_args_list if c[0][0] == 'SEARCH'],
+            [(('SEARCH', None, 'UNSEEN'),)] * 2,
+        )
+
+
+class FakeIMAPServerMixin:
+    """Runs an in-process fake IMAP server and routes IMAP4_SSL connections to it"""
+
+    def setUp(self):
+        super().setUp()
+        from issues.fake_imap import FakeIMAPServer
+        self.server = FakeIMAPServer().start()
+        self.addCleanup(self.server.stop)
+        connect = lambda host: imaplib.IMAP4(*self.server.address)
+        patcher = patch('imaplib.IMAP4_SSL', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class MailboxCheckpointTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for incremental mailbox sync with UIDVALIDITY/UID checkpoints"""
+
+    def run_command(self):
+        self.server.commands.clear()
+        call_command('process_emails', stdout=StringIO(), stderr=StringIO())
+
+    def searches(self):
+        return [c for c in self.server.commands if c.startswith('UID SEARCH')]
+
+    def test_first_run_processes_unread_and_records_checkpoint(self):
+        """Without a checkpoint unread emails are processed and UIDNEXT-1 is stored"""
+        from issues.models import MailboxCheckpoint
+        self.server.deliver(b"Subject: Bug ID: CP-1 - One\r\n\r\nBody")
+        self.server.deliver(b"Subject: Bug ID: CP-OLD - Read\r\n\r\nBody", flags=['\\Seen'])
+
+        self.run_command()
+
+        self.assertEqual(list(Bug.objects.values_list('bug_id', flat=True)), ['CP-1'])
+        self.assertEqual(self.searches(), ['UID SEARCH UNSEEN'])
+        checkpoint = MailboxCheckpoint.objects.get()
+        self.assertEqual((checkpoint.uidvalidity, checkpoint.last_uid), (1, 2))
+        # Recorded from STATUS before our own \\Seen flags bumped the mod-sequence
+        self.assertIsNotNone(checkpoint.highest_modseq)
+
+    def test_next_run_fetches_only_new_uids_even_if_read(self):
+        """Later runs search UID n+1:* and pick up emails already read in a mail client"""
+        self.server.deliver(b"Subject: Bug ID: CP-1 - One\r\n\r\nBody")
+        self.run_command()
+
+        self.server.deliver(b"Subject: Bug ID: CP-2 - Two\r\n\r\nBody", flags=['\\Seen'])
+        self.run_command()
+
+        self.assertEqual(self.searches(), ['UID SEARCH UID 2:*'])
+        self.assertTrue(Bug.objects.filter(bug_id='CP-2').exists())
+        self.assertEqual(Bug.objects.get(bug_id='CP-1').modified_count, 0)
+
+    def test_empty_poll_skips_search(self):
+        """An unchanged mailbox should cost one STATUS and no SEARCH"""
+        self.server.deliver(b"Subject: Bug ID: CP-1 - One\r\n\r\nBody")
+        self.run_command()
+
+        self.run_command()
+
+        self.assertEqual(self.searches(), [])
+        self.assertTrue(any(c.startswith('STATUS') for c in self.server.commands))
+
+    def test_uidvalidity_change_resyncs(self):
+        """A new UIDVALIDITY invalidates the stored UID and falls back to UNSEEN"""
+        from issues.models import MailboxCheckpoint
+        self.server.deliver(b"Subject: Bug ID: CP-1 - One\r\n\r\nBody")
+        self.run_command()
+
+        self.server.mailbox().uidvalidity = 7
+        self.server.deliver(b"Subject: Bug ID: CP-2 - Two\r\n\r\nBody")
+        self.run_command()
+
+        self.assertEqual(self.searches(), ['UID SEARCH UNSEEN'])
+        self.assertTrue(Bug.objects.filter(bug_id='CP-2').exists())
+        self.assertEqual(MailboxCheckpoint.objects.get().uidvalidity, 7)
+
+    def test_failed_email_is_retried_by_uid(self):
+        """A failed email is fetched again by UID although the checkpoint moved past it"""
+        from issues.models import FailedMessage, MailboxCheckpoint
+        self.server.deliver(b"Subject: Bug ID: CP-1 - One\r\n\r\nBody")
+        self.server.deliver(b"Subject: Bug ID: CP-X - Bad\r\nContent-Type: text/plain; charset=bogus\r\n\r\nx")
+        self.run_command()
+        self.assertEqual(FailedMessage.objects.get().failures, 1)
+        # Stored with its batch, but not synced to STATUS after a failing pass
+        checkpoint = MailboxCheckpoint.objects.get()
+        self.assertEqual((checkpoint.last_uid, checkpoint.highest_modseq), (2, None))
+
+        # Nothing new: only the failed email is searched for and fetched again
+        self.run_command()
+        self.assertEqual(self.searches(), ['UID SEARCH UID 2'])
+        self.assertEqual(FailedMessage.objects.get().failures, 2)
+
+        self.server.deliver(b"Subject: Bug ID: CP-3 - Three\r\n\r\nBody")
+        self.run_command()
+        self.assertEqual(self.searches(), ['UID SEARCH UID 2', 'UID SEARCH UID 3:*'])
+        self.assertTrue(Bug.objects.filter(bug_id='CP-3').exists())
+        failed = FailedMessage.objects.get()
+        self.assertEqual(failed.failures, 3)
+        self.assertIsNotNone(failed.quarantined_at)
+
+        # Quarantined emails count as handled, so the checkpoint syncs again
+        self.run_command()
+        self.assertEqual(self.searches(), [])
+        self.assertIsNotNone(MailboxCheckpoint.objects.get().highest_modseq)
+
+    def test_failed_email_that_left_the_mailbox_is_forgotten(self):
+        """Failure records of emails deleted from the mailbox are dropped on the next poll"""
+        from issues.models import FailedMessage
+        self.server.deliver(b"Subject: Bug ID: CP-X - Bad\r\nContent-Type: text/plain; charset=bogus\r\n\r\nx")
+        self.run_command()
+        self.assertTrue(FailedMessage.objects.exists())
+
+        self.server.mailbox().messages.clear()
+        self.run_command()
+        self.assertFalse(FailedMessage.objects.exists())
+
+    def test_mailbox_status_parsing(self):
+        """mailbox_status should parse STATUS items and reject incomplete answers"""
+        from issues.imap import mailbox_status
+        mail = MagicMock()
+        mail.status.return_value = ('OK', [b'"INBOX" (UIDVALIDITY 3 UIDNEXT 42 HIGHESTMODSEQ 9)'])
+        self.assertEqual(
+            mailbox_status(mail, 'INBOX', ('UIDVALIDITY', 'UIDNEXT', 'HIGHESTMODSEQ')),
+            {'UIDVALIDITY': 3, 'UIDNEXT': 42, 'HIGHESTMODSEQ': 9},
+        )
+        mail.status.return_value = ('OK', [b'"INBOX" (UIDNEXT 42)'])
+        self.assertIsNone(mailbox_status(mail, 'INBOX'))
+        mail.status.return_value = ('NO', [b'STATUS failed'])
+        self.assertIsNone(mailbox_status(mail, 'INBOX'))
+
+
+class PartialFetchTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for downloading only the header fields and text part of each email"""
+
+    def build_report(self, bug_id, text, attachment_size=200000):
+        """Multipart report with an attached text file, the text body and a large binary"""
+        from email.mime.application import MIMEApplication
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        message = MIMEMultipart()
+        message["Subject"] = f"Bug ID: {bug_id} - Crash"
+        log = MIMEText("status: resolved")
+        log.add_header("Content-Disposition", "attachment", filename="log.txt")
+        message.attach(log)
+        message.attach(MIMEText(text, "plain", "utf-8"))
+        message.attach(MIMEApplication(b"\0" * attachment_size, Name="core.dump"))
+        return message.as_bytes()
+
+    def test_only_text_part_is_downloaded(self):
+        """Attachments should never be fetched, yet the description matches a full parse"""
+        from issues.management.commands.process_emails import Command
+
+        raw = self.build_report("PART-1", "Crashes on save, état: bug is closed")
+        self.server.deliver(raw)
+        self.server.deliver(b"Subject: Bug ID: PART-2 - Plain\r\n\r\nurgent")
+
+        call_command('process_emails', stdout=StringIO())
+
+        bug = Bug.objects.get(bug_id="PART-1")
+        _, subject, description = Command().parse_email(email.message_from_bytes(raw))
+        self.assertEqual((bug.subject, bug.description), (subject, description))
+        self.assertEqual(bug.status, "closed")
+        self.assertEqual(Bug.objects.get(bug_id="PART-2").priority, "High")
+
+        fetches = [c for c in self.server.commands if c.startswith('UID FETCH')]
+        self.assertFalse(any('BODY.PEEK[]' in c for c in fetches))
+        self.assertIn('UID FETCH 1 (UID BODY.PEEK[2])', fetches)
+        self.assertIn('UID FETCH 2 (UID BODY.PEEK[TEXT])', fetches)
+
+    def test_full_fetch_option(self):
+        """--full-fetch should download whole messages and parse them the same way"""
+        self.server.deliver(self.build_report("FULL-1", "Crashes on save", attachment_size=10))
+
+        call_command('process_emails', full_fetch=True, stdout=StringIO())
+
+        self.assertEqual(Bug.objects.get(bug_id="FULL-1").description, "Crashes on save")
+        self.assertIn('UID FETCH 1 (UID BODY.PEEK[])', self.server.commands)
+
+    def test_find_text_part(self):
+        """The text part should be located the way parse_email walks a message"""
+        from issues.imap import find_text_part, parse_fetch_items
+
+        data = [
+            (b'1 (UID 7 BODYSTRUCTURE (("application" "zip" ("name" {5}', b'a")b.'),
+            (b') NIL NIL "base64" 99 NIL ("attachment" NIL) NIL NIL)'
+             b'("message" "rfc822" NIL NIL NIL "7bit" 80 NIL '
+             b'("text" "plain" ("charset" "ISO-8859-1") NIL NIL "quoted-printable" 12 1 NIL NIL NIL NIL)'
+             b' 5 NIL NIL NIL NIL) "mixed") BODY[HEADER.FIELDS (SUBJECT)] {13}', b'Subject: x\r\n\r\n'),
+            b')',
+        ]
+        items = parse_fetch_items(data)[0]
+        self.assertEqual(items['UID'], b'7')
+        self.assertEqual(items['BODY[HEADER.FIELDS (SUBJECT)]'], b'Subject: x\r\n\r\n')
+        self.assertEqual(find_text_part(items['BODYSTRUCTURE']), {
+            "section": "2.1", "type": "text/plain",
+            "charset": "ISO-8859-1", "encoding": "quoted-printable",
+        })
+        self.assertIsNone(find_text_part([[b"image", b"png", None, None, None, b"base64", b"9"], b"mixed"]))
+
+
+@override_settings(INGEST_LOCK_URL=None)
+class EmailListenerTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for the IMAP IDLE listener, run against the in-process fake IMAP server"""
+
+    def test_idle_reports_new_mail(self):
+        """wait_for_new_mail should return as soon as a message is delivered"""
+        from issues.imap import wait_for_new_mail
+        mail = imaplib.IMAP4(*self.server.address)
+        mail.login('user', 'password')
+        mail.select('INBOX')
+
+        threading.Timer(0.1, self.server.deliver, [b"Subject: New\r\n\r\nBody"]).start()
+        started = time.monotonic()
+        self.assertTrue(wait_for_new_mail(mail, timeout=5))
+        self.assertLess(time.monotonic() - started, 2)
+
+        # Without new mail IDLE times out and the connection stays usable
+        self.assertFalse(wait_for_new_mail(mail, timeout=0.1))
+        self.assertEqual(mail.noop()[0], 'OK')
+        mail.logout()
+
+    def test_listener_ingests_backlog_and_new_mail(self):
+        """The listener should catch up on unread mail, then ingest pushed mail"""
+        self.server.deliver(b"Subject: Bug ID: LISTEN-1 - Waiting\r\n\r\nAlready there")
+        self.server.deliver(b"Subject: Bug ID: OLD-1 - Read\r\n\r\nSeen", flags=["\\Seen"])
+        threading.Timer(
+            0.3, self.server.deliver, [b"Subject: Bug ID: LISTEN-2 - Pushed\r\n\r\nNew mail"]
+        ).start()
+
+        out = StringIO()
+        call_command('listen_emails', max_cycles=1, idle_timeout=5, stdout=out, stderr=StringIO())
+
+        self.assertEqual(
+            sorted(Bug.objects.values_list('bug_id', flat=True)), ['LISTEN-1', 'LISTEN-2']
+        )
+        inbox = self.server.mailbox('INBOX')
+        self.assertTrue(all('\\Seen' in message['flags'] for message in inbox.messages))
+        self.assertIn("Email listener stopped", out.getvalue())
+
+    def test_listener_waits_for_the_email_lease(self):
+        """Passes are skipped while process_emails_task holds the lease and retried soon after"""
+        from issues.locks import mailbox_lease
+        from issues.management.commands.process_emails import Command
+        from issues.models import TaskLease
+        self.server.deliver(b"Subject: Bug ID: LEASE-1 - Waiting\r\n\r\nBody")
+        task_run = mailbox_lease(Command().checkpoint_key())
+        self.assertTrue(task_run.acquire())
+
+        with patch('issues.management.commands.listen_emails.LEASE_RETRY_DELAY', 0.1):
+            call_command('listen_emails', max_cycles=1, idle_timeout=5, stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Bug.objects.exists())
+        self.assertEqual(TaskLease.objects.get().token, task_run.token)
+
+        task_run.release()
+        with patch('issues.management.commands.listen_emails.LEASE_RETRY_DELAY', 0.1):
+            call_command('listen_emails', max_cycles=1, idle_timeout=0.1, stdout=StringIO(), stderr=StringIO())
+        self.assertTrue(Bug.objects.filter(bug_id='LEASE-1').exists())
+        # Released after every pass, so the beat task can run in between
+        self.assertFalse(TaskLease.objects.exists())
+
+    def test_listener_reconnects_after_connection_failure(self):
+        """A failed connection should be retried instead of stopping the listener"""
+        connect = lambda host: imaplib.IMAP4(*self.server.address)
+        with patch('imaplib.IMAP4_SSL', side_effect=[Exception("Connection refused"), connect(None)]):
+            call_command(
+                'listen_emails', max_cycles=2, idle_timeout=0.1, reconnect_delay=0,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+        self.assertIn('IDLE', [c.split(' ')[0] for c in self.server.commands])
+
+
+@override_settings(INGEST_LOCK_URL=None)
+class MailboxEngineTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for listening on several mailboxes at once with the asyncio engine"""
+
+    def engine(self, mailboxes, **kwargs):
+        from issues.mail_sources import IMAPSource
+        from issues.mailbox_engine import MailboxEngine
+        sources = [IMAPSource("imap.example.com", "bugs", "secret", name) for name in mailboxes]
+        kwargs.setdefault("idle_timeout", 0.1)
+        kwargs.setdefault("reconnect_delay", 0)
+        return MailboxEngine(sources, stdout=StringIO(), stderr=StringIO(), **kwargs)
+
+    def test_listener_ingests_several_mailboxes(self):
+        """Each --mailbox gets its own session, checkpoint and IDLE wait"""
+        from issues.models import MailboxCheckpoint
+        self.server.deliver(b"Subject: Bug ID: WEB-1 - Waiting\r\n\r\nAlready there", mailbox="Web")
+        self.server.deliver(b"Subject: Bug ID: API-1 - Waiting\r\n\r\nAlready there", mailbox="Api")
+        threading.Timer(
+            0.3, self.server.deliver, [b"Subject: Bug ID: API-2 - Pushed\r\n\r\nNew mail"], {"mailbox": "Api"}
+        ).start()
+
+        out = StringIO()
+        call_command(
+            'listen_emails', mailbox=["imap:///Web", "imap:///Api"], max_cycles=1, idle_timeout=2,
+            stdout=out, stderr=StringIO(),
+        )
+
+        self.assertEqual(
+            sorted(Bug.objects.values_list('bug_id', flat=True)), ['API-1', 'API-2', 'WEB-1']
+        )
+        for name in ("Web", "Api"):
+            box = self.server.mailbox(name)
+            self.assertTrue(all('\\Seen' in message['flags'] for message in box.messages))
+        self.assertEqual(
+            sorted(key.rsplit("/", 1)[1] for key in MailboxCheckpoint.objects.values_list('mailbox', flat=True)),
+            ['Api', 'Web'],
+        )
+        self.assertIn("2 mailbox(es)", out.getvalue())
+
+    def test_mailboxes_wait_concurrently(self):
+        """A slow mailbox should not delay the others: total time stays near one wait"""
+        def slow_wait(mail, timeout):
+            time.sleep(0.5)
+            return False
+
+        started = time.monotonic()
+        self.engine(["A", "B", "C", "D"], wait=slow_wait).run(max_cycles=1)
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(self.server.commands.count('SELECT A'), 1)
+
+    def test_bounded_queue_stores_every_batch_and_flags_once(self):
+        """With a queue of one batch all emails are still stored, then flagged with one STORE"""
+        for number in range(5):
+            self.server.deliver(f"Subject: Bug ID: QUEUE-{number} - Report\r\n\r\nBody".encode())
+
+        self.engine(["INBOX"], batch_size=1, queue_size=1).run(max_cycles=1)
+
+        self.assertEqual(Bug.objects.count(), 5)
+        stores = [c for c in self.server.commands if c.startswith('UID STORE')]
+        self.assertEqual(stores, ['UID STORE 1:5 +FLAGS \\Seen'])
+
+    def test_failed_write_drops_rest_of_pass(self):
+        """After a failed batch the pass stops advancing the checkpoint and is retried"""
+        from issues.management.commands.process_emails import Command
+        from issues.models import MailboxCheckpoint
+        for number in range(3):
+            self.server.deliver(f"Subject: Bug ID: FAIL-{number} - Report\r\n\r\nBody".encode())
+
+        store_batch = Command.store_batch
+        failures = []
+
+        def flaky_store_batch(processor, prepared, checkpoint=None):
+            if prepared["email_ids"] == [b'2'] and not failures:
+                failures.append(prepared)
+                raise Exception("database is locked")
+            return store_batch(processor, prepared, checkpoint)
+
+        engine = self.engine(["INBOX"], batch_size=1)
+        with patch.object(Command, 'store_batch', flaky_store_batch):
+            engine.run(max_cycles=1)
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(sorted(Bug.objects.values_list('modified_count', flat=True)), [0, 0, 0])
+        self.assertIn("database is locked", engine.stderr.getvalue())
+        self.assertEqual(MailboxCheckpoint.objects.get().last_uid, 3)
+        inbox = self.server.mailbox('INBOX')
+        self.assertTrue(all('\\Seen' in message['flags'] for message in inbox.messages))
+
+    def test_mailbox_lease_is_taken_per_pass(self):
+        """A mailbox whose lease is held is retried later while the others are ingested"""
+        from issues.locks import mailbox_lease
+        from issues.models import TaskLease
+        self.server.deliver(b"Subject: Bug ID: HELD-1 - Waiting\r\n\r\nBody", mailbox="Held")
+        self.server.deliver(b"Subject: Bug ID: FREE-1 - Report\r\n\r\nBody", mailbox="Free")
+        engine = self.engine(["Held", "Free"], lease_retry_delay=0.1)
+        held = mailbox_lease(engine.sources[0].checkpoint_key)
+        self.assertTrue(held.acquire())
+
+        engine.run(max_cycles=1)
+        self.assertEqual(list(Bug.objects.values_list('bug_id', flat=True)), ['FREE-1'])
+        self.assertEqual(TaskLease.objects.get().token, held.token)
+
+        held.release()
+        self.engine(["Held", "Free"], lease_retry_delay=0.1).run(max_cycles=1)
+        self.assertEqual(sorted(Bug.objects.values_list('bug_id', flat=True)), ['FREE-1', 'HELD-1'])
+        # Released after every pass, so process_emails_task can run in between
+        self.assertFalse(TaskLease.objects.exists())
+
+    def test_engine_without_output_streams_reports_errors(self):
+        """An engine built outside listen_emails writes connection errors to sys.stderr"""
+        from issues.mail_sources import IMAPSource
+        from issues.mailbox_engine import MailboxEngine
+        sources = [IMAPSource("imap.example.com", "bugs", "secret", "INBOX")]
+        with patch('sys.stderr', new_callable=StringIO) as stderr, \
+                patch.object(MailboxEngine, 'ingest', side_effect=[Exception("connection reset"), 0]):
+            MailboxEngine(sources, idle_timeout=0.1, reconnect_delay=0).run(max_cycles=1)
+        self.assertIn("connection reset", stderr.getvalue())
+
+
+@override_settings(INGEST_LOCK_URL=None)
+class EmailFanOutTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for splitting an ingestion pass into chunk subtasks, run eagerly"""
+
+    def setUp(self):
+        super().setUp()
+        from issues.imap import connection_pool
+        from server.celery import app
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        # Subtasks report progress on stdout like the process_emails command
+        patcher = patch('sys.stdout', new_callable=StringIO)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connection_pool.close_all)
+
+    def deliver(self, prefix, count):
+        for number in range(count):
+            self.server.deliver(f"Subject: Bug ID: {prefix}-{number} - Report\r\n\r\nBody".encode())
+
+    def test_backlog_is_split_into_chunks(self):
+        """Each chunk is fetched by its own subtask and the checkpoint moves once at the end"""
+        from issues.models import MailboxCheckpoint
+        from issues.tasks import finish_email_ingest, process_emails_task
+        self.deliver("FAN", 5)
+
+        with patch('issues.tasks.CHUNK_SIZE', 2), \
+                patch.object(finish_email_ingest, 'run', wraps=finish_email_ingest.run) as finish:
+            result = process_emails_task()
+
+        self.assertEqual(result, "Dispatched 3 chunks of new emails")
+        self.assertEqual(Bug.objects.count(), 5)
+        self.assertEqual([chunk["emails"] for chunk in finish.call_args[0][0]], [2, 2, 1])
+        self.assertEqual(MailboxCheckpoint.objects.get().last_uid, 5)
+        structure_fetches = [c for c in self.server.commands if 'BODYSTRUCTURE' in c]
+        self.assertEqual(len(structure_fetches), 3)
+
+    def test_failed_chunk_keeps_checkpoint(self):
+        """If any chunk fails, the checkpoint stays put and the next run stores the rest"""
+        from issues.management.commands.process_emails import Command
+        from issues.models import MailboxCheckpoint
+        from issues.tasks import process_emails_task
+        self.deliver("RETRY", 4)
+
+        process_batch = Command.process_batch
+        calls = []
+
+        def fail_second_chunk(processor, mail, batch, checkpoint=None):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise Exception("Worker lost")
+            return process_batch(processor, mail, batch, checkpoint)
+
+        with patch('issues.tasks.CHUNK_SIZE', 2):
+            with patch.object(Command, 'process_batch', fail_second_chunk):
+                with self.assertRaises(Exception):
+                    process_emails_task()
+            self.assertEqual(Bug.objects.count(), 2)
+            self.assertFalse(MailboxCheckpoint.objects.filter(last_uid__gt=0).exists())
+
+            process_emails_task()
+
+        self.assertEqual(Bug.objects.count(), 4)
+        self.assertEqual(set(Bug.objects.values_list('modified_count', flat=True)), {0})
+        self.assertEqual(MailboxCheckpoint.objects.get().last_uid, 4)
+
+
 class RunserverWithCeleryTest(TestCase):
     @patch('os.kill')
     @patch('subprocess.Popen')
@@ -1288,7 +2690,7 @@ class ProcessEmailsDetailedTests(TestCase):
         mock_imap.return_value = mock_connection
         
         # 1. Test with server returning a non-OK status
-        mock_connection.search.return_value = ('NO', ['Server error'])
+        mock_connection.uid.return_value = ('NO', ['Server error'])
         
         # Get command instance
         from issues.management.commands.process_emails import Command
@@ -1301,12 +2703,12 @@ class ProcessEmailsDetailedTests(TestCase):
         self.assertEqual(result, [])
         
         # 2. Test with server returning malformed data
-        mock_connection.search.return_value = ('OK', [None])
+        mock_connection.uid.return_value = ('OK', [None])
         result = command.fetch_unread_emails(mock_connection)
         self.assertEqual(result, [])
         
         # 3. Test with server returning empty bytes
-        mock_connection.search.return_value = ('OK', [b''])
+        mock_connection.uid.return_value = ('OK', [b''])
         result = command.fetch_unread_emails(mock_connection)
         self.assertEqual(result, [])
     
@@ -1414,8 +2816,10 @@ class ProcessEmailsDetailedTests(TestCase):
             self.assertEqual(priority, case["expected"], 
                             f"Failed with subject: {case['subject']}, body: {case['body']}")
     
+    @patch('issues.management.commands.process_emails.Bug.objects.bulk_create',
+           side_effect=Exception("Bulk insert failed"))
     @patch('issues.management.commands.process_emails.Bug.objects.get_or_create')
-    def test_process_email_error_handling(self, mock_get_or_create):
+    def test_process_email_error_handling(self, mock_get_or_create, mock_bulk_create):
         """Test error handling in the process_email method"""
         from issues.management.commands.process_emails import Command
         command = Command()
@@ -1426,26 +2830,26 @@ class ProcessEmailsDetailedTests(TestCase):
         mock_mail = MagicMock()
         
         # 1. Test with fetch returning error status
-        mock_mail.fetch.return_value = ('NO', ['Failed to fetch'])
+        mock_mail.uid.return_value = ('NO', ['Failed to fetch'])
         
         command.process_email(mock_mail, '1')
         stderr_output = command.stderr.getvalue()
         self.assertIn("Failed to fetch email", stderr_output)
         
         # 2. Test with exception during processing
-        mock_mail.fetch.return_value = ('OK', [(b'1', b'Valid email data')])
+        mock_mail.uid.return_value = ('OK', build_fetch_response([(b'2', b'Valid email data')]))
         mock_get_or_create.side_effect = Exception("Database error")
         
         command.process_email(mock_mail, '2')
         stderr_output = command.stderr.getvalue()
-        self.assertIn("Error processing email 2", stderr_output)
+        self.assertIn("Error processing email b'2'", stderr_output)
         
         # 3. Test with successful update of existing bug
         mock_bug = MagicMock()
         mock_get_or_create.side_effect = None  # Reset side_effect
         mock_get_or_create.return_value = (mock_bug, False)  # False means bug already existed
         
-        mock_mail.fetch.return_value = ('OK', [(b'3', b'Valid email data')])
+        mock_mail.uid.return_value = ('OK', build_fetch_response([(b'3', b'Valid email data')]))
         
         command.process_email(mock_mail, '3')
         stdout_output = command.stdout.getvalue()
@@ -1455,12 +2859,14 @@ class ProcessEmailsDetailedTests(TestCase):
         self.assertEqual(mock_bug.save.call_count, 1)
 
 
+@override_settings(INGEST_LOCK_URL=None)
 class TasksTests(TestCase):
     """Tests for Celery tasks in issues/tasks.py"""
     
-    @patch('issues.tasks.call_command')
+    @patch('issues.tasks.connection_pool')
+    @patch('issues.tasks.ProcessEmailsCommand.fetch_new_emails', return_value=(None, [], None))
     @patch('issues.tasks.logger')
-    def test_process_emails_task_success(self, mock_logger, mock_call_command):
+    def test_process_emails_task_success(self, mock_logger, mock_fetch_new_emails, mock_pool):
         """Test successful execution of process_emails_task"""
         # Import the task function
         from issues.tasks import process_emails_task
@@ -1468,8 +2874,9 @@ class TasksTests(TestCase):
         # Execute the task
         result = process_emails_task()
         
-        # Verify that the management command was called
-        mock_call_command.assert_called_once_with('process_emails')
+        # Verify that new emails were searched for on a pooled connection
+        mock_fetch_new_emails.assert_called_once_with(mock_pool.acquire.return_value)
+        mock_pool.release.assert_called_once_with(mock_pool.acquire.return_value)
         
         # Verify logging was performed
         mock_logger.info.assert_any_call("Starting scheduled email processing task")
@@ -1478,15 +2885,16 @@ class TasksTests(TestCase):
         # Verify return value
         self.assertEqual(result, "Emails processed successfully")
     
-    @patch('issues.tasks.call_command')
+    @patch('issues.tasks.connection_pool')
+    @patch('issues.tasks.ProcessEmailsCommand.fetch_new_emails')
     @patch('issues.tasks.logger')
-    def test_process_emails_task_error(self, mock_logger, mock_call_command):
+    def test_process_emails_task_error(self, mock_logger, mock_fetch_new_emails, mock_pool):
         """Test error handling in process_emails_task"""
         # Import the task function
         from issues.tasks import process_emails_task
         
-        # Setup call_command to raise an exception
-        mock_call_command.side_effect = Exception("Test exception")
+        # Setup the mailbox search to raise an exception
+        mock_fetch_new_emails.side_effect = Exception("Test exception")
         
         # Execute the task and expect it to re-raise the exception
         with self.assertRaises(Exception) as context:
@@ -1495,24 +2903,30 @@ class TasksTests(TestCase):
         # Verify the exception details
         self.assertEqual(str(context.exception), "Test exception")
         
-        # Verify that the management command was called
-        mock_call_command.assert_called_once_with('process_emails')
+        # Verify that the broken connection was not returned to the pool
+        mock_pool.discard.assert_called_once_with(mock_pool.acquire.return_value)
+        mock_pool.release.assert_not_called()
         
         # Verify error was logged
         mock_logger.info.assert_called_once_with("Starting scheduled email processing task")
         mock_logger.error.assert_called_once_with("Error processing emails: Test exception")
     
-    @patch('issues.tasks.call_command')
-    def test_process_emails_task_integration(self, mock_call_command):
+    @patch('issues.tasks.connection_pool')
+    @patch('issues.tasks.ProcessEmailsCommand.fetch_new_emails', return_value=(None, [], None))
+    def test_process_emails_task_integration(self, mock_fetch_new_emails, mock_pool):
         """Test integration with Django and Celery"""
         # This tests that the task is properly decorated and can be imported by Celery
         
         # Import the Celery app from your project
         from server.celery import app
         
-        # Check if our task is registered with Celery
-        task_name = 'issues.tasks.process_emails_task'
-        self.assertIn(task_name, app.tasks)
+        # Check if our tasks are registered with Celery
+        for task_name in (
+            'issues.tasks.process_emails_task',
+            'issues.tasks.process_email_chunk',
+            'issues.tasks.finish_email_ingest',
+        ):
+            self.assertIn(task_name, app.tasks)
         
         # We can also check if we can apply the task synchronously
         from issues.tasks import process_emails_task
@@ -1521,5 +2935,492 @@ class TasksTests(TestCase):
         # The result should be successful
         self.assertTrue(result.successful())
         
-        # And call_command should have been called
-        mock_call_command.assert_called_once_with('process_emails')
\ No newline at end of file
+        # And the mailbox should have been searched
+        mock_fetch_new_emails.assert_called_once()
+    
+    @patch('issues.tasks.connection_pool')
+    def test_overlapping_run_is_skipped(self, mock_pool):
+        """A run that finds the lease taken should return without touching the mailbox"""
+        from issues.locks import mailbox_lease
+        from issues.tasks import ProcessEmailsCommand, process_emails_task
+        mailbox = ProcessEmailsCommand.imap_source.checkpoint_key
+        running = mailbox_lease(mailbox)
+        self.assertTrue(running.acquire())
+        
+        self.assertEqual(process_emails_task(), "Skipped, previous run still in progress")
+        mock_pool.acquire.assert_not_called()
+        
+        # Once the running one is done, the next run goes ahead and releases the lease again
+        running.release()
+        with patch('issues.tasks.ProcessEmailsCommand.fetch_new_emails', return_value=(None, [], None)):
+            self.assertEqual(process_emails_task(), "Emails processed successfully")
+        self.assertTrue(mailbox_lease(mailbox).acquire())
+
+
+@override_settings(INGEST_LOCK_URL=None)
+class LeaseTests(TestCase):
+    """Tests for the lease locks in issues/locks.py"""
+
+    def test_database_lease_has_one_holder(self):
+        """Only the holder can extend or release a lease until it expires"""
+        from issues.locks import get_lease
+        from issues.models import TaskLease
+        holder = get_lease("job", ttl=30)
+        other = get_lease("job", ttl=30)
+        self.assertTrue(holder.acquire())
+        self.assertFalse(other.acquire())
+        self.assertFalse(other.extend())
+
+        other.release()
+        self.assertTrue(TaskLease.objects.filter(name="job").exists())
+        self.assertTrue(get_lease("job", holder.token).extend())
+
+        holder.release()
+        self.assertTrue(other.acquire())
+
+    def test_expired_database_lease_is_taken_over(self):
+        """A holder that stops extending its lease loses it"""
+        from datetime import timedelta
+        from issues.locks import get_lease
+        from issues.models import TaskLease
+        stuck = get_lease("job")
+        self.assertTrue(stuck.acquire())
+        TaskLease.objects.filter(name="job").update(expires_at=now() - timedelta(seconds=1))
+
+        fresh = get_lease("job")
+        self.assertTrue(fresh.acquire())
+        self.assertFalse(stuck.extend())
+        self.assertEqual(TaskLease.objects.get(name="job").token, fresh.token)
+
+    @override_settings(INGEST_LOCK_URL="redis://localhost:6379/0")
+    @patch('issues.locks.redis_client')
+    def test_redis_lease_uses_set_nx_px(self, mock_redis_client):
+        """Redis leases are taken with SET NX PX and extended only with the holder's token"""
+        from issues.locks import EXTEND_SCRIPT, RedisLease, get_lease
+        client = mock_redis_client.return_value
+        client.set.return_value = None
+
+        lease = get_lease("job", ttl=1.5)
+        self.assertIsInstance(lease, RedisLease)
+        self.assertFalse(lease.acquire())
+        client.set.assert_called_once_with("bug-tracker:lease:job", lease.token, nx=True, px=1500)
+
+        client.eval.return_value = 1
+        self.assertTrue(lease.extend())
+        client.eval.assert_called_once_with(EXTEND_SCRIPT, 1, "bug-tracker:lease:job", lease.token, 1500)
+
+    @patch('issues.tasks.connection_pool')
+    def test_chunk_stops_when_lease_was_taken_over(self, mock_pool):
+        """A chunk whose run lost the lease stops after the batch in progress"""
+        from issues.locks import LeaseLost, mailbox_lease
+        from issues.tasks import ProcessEmailsCommand, process_email_chunk
+        self.assertTrue(mailbox_lease(ProcessEmailsCommand.imap_source.checkpoint_key).acquire())
+        batches = [[(b'1', b"Subject: Bug ID: LOST-1 - Report\n\nBody")], [(b'2', b"Subject: Bug ID: LOST-2 - Report\n\nBody")]]
+
+        with patch('issues.tasks.ProcessEmailsCommand.fetch_emails', return_value=iter(batches)):
+            with self.assertRaises(LeaseLost):
+                process_email_chunk(["1", "2"], "stale-token")
+
+        self.assertEqual(list(Bug.objects.values_list('bug_id', flat=True)), ['LOST-1'])
+        mock_pool.discard.assert_called_once()
+
+
+@override_settings(
+    INGEST_ADAPTIVE_POLLING=True, INGEST_POLL_MIN_INTERVAL=1, INGEST_POLL_MAX_INTERVAL=8,
+    INGEST_LOCK_URL=None,
+)
+class AdaptivePollingTests(TestCase):
+    """Tests for the self-scheduling polling mode of process_emails_task"""
+
+    def setUp(self):
+        from issues.tasks import process_emails_task
+        self.task = process_emails_task
+        patcher = patch.object(process_emails_task, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, found, poll_token=None):
+        """Run the task with an ingestion pass that finds `found` emails"""
+        with patch('issues.tasks.ingest_new_emails', return_value=("Emails processed successfully", found)) as ingest:
+            result = self.task(poll_token=poll_token)
+        return result, ingest.called
+
+    def scheduled(self):
+        """Return (poll_token, countdown) of the last scheduled run"""
+        kwargs = self.apply_async.call_args.kwargs
+        return kwargs['kwargs']['poll_token'], kwargs['countdown']
+
+    def test_interval_shrinks_under_load_and_backs_off_when_idle(self):
+        """Mail resets the interval to the minimum, empty runs double it up to the ceiling"""
+        from issues.polling import next_interval
+        self.assertEqual(next_interval(None, 0), 1)
+        self.assertEqual([next_interval(i, 0) for i in (1, 2, 4, 8)], [2, 4, 8, 8])
+        self.assertEqual(next_interval(8, 250), 1)
+        # A run that could not look at the mailbox keeps the interval
+        self.assertEqual(next_interval(4, None), 4)
+
+    def test_each_run_schedules_the_next(self):
+        """Only the run holding the current token continues the chain"""
+        from issues.models import PollSchedule
+        self.assertEqual(self.run_task(0), ("Emails processed successfully", True))
+        token, countdown = self.scheduled()
+        self.assertEqual(countdown, 1)
+
+        # Beat finds the chain alive and leaves it alone
+        self.assertEqual(self.run_task(0), ("Skipped, next poll already scheduled", False))
+
+        countdowns = []
+        for _ in range(4):
+            self.run_task(0, poll_token=token)
+            token, countdown = self.scheduled()
+            countdowns.append(countdown)
+        self.assertEqual(countdowns, [2, 4, 8, 8])
+
+        # A run from an older link of the chain stops it from forking
+        self.apply_async.reset_mock()
+        self.assertEqual(self.run_task(0, poll_token="stale"), ("Skipped, next poll already scheduled", False))
+        self.apply_async.assert_not_called()
+
+        self.run_task(42, poll_token=token)
+        self.assertEqual(self.scheduled()[1], 1)
+        self.assertEqual(PollSchedule.objects.get().last_found, 42)
+
+    def test_beat_restarts_overdue_chain(self):
+        """When the scheduled run never came, the next beat run takes over"""
+        from datetime import timedelta
+        from issues.models import PollSchedule
+        self.run_task(0)
+        old_token, _ = self.scheduled()
+        PollSchedule.objects.update(next_run_at=now() - timedelta(minutes=5))
+
+        self.assertEqual(self.run_task(3), ("Emails processed successfully", True))
+        self.assertNotEqual(self.scheduled()[0], old_token)
+        self.assertEqual(self.run_task(0, poll_token=old_token)[1], False)
+
+    def test_failed_run_still_schedules_next(self):
+        """An error re-raises but keeps the chain going at the same interval"""
+        self.run_task(0)
+        token, _ = self.scheduled()
+        with patch('issues.tasks.ingest_new_emails', side_effect=Exception("IMAP down")):
+            with self.assertRaises(Exception):
+                self.task(poll_token=token)
+        self.assertEqual(self.scheduled()[1], 1)
+        self.assertEqual(self.apply_async.call_count, 2)
+
+
+class IngestMetricsTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for the per-stage timings of email ingestion"""
+
+    def test_histogram_quantiles_and_merge(self):
+        """Quantiles interpolate within buckets and merged histograms add up"""
+        from issues.metrics import Histogram
+        fast, slow = Histogram(), Histogram()
+        for _ in range(99):
+            fast.observe(0.001)
+        slow.observe(2.0)
+        fast.merge(Histogram.from_dict(slow.to_dict()))
+
+        self.assertEqual((fast.count, fast.min, fast.max), (100, 0.001, 2.0))
+        self.assertAlmostEqual(fast.sum, 2.099)
+        self.assertLess(fast.quantile(0.5), 0.002)
+        self.assertGreater(fast.quantile(0.999), 1.0)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_stats_flag_reports_every_stage_and_run_is_recorded(self):
+        """--stats prints a row per stage and the run is stored as an IngestRun"""
+        from issues.metrics import STAGES
+        from issues.models import IngestRun
+        self.server.deliver(b"Subject: Bug ID: MET-1 - One\r\n\r\nBody")
+        self.server.deliver(b"Subject: Bug ID: MET-2 - Two\r\n\r\nBody")
+        out = StringIO()
+
+        call_command('process_emails', '--stats', stdout=out, stderr=StringIO())
+
+        rows = {line.split()[0]: line.split() for line in out.getvalue().splitlines() if line.split()}
+        for stage in STAGES:
+            self.assertIn(stage, rows)
+        self.assertEqual(rows['parse'][1], '2')
+        self.assertEqual(rows['connect'][1], '1')
+        # One batch: one duplicate check and one transaction, each its own stage
+        self.assertEqual((rows['dedupe'][1], rows['write'][1]), ('1', '1'))
+
+        run = IngestRun.objects.get()
+        self.assertEqual((run.source, run.emails), ('process_emails', 2))
+        self.assertEqual(run.stats['parse']['durations']['count'], 2)
+        self.assertGreater(run.stats['fetch']['bytes'], 0)
+
+    def test_metrics_endpoint_merges_recent_runs(self):
+        """GET /api/metrics/ingest/ merges the stored runs and requires login"""
+        from issues.metrics import IngestStats, record_run
+        for emails in (3, 4):
+            stats = IngestStats()
+            stats.observe('fetch', 0.05, 1000)
+            record_run(stats, 'process_emails', emails)
+        client = APIClient()
+        url = reverse('ingest-metrics')
+
+        self.assertEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_authenticate(User.objects.create_user(username='metrics', password='pw'))
+        data = client.get(url).json()
+        self.assertEqual((data['runs'], data['emails']), (2, 7))
+        self.assertEqual(data['stages']['fetch']['count'], 2)
+        self.assertEqual(data['stages']['fetch']['bytes'], 2000)
+        self.assertEqual(data['stages']['fetch']['buckets']['+Inf'], 2)
+        self.assertEqual(client.get(url, {'runs': 1}).json()['emails'], 4)
+        self.assertEqual(client.get(url, {'runs': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(INGEST_LOCK_URL=None, INGEST_STAGE_URL=None, INGEST_STAGED_PIPELINE=True)
+class StagedPipelineTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for the fetch / parse / classify / persist stages of issues.ingest"""
+
+    def setUp(self):
+        super().setUp()
+        from issues.imap import connection_pool
+        from server.celery import app
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        patcher = patch('sys.stdout', new_callable=StringIO)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connection_pool.close_all)
+
+    def flagged(self):
+        return ['\\Seen' in message['flags'] for message in self.server.mailbox().messages]
+
+    def test_stages_pass_references_and_store_bugs(self):
+        """Stages hand on UIDs and keys only; persist stores, flags and unstages"""
+        from issues import ingest
+        from issues.management.commands.process_emails import Command, parse_raw_email
+        from issues.models import ProcessedMessage, StagedMessage
+        self.server.deliver(b"Subject: Bug ID: STG-1 - Crash\r\n\r\nThe app crashes")
+        self.server.deliver(b"Subject: Bug ID: STG-2 - Typo\r\nContent-Type: text/plain; charset=bogus\r\n\r\nx")
+        processor = Command(stdout=StringIO(), stderr=StringIO())
+
+        envelope = ingest.fetch(["1", "2"], processor)
+        self.assertEqual(envelope["emails"], 2)
+        self.assertEqual([set(message) for message in envelope["messages"]], [{"uid", "key"}] * 2)
+        self.assertEqual(StagedMessage.objects.count(), 2)
+
+        parsed = ingest.parse(envelope, processor)
+        self.assertEqual(set(parsed["messages"][0]), {"uid", "key", "parsed"})
+        self.assertIn("bogus", parsed["messages"][1]["error"])
+        classified = ingest.classify(parsed, processor)
+        self.assertEqual(set(classified["messages"][0]), {"uid", "key", "parsed", "classified"})
+        # The fields wait in the store, the same as the single-pass parser of process_emails
+        key = classified["messages"][0]["key"]
+        fields = ingest.get_fields(ingest.get_message_store(), [key], ingest.CLASSIFIED_SUFFIX)[key]
+        self.assertEqual(
+            ingest.bug_data(fields),
+            parse_raw_email(b"Subject: Bug ID: STG-1 - Crash\r\n\r\nThe app crashes"),
+        )
+        self.assertEqual(StagedMessage.objects.count(), 4)
+
+        result = ingest.persist(classified, processor)
+        self.assertEqual(result, {"emails": 2, "fetched": 2, "processed": 1})
+        self.assertEqual(list(Bug.objects.values_list('bug_id', flat=True)), ['STG-1'])
+        self.assertEqual(ProcessedMessage.objects.count(), 1)
+        self.assertEqual(StagedMessage.objects.count(), 0)
+        # The unparseable email stays unread for the next run
+        self.assertEqual(self.flagged(), [True, False])
+
+    def test_in_process_pipeline_skips_stored_emails(self):
+        """run_pipeline() batches the stages in memory and flags duplicates without storing them"""
+        from issues import ingest
+        from issues.models import StagedMessage
+        for number in range(3):
+            self.server.deliver(f"Subject: Bug ID: RUN-{number} - Report\r\nMessage-ID: <run-{number}@x>\r\n\r\nBody".encode())
+        self.assertEqual(ingest.run_pipeline(["1", "2"], batch_size=1)["processed"], 2)
+        self.server.deliver(b"Subject: Bug ID: RUN-0 - Report\r\nMessage-ID: <run-0@x>\r\n\r\nBody")
+
+        result = ingest.run_pipeline(["3", "4"])
+
+        self.assertEqual(result, {"emails": 2, "fetched": 2, "processed": 2})
+        self.assertEqual(Bug.objects.count(), 3)
+        self.assertEqual(Bug.objects.get(bug_id='RUN-0').modified_count, 0)
+        self.assertEqual(self.flagged(), [True] * 4)
+        self.assertFalse(StagedMessage.objects.exists())
+
+    def test_backlog_runs_as_chained_stage_tasks(self):
+        """With INGEST_STAGED_PIPELINE each chunk is a chain of stage tasks feeding the chord"""
+        from issues.models import MailboxCheckpoint, StagedMessage
+        from issues.tasks import finish_email_ingest, parse_emails_stage, process_emails_task
+        for number in range(5):
+            self.server.deliver(f"Subject: Bug ID: CHN-{number} - Report\r\n\r\nBody".encode())
+
+        with patch('issues.tasks.CHUNK_SIZE', 2), \
+                patch.object(parse_emails_stage, 'run', wraps=parse_emails_stage.run) as parse, \
+                patch.object(finish_email_ingest, 'run', wraps=finish_email_ingest.run) as finish:
+            result = process_emails_task()
+
+        self.assertEqual(result, "Dispatched 3 chunks of new emails")
+        self.assertEqual(parse.call_count, 3)
+        self.assertEqual([chunk["processed"] for chunk in finish.call_args[0][0]], [2, 2, 1])
+        self.assertEqual(Bug.objects.count(), 5)
+        self.assertEqual(MailboxCheckpoint.objects.get().last_uid, 5)
+        self.assertFalse(StagedMessage.objects.exists())
+
+
+class IngestBenchmarkTests(TransactionTestCase):
+    """Tests for the end-to-end ingestion benchmark"""
+
+    def test_corpus_is_reproducible_and_mixed(self):
+        """The same seed gives the same corpus, with every kind of email parseable"""
+        from issues.management.commands.benchmark_ingest import generate_corpus, parse_mix
+        from issues.management.commands.process_emails import parse_raw_email
+        corpus = generate_corpus(40, attachment_kb=4, thread_depth=5, seed=3)
+
+        self.assertEqual(corpus, generate_corpus(40, attachment_kb=4, thread_depth=5, seed=3))
+        self.assertEqual({kind for kind, _ in corpus}, {"plain", "attachment", "charset", "thread"})
+        for kind, raw_email in corpus:
+            self.assertTrue(parse_raw_email(raw_email)["bug_id"].startswith("BENCH-"), kind)
+        self.assertEqual(parse_mix("thread=1"), {"plain": 0, "attachment": 0, "charset": 0, "thread": 1.0})
+
+    def test_benchmark_saves_and_compares_results(self):
+        """benchmark_ingest runs process_emails over the fake server and writes JSON"""
+        import os
+        import tempfile
+        directory = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, directory)
+        first, second = os.path.join(directory, 'first.json'), os.path.join(directory, 'second.json')
+        options = dict(messages=30, attachment_kb=4, batch_size=8, reuse_database=True)
+
+        call_command('benchmark_ingest', output=first, stdout=StringIO(), **options)
+        out = StringIO()
+        call_command('benchmark_ingest', output=second, compare=first, stdout=out, **options)
+
+        with open(first) as results_file:
+            results = json.load(results_file)
+        self.assertEqual((results['corpus']['messages'], results['processed']), (30, 30))
+        self.assertGreater(results['messages_per_second'], 0)
+        self.assertLessEqual(results['latency']['p50'], results['latency']['p99'])
+        self.assertEqual(results['stages']['parse']['count'], 30)
+        self.assertIn('messages/s:', out.getvalue())
+
+
+@override_settings(INGEST_QUARANTINE_AFTER=2, INGEST_QUARANTINE_FOLDER='Quarantine')
+class QuarantineTests(FakeIMAPServerMixin, TransactionTestCase):
+    """Tests for counting failures and quarantining poison emails"""
+
+    BAD = b"Subject: Bug ID: QX-1 - Bad\r\nContent-Type: text/plain; charset=bogus\r\n\r\nx"
+
+    def run_command(self):
+        self.server.commands.clear()
+        call_command('process_emails', stdout=StringIO(), stderr=StringIO())
+
+    def test_email_is_quarantined_after_repeated_failures(self):
+        """A failing email is retried until the limit, then flagged, moved and skipped"""
+        from issues.models import FailedMessage
+        self.server.deliver(b"Subject: Bug ID: QX-0 - Good\r\n\r\nBody")
+        self.server.deliver(self.BAD)
+
+        self.run_command()
+        failed = FailedMessage.objects.get()
+        self.assertEqual((failed.failures, failed.quarantined_at, failed.uid), (1, None, '2'))
+        self.assertIn('bogus', failed.last_error)
+        self.assertEqual(len(self.server.mailbox().messages), 2)
+        self.assertTrue(any(c.startswith('STATUS') for c in self.server.commands))
+
+        # The checkpoint is past the email now; it is fetched again by its UID
+        self.run_command()
+        self.assertIn('UID SEARCH UID 2', self.server.commands)
+        failed.refresh_from_db()
+        self.assertEqual(failed.failures, 2)
+        self.assertIsNotNone(failed.quarantined_at)
+        self.assertEqual(bytes(failed.raw).count(b'QX-1'), 1)
+        self.assertEqual(failed.subject, 'Bug ID: QX-1 - Bad')
+        self.assertEqual([m['uid'] for m in self.server.mailbox().messages], [1])
+        quarantine = self.server.mailbox('Quarantine').messages
+        self.assertEqual(len(quarantine), 1)
+        self.assertIn('\\Seen', quarantine[0]['flags'])
+
+        self.run_command()
+        self.assertEqual(FailedMessage.objects.get().failures, 2)
+        self.assertFalse(any('FETCH' in c for c in self.server.commands))
+
+    def test_failed_email_is_quarantined_after_newer_emails(self):
+        """Retries continue while new emails arrive and move the checkpoint on"""
+        from issues.models import FailedMessage
+        self.server.deliver(self.BAD)
+        self.run_command()
+        self.server.deliver(b"Subject: Bug ID: QX-2 - Later\r\n\r\nBody")
+        self.run_command()
+
+        self.assertTrue(Bug.objects.filter(bug_id='QX-2').exists())
+        self.assertIsNotNone(FailedMessage.objects.get(uid='1').quarantined_at)
+        self.assertEqual(len(self.server.mailbox('Quarantine').messages), 1)
+
+    def test_file_source_failures_are_not_retried_over_imap(self):
+        """Maildir and mbox failures are kept under their own source and left out of IMAP retries"""
+        import mailbox
+        import os
+        import tempfile
+        from issues.models import FailedMessage
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        maildir = os.path.join(tmp.name, "bugs")
+        for subdir in ("new", "cur", "tmp"):
+            os.makedirs(os.path.join(maildir, subdir))
+        with open(os.path.join(maildir, "new", "1697041234.M1P2.host"), "wb") as message_file:
+            message_file.write(self.BAD.replace(b"QX-1", b"QX-DIR"))
+        mbox_path = os.path.join(tmp.name, "bugs.mbox")
+        mbox = mailbox.mbox(mbox_path)
+        mbox.add(b"Subject: Bug ID: QX-MBOX-0 - Good\n\nBody\n")
+        mbox.add(self.BAD.replace(b"QX-1", b"QX-MBOX-1"))
+        mbox.close()
+
+        call_command('process_emails', source=f"maildir:{maildir}", stdout=StringIO(), stderr=StringIO())
+        call_command('process_emails', source=f"mbox:{mbox_path}", stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            sorted(FailedMessage.objects.values_list('mailbox', 'uid')),
+            [(f"maildir:{maildir}", "1697041234.M1P2.host"), (f"mbox:{mbox_path}", "1")],
+        )
+
+        # IMAP polls with a checkpoint neither crash on the maildir id nor fetch UID 1 as a retry
+        self.server.deliver(b"Subject: Bug ID: QX-2 - Good\r\n\r\nBody")
+        self.run_command()
+        self.server.deliver(b"Subject: Bug ID: QX-3 - Good\r\n\r\nBody")
+        self.run_command()
+        self.assertEqual([c for c in self.server.commands if c.startswith('UID SEARCH')], ['UID SEARCH UID 2:*'])
+        self.assertTrue(Bug.objects.filter(bug_id='QX-3').exists())
+        self.assertEqual(FailedMessage.objects.count(), 2)
+
+        # A failed re-drive counts against the file source it came from
+        row = FailedMessage.objects.get(uid="1")
+        call_command('quarantine', redrive=[row.id], stdout=StringIO(), stderr=StringIO())
+        row.refresh_from_db()
+        self.assertEqual((row.mailbox, row.failures), (f"mbox:{mbox_path}", 2))
+
+    def test_list_redrive_and_discard(self):
+        """The quarantine command lists emails and re-drives them once the cause is fixed"""
+        from django.core.management.base import CommandError
+        from issues.models import FailedMessage
+        self.server.deliver(self.BAD)
+        self.run_command()
+        self.run_command()
+        failed = FailedMessage.objects.get()
+
+        out = StringIO()
+        call_command('quarantine', stdout=out)
+        self.assertIn(f"{failed.id:>5} Q     2", out.getvalue())
+
+        # Still broken: one more failure, still quarantined
+        call_command('quarantine', redrive=[failed.id], stdout=StringIO(), stderr=StringIO())
+        failed.refresh_from_db()
+        self.assertEqual(failed.failures, 3)
+        self.assertIsNotNone(failed.quarantined_at)
+
+        with patch('issues.management.commands.process_emails.Command.parse_email',
+                   return_value=('QX-1', 'Bad', 'Fixed body')):
+            out = StringIO()
+            call_command('quarantine', redrive_all=True, stdout=out, stderr=StringIO())
+        self.assertIn('Re-drove 1 email(s)', out.getvalue())
+        self.assertEqual(Bug.objects.get(bug_id='QX-1').description, 'Fixed body')
+        self.assertFalse(FailedMessage.objects.exists())
+
+        FailedMessage.objects.create(message_hash='x' * 64, failures=5)
+        call_command('quarantine', discard=[FailedMessage.objects.get().id], stdout=StringIO())
+        self.assertFalse(FailedMessage.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('quarantine', discard=[12345], stdout=StringIO())
@@ -23,6 +23,7 @@ urlpatterns = [
     path('api/bugs/', views.BugListView.as_view(), name='bug-list'),  # List all bugs
     path('api/bugs/<str:bug_id>/', views.BugDetailView.as_view(), name='bug-detail'),  # View specific bug
     path('api/bug_modifications/', views.BugModificationListView.as_view(), name='bug-modifications'),  # Aggregated bug modifications
+    path('api/metrics/ingest/', views.IngestMetricsView.as_view(), name='ingest-metrics'),  # Ingestion stage timings
     
     # Authentication endpoints
     path('api/auth/login/', LoginView.as_view(), name='login'),  # User login
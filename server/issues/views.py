@@ -2,15 +2,21 @@ from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.db.models import Count
-from django.db.models.functions import TruncDate
+from django.db.models.functions import Substr, TruncDate
+from .conditional import bug_etag, bug_last_modified, bug_list_etag, conditional_get
+from .filters import filter_bugs, split_values
+from .metrics import BUCKETS, STAGES, recent_stats
+from .pagination import BugCursorPagination, wants_cursor_pagination
 from .models import Bug
-from .serializers import BugSerializer
+from .serializers import DESCRIPTION_PREVIEW_LENGTH, BugListSerializer, BugSerializer, compile_representation
 from datetime import timedelta, date
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 import logging
 from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
 from django.shortcuts import render
 
 # Add this function at the beginning or end of your views.py file
@@ -24,27 +30,175 @@ class BugPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # Allow clients to specify page size
     max_page_size = 50  # Maximum number of items per page
 
+class SparseFieldsetViewMixin:
+    """
+    View mixin for the ?fields= and ?omit= query parameters.
+    
+    Passes the requested fields on to the serializer (see
+    SparseFieldsetMixin) and loads only the columns they need with
+    .only(), so a left-out description is not read from the database at all.
+    Unknown field names raise ValueError.
+    
+    Reads skip model instances and the serializer where they can: rows are
+    fetched with values_list() and converted by compile_representation(),
+    which produces the same JSON.
+    """
+    fast_serialization = True  # Serialize from values_list() rows where the serializer allows it
+
+    def requested_fields(self):
+        """
+        Parse and validate the fields and omit query parameters.
+        
+        Returns:
+            tuple: (field names or None for the default, field names to omit)
+            
+        Raises:
+            ValueError: If a name is not a field of the serializer
+        """
+        if not hasattr(self, '_requested_fields'):
+            params = self.request.query_params
+            fields = split_values(params.get('fields', ''))
+            omit = split_values(params.get('omit', ''))
+            unknown = sorted(set(fields + omit) - set(self.get_serializer_class()().get_fields()))
+            if unknown:
+                raise ValueError(f"Unknown field: {', '.join(unknown)}")
+            self._requested_fields = (fields or None, omit)
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer, limited to the requested fields."""
+        kwargs['fields'], kwargs['omit'] = self.requested_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    def select_columns(self, queryset, extra=()):
+        """
+        Restrict a queryset to the columns the serializer outputs.
+        
+        Args:
+            queryset (QuerySet): Bugs to load
+            extra (iterable): Further fields to load, e.g. sort keys
+            
+        Returns:
+            QuerySet: The queryset with .only() applied, and the
+                      description_preview annotation if it is output
+        """
+        names = set(self.get_serializer().fields) | set(extra)
+        columns = [field.name for field in Bug._meta.concrete_fields if field.name in names]
+        if 'description_preview' in names:
+            queryset = queryset.annotate(description_preview=Substr('description', 1, DESCRIPTION_PREVIEW_LENGTH))
+        return queryset.only(*columns)
+
+    def fast_rows(self, queryset):
+        """
+        Turn a queryset into values_list() rows for the fast read path.
+        
+        Args:
+            queryset (QuerySet): Bugs from select_columns()
+            
+        Returns:
+            tuple: (named values_list() queryset, convert(row) -> output dict),
+                   or None to use the serializer; rows also carry the sort
+                   keys after the output columns, for cursor pagination
+        """
+        if not self.fast_serialization:
+            return None
+        compiled = compile_representation(self.get_serializer())
+        if compiled is None:
+            return None
+        names, convert = compiled
+        sort_keys = [field.lstrip('-') for field in queryset.query.order_by if field.lstrip('-') not in names]
+        return queryset.values_list(*names, *sort_keys, named=True), convert
+
+
 # GET /api/bugs/
-class BugListView(generics.ListAPIView):
+class BugListView(SparseFieldsetViewMixin, generics.ListAPIView):
     """
-    API view that returns a paginated list of all bugs.
+    API view that returns a paginated, filtered and ordered list of bugs.
     
-    This view handles GET requests to retrieve a list of all bug reports.
+    This view handles GET requests to retrieve a list of bug reports.
     Results are paginated using BugPagination class, and authentication is required.
     
     Endpoint: GET /api/bugs/
     Query parameters:
         page: Page number (default: 1)
         page_size: Number of items per page (default: 10, max: 50)
+        status, priority: Comma separated values to match
+        created_after, created_before, updated_after, updated_before: Date ranges
+        min_modified: Minimum modified_count
+        ordering: Comma separated sort fields, "-" for descending (default: id)
+        pagination: "cursor" for keyset pagination, see issues.pagination;
+                    requests with a cursor parameter use it too
+        fields, omit: Comma separated fields to output or leave out; by
+                      default the compact fields of BugListSerializer
+    See issues.filters for details; invalid values return 400.
+    
+    Responses carry an ETag; a request whose If-None-Match matches it gets
+    304 Not Modified, see issues.conditional.
     """
     queryset = Bug.objects.all()  # Get all bug records
-    serializer_class = BugSerializer  # Use BugSerializer for conversion to JSON
+    serializer_class = BugListSerializer  # Compact representation without the full description
     pagination_class = BugPagination  # Enable pagination
     permission_classes = [IsAuthenticated]  # Require authentication
 
+    @property
+    def paginator(self):
+        """
+        Pick page number or cursor pagination for this request.
+        
+        Returns:
+            BasePagination: BugCursorPagination when asked for, else BugPagination
+        """
+        if not hasattr(self, '_paginator'):
+            if wants_cursor_pagination(self.request.query_params):
+                self._paginator = BugCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(conditional_get(etag_func=bug_list_etag))
+    def get(self, request, *args, **kwargs):
+        """Handle GET requests, answering 304 if the client's copy is current."""
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Apply the filter and ordering query parameters.
+        
+        Returns:
+            QuerySet: The matching bugs in the requested order, loading
+                      only the columns that are output or sorted by
+        """
+        queryset = filter_bugs(super().get_queryset(), self.request.query_params)
+        return self.select_columns(queryset, extra=[field.lstrip('-') for field in queryset.query.order_by])
+
+    def list(self, request, *args, **kwargs):
+        """
+        Handle GET requests, rejecting invalid filter values.
+        
+        Rows go through fast_rows() unless the serializer needs instances.
+        
+        Args:
+            request: The HTTP request object
+            
+        Returns:
+            Response: A page of bugs, or a 400 error for invalid parameters
+        """
+        try:
+            fast = self.fast_rows(self.filter_queryset(self.get_queryset()))
+            if fast is None:
+                return super().list(request, *args, **kwargs)
+            rows, convert = fast
+            page = self.paginate_queryset(rows)
+            if page is None:
+                return Response([convert(row) for row in rows])
+            return self.get_paginated_response([convert(row) for row in page])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 
 # GET /api/bugs/<bug_id>/
-class BugDetailView(generics.RetrieveAPIView):
+class BugDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """
     API view that returns details for a specific bug.
     
@@ -54,12 +208,55 @@ class BugDetailView(generics.RetrieveAPIView):
     Endpoint: GET /api/bugs/<bug_id>/
     URL parameters:
         bug_id: The unique identifier for the bug (e.g., BUG-1234)
+    Query parameters:
+        fields, omit: Comma separated fields to output or leave out (default: all)
+    
+    Responses carry an ETag and Last-Modified; conditional requests for an
+    unchanged bug get 304 Not Modified, see issues.conditional.
     """
     queryset = Bug.objects.all()  # Get all bug records
     serializer_class = BugSerializer  # Use BugSerializer for conversion to JSON
     lookup_field = 'bug_id'  # This makes it match the custom bug_id instead of pk
     permission_classes = [IsAuthenticated]  # Require authentication
 
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(conditional_get(etag_func=bug_etag, last_modified_func=bug_last_modified))
+    def get(self, request, *args, **kwargs):
+        """Handle GET requests, answering 304 if the client's copy is current."""
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Load only the columns that are output.
+        
+        Returns:
+            QuerySet: All bugs, restricted to the requested columns
+        """
+        return self.select_columns(super().get_queryset())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Handle GET requests, rejecting unknown field names.
+        
+        Rows go through fast_rows() unless the serializer needs instances.
+        
+        Args:
+            request: The HTTP request object
+            
+        Returns:
+            Response: The bug, or a 400 error for invalid parameters
+        """
+        try:
+            fast = self.fast_rows(self.filter_queryset(self.get_queryset()))
+            if fast is None:
+                return super().retrieve(request, *args, **kwargs)
+            rows, convert = fast
+            row = generics.get_object_or_404(rows, **{self.lookup_field: kwargs[self.lookup_field]})
+            self.check_object_permissions(request, row)
+            return Response(convert(row))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 # Get a logger for the views
 logger = logging.getLogger('bug_tracker')
 
@@ -123,4 +320,50 @@ class BugModificationListView(APIView):
             return Response(
                 {"error": "Failed to retrieve bug modifications data"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+# GET /api/metrics/ingest/
+class IngestMetricsView(APIView):
+    """
+    API view that returns the stage timings of recent email ingestion runs.
+    
+    Every run of process_emails, the Celery tasks and the listener stores
+    how long each stage took as an IngestRun; this view merges the newest
+    of them.
+    
+    Endpoint: GET /api/metrics/ingest/
+    Query parameters:
+        runs: Number of recent runs to merge (default: 100, max: 1000)
+    Returns:
+        JSON object with the number of runs and emails, and per stage the
+        number of operations, total/p50/p99 seconds, bytes and the
+        cumulative histogram buckets keyed by their upper bound
+    """
+    permission_classes = [IsAuthenticated]  # Require authentication
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handle GET requests for ingestion metrics.
+        
+        Args:
+            request: The HTTP request object
+            
+        Returns:
+            Response: JSON data with the merged stage timings
+        """
+        try:
+            runs = min(max(int(request.query_params.get('runs', 100)), 1), 1000)
+        except ValueError:
+            return Response({"error": "runs must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        stats, merged, emails = recent_stats(runs)
+        summary = stats.summary()
+        for stage in STAGES:
+            # Cumulative counts, like the "le" buckets of a Prometheus histogram
+            cumulative, buckets = 0, {}
+            for bound, count in zip(BUCKETS, stats.durations[stage].counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = cumulative
+            summary[stage]["buckets"] = buckets
+        return Response({"runs": merged, "emails": emails, "stages": summary})
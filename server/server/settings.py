@@ -129,15 +129,48 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Celery configuration
 from celery.schedules import timedelta
 
+# Adaptive polling: each process_emails_task run schedules the next one, after
+# INGEST_POLL_MIN_INTERVAL seconds while mail keeps arriving and backing off
+# exponentially up to INGEST_POLL_MAX_INTERVAL while the inbox stays empty.
+# Beat then only restarts the chain if it stops (see issues/polling.py).
+INGEST_ADAPTIVE_POLLING = False
+INGEST_POLL_MIN_INTERVAL = 1  # Seconds between polls under load
+INGEST_POLL_MAX_INTERVAL = 300  # Ceiling of the back-off while the inbox is empty
+
+# Staged pipeline: with INGEST_STAGED_PIPELINE each chunk of a large backlog runs
+# as a chain of fetch, parse, classify and persist tasks (see issues/ingest.py)
+# instead of one process_email_chunk task.
+INGEST_STAGED_PIPELINE = False
+
+# Quarantine: an email that failed INGEST_QUARANTINE_AFTER times is flagged as
+# read and kept in the FailedMessage table, and moved to INGEST_QUARANTINE_FOLDER
+# when set (see issues/quarantine.py and the quarantine command).
+INGEST_QUARANTINE_AFTER = 3
+INGEST_QUARANTINE_FOLDER = None  # e.g. "Quarantine"
+
+# With the IMAP IDLE listener running (python manage.py listen_emails, started by
+# supervisord.conf) new mail is ingested as it arrives; the beat task then only
+# runs every INGEST_WATCHDOG_INTERVAL seconds as a watchdog for mail the listener
+# missed while it was down. Set to False when no listener is deployed.
+INGEST_EMAIL_LISTENER = True
+INGEST_WATCHDOG_INTERVAL = 300
+
 CELERY_BEAT_SCHEDULE = {
     'process-emails-task': {
         'task': 'issues.tasks.process_emails_task',
-        'schedule': timedelta(seconds = 10),  # Executes every 10 seconds
+        # A slow watchdog next to the listener; otherwise executes every 10 seconds,
+        # or checks on the adaptive polling chain every minute
+        'schedule': timedelta(
+            seconds=INGEST_WATCHDOG_INTERVAL if INGEST_EMAIL_LISTENER else 60 if INGEST_ADAPTIVE_POLLING else 10
+        ),
     },
 }
 
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Uses Redis as message broker
+CELERY_RESULT_BACKEND = 'redis://localhost:6379/1'  # Stores chunk results for the chord in issues.tasks
+INGEST_LOCK_URL = CELERY_BROKER_URL  # Redis for the process_emails_task lease; None keeps leases in the database
+INGEST_STAGE_URL = CELERY_BROKER_URL  # Redis for raw emails between pipeline stages; None keeps them in the database
 CELERY_ACCEPT_CONTENT = ['json']  # Accept JSON format for tasks
 CELERY_TASK_SERIALIZER = 'json'  # Serialize tasks in JSON format
 
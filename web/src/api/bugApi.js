@@ -28,12 +28,19 @@ const getAuthHeaders = () => {
  * 
  * @param {number} page - The page number to fetch (default: 1)
  * @param {number} pageSize - Number of bugs per page (default: 10)
+ * @param {Object} filters - Extra query parameters such as status, priority or ordering
  * @returns {Promise<Object>} Promise resolving to JSON response with bugs data
  * @throws {Error} If the request fails or unauthorized
  */
-export const fetchBugs = async (page = 1, pageSize = 10) => {
+export const fetchBugs = async (page = 1, pageSize = 10, filters = {}) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/bugs/?page=${page}&page_size=${pageSize}`, {
+    const params = new URLSearchParams({ page, page_size: pageSize });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') {
+        params.append(key, value);
+      }
+    });
+    const response = await fetch(`${API_BASE_URL}/bugs/?${params}`, {
       headers: getAuthHeaders()
     });
     
@@ -13,8 +13,8 @@ const { Title } = Typography;
  * - Shows bugs in a table with ID, subject, status, and priority
  * - Color-coded status and priority tags
  * - Pagination with configurable page size
- * - Filtering by status and priority
- * - Sorting by bug ID
+ * - Filtering by status and priority, done by the server over all bugs
+ * - Sorting by bug ID, update time or modification count, also server-side
  * - Navigation to bug details
  * 
  * @returns {JSX.Element} Rendered bug list component
@@ -30,6 +30,8 @@ const BugList = () => {
     pageSize: 10,
     total: 0,
   });
+  // State for the server-side filters and ordering sent with each request
+  const [query, setQuery] = useState({});
   // Hook for programmatic navigation to detail view
   const navigate = useNavigate();
 
@@ -38,11 +40,12 @@ const BugList = () => {
    * 
    * @param {number} page - The page number to fetch
    * @param {number} pageSize - Number of bugs per page
+   * @param {Object} filters - Filter and ordering query parameters
    */
-  const loadBugs = async (page = 1, pageSize = 10) => {
+  const loadBugs = async (page = 1, pageSize = 10, filters = query) => {
     setLoading(true);
     try {
-      const response = await fetchBugs(page, pageSize);
+      const response = await fetchBugs(page, pageSize, filters);
       setBugs(response.results);
       setPagination({
         current: page,
@@ -112,7 +115,7 @@ const BugList = () => {
       title: 'Bug ID',
       dataIndex: 'bug_id',
       key: 'bug_id',
-      sorter: (a, b) => a.bug_id.localeCompare(b.bug_id),
+      sorter: true,
     },
     {
       title: 'Subject',
@@ -135,7 +138,6 @@ const BugList = () => {
         { text: 'Resolved', value: 'resolved' },
         { text: 'Closed', value: 'closed' },
       ],
-      onFilter: (value, record) => record.status.toLowerCase() === value,
     },
     {
       title: 'Priority',
@@ -151,7 +153,19 @@ const BugList = () => {
         { text: 'Medium', value: 'medium' },
         { text: 'Low', value: 'low' },
       ],
-      onFilter: (value, record) => record.priority.toLowerCase() === value,
+    },
+    {
+      title: 'Updated',
+      dataIndex: 'updated_at',
+      key: 'updated_at',
+      render: (updatedAt) => new Date(updatedAt).toLocaleString(),
+      sorter: true,
+    },
+    {
+      title: 'Modifications',
+      dataIndex: 'modified_count',
+      key: 'modified_count',
+      sorter: true,
     },
     {
       title: 'Actions',
@@ -172,10 +186,21 @@ const BugList = () => {
   /**
    * Handler for table pagination, sorting, and filtering changes
    * 
+   * Filters and sort order are sent to the server, so they apply to all
+   * bugs rather than only the rows of the current page.
+   * 
    * @param {Object} pagination - The new pagination state
+   * @param {Object} filters - Selected filter values per column
+   * @param {Object} sorter - The column and direction to sort by
    */
-  const handleTableChange = (pagination) => {
-    loadBugs(pagination.current, pagination.pageSize);
+  const handleTableChange = (pagination, filters, sorter) => {
+    const filterQuery = {
+      status: (filters.status || []).join(','),
+      priority: (filters.priority || []).join(','),
+      ordering: sorter.order ? `${sorter.order === 'descend' ? '-' : ''}${sorter.field}` : '',
+    };
+    setQuery(filterQuery);
+    loadBugs(pagination.current, pagination.pageSize, filterQuery);
   };
 
   return (